@@ -0,0 +1,68 @@
+# actualizar_secciones.py - Refresco incremental del dataset publicado (sin re-ejecutar el pipeline ni reiniciar)
+#
+# Uso:
+#   python actualizar_secciones.py cambios.csv --motivo "Cómputos distritales 2024"
+#   python actualizar_secciones.py --seccion 229 --valor votos_totales_acumulados=15230 --valor lista_nominal_promedio=1210
+#
+# `cambios.csv` lleva la columna `seccion` y las columnas fuente a corregir (celdas vacías = sin cambio).
+# Las columnas derivadas (indice_movilizacion, indice_competitividad, perfil_descriptivo) no se editan:
+# se recalculan. La app y la API toman la versión nueva en su siguiente rerun / consulta.
+
+# --- CORE LIBRARIES ---
+import argparse
+from pathlib import Path
+
+# --- DATA & ANALYSIS ---
+import pandas as pd
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import RUTA_DATOS_FINAL, DIRECTORIO_PUBLICADOS
+from indicadores import actualizar_dataset_produccion, ruta_actualizaciones
+
+
+def leer_cambios(ruta=None, seccion=None, valores=()):
+    """Cambios desde un CSV/Parquet o desde `--seccion` + `--valor columna=valor`."""
+    if ruta:
+        ruta = Path(ruta)
+        return pd.read_parquet(ruta) if ruta.suffix.lower() in ('.parquet', '.pq') else pd.read_csv(ruta)
+    if seccion is None or not valores:
+        raise SystemExit("❌ Indica un archivo de cambios o --seccion con al menos un --valor columna=valor.")
+    cambio = {'seccion': seccion}
+    for asignacion in valores:
+        columna, separador, valor = asignacion.partition('=')
+        if not separador:
+            raise SystemExit(f"❌ Valor mal formado: '{asignacion}' (se espera columna=valor)")
+        try:
+            cambio[columna] = float(valor)
+        except ValueError:
+            cambio[columna] = valor
+    return pd.DataFrame([cambio])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica correcciones por sección y publica una versión nueva del dataset.")
+    parser.add_argument("cambios", nargs="?", help="CSV o Parquet con columna 'seccion' y las columnas a corregir")
+    parser.add_argument("--seccion", type=int, help="Sección a corregir (sin archivo)")
+    parser.add_argument("--valor", action="append", default=[], help="columna=valor (repetible)")
+    parser.add_argument("--motivo", default="", help="Descripción del lote (queda en la bitácora)")
+    args = parser.parse_args()
+
+    cambios = leer_cambios(args.cambios, args.seccion, args.valor)
+    try:
+        version, resumen = actualizar_dataset_produccion(DIRECTORIO_PUBLICADOS, RUTA_DATOS_FINAL, cambios, args.motivo)
+    except (ValueError, RuntimeError) as e:
+        raise SystemExit(f"❌ {e}")
+
+    if not resumen['secciones_modificadas']:
+        print(f"ℹ️ Sin cambios: los valores ya estaban publicados (versión {version}).")
+        return
+    print(f"✅ Versión {version} publicada: {len(resumen['secciones_modificadas'])} secciones modificadas "
+          f"({', '.join(map(str, resumen['secciones_modificadas']))})")
+    print(f"   Columnas: {', '.join(resumen['columnas_actualizadas'])}")
+    if resumen['umbrales_cambiaron']:
+        print(f"   Los umbrales de perfil cambiaron: {resumen['perfiles_recalculados']} perfiles recalculados")
+    print(f"   Bitácora: {ruta_actualizaciones(RUTA_DATOS_FINAL)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# agente_analista.py - Agente SQL del "Analista Político Estratégico" y su arranque en segundo plano (sin Streamlit)
+
+# --- CORE LIBRARIES ---
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- MÓDULOS DEL PROYECTO ---
+from perfil_arranque import PERFILADOR
+from router_proveedores import RouterProveedores, TIEMPO_LIMITE
+
+
+logger = logging.getLogger("agente_analista")
+
+MODELO_ANALISTA = "gpt-4.1-mini"
+
+# Proveedores en orden de preferencia: el primero con clave es el principal, los demás son respaldo.
+# Los modelos de Anthropic no aceptan el agente 'openai-tools'; usan el genérico 'tool-calling'.
+# El modelo de cada proveedor se puede cambiar sin tocar código con su variable (secrets o entorno):
+# los IDs con fecha se retiran y el respaldo solo se nota roto cuando el principal falla.
+PROVEEDORES_ANALISTA = {
+    'openai': {'modelo': MODELO_ANALISTA, 'clave': "OPENAI_API_KEY", 'variable_modelo': "ANALISTA_MODELO",
+               'agent_type': "openai-tools"},
+    'anthropic': {'modelo': "claude-sonnet-4-5", 'clave': "ANTHROPIC_API_KEY", 'variable_modelo': "ANALISTA_MODELO_RESPALDO",
+                  'agent_type': "tool-calling"},
+}
+# Tiempo límite de cada llamada HTTP al LLM y reintentos del cliente. Los reintentos internos
+# alargan la cola de latencia sin que el enrutador lo vea: se deja uno y el resto es respaldo.
+TIEMPO_LIMITE_LLM = 30
+REINTENTOS_LLM = 1
+
+# --- INICIO DEL PROMPT COMPLETO Y RESTAURADO ---
+PROMPT_ANALISTA = """
+### Persona y Tarea Principal
+Eres "Analista Político Estratégico", un asistente de IA experto en el análisis de datos electorales y sociodemográficos de Manzanillo, Colima.
+Tu única tarea es responder a las preguntas del usuario generando y ejecutando consultas SQL sobre una tabla llamada 'secciones' (y sus tablas complementarias), y luego interpretar los resultados de forma clara y analítica.
+
+### Diccionario de Datos Clave
+Aquí tienes el significado de las columnas más importantes para tu análisis:
+- seccion: El identificador único de la sección electoral.
+- partido_dominante: El partido político con más votos históricos en la sección.
+- pct_voto_morena, pct_voto_oposicion: Porcentaje de votos para Morena y la oposición.
+- indice_movilizacion: Mide la 'productividad' de votos de una sección a lo largo del tiempo (votos acumulados / votante promedio). NO es un porcentaje. Un valor ALTO indica una movilización electoral histórica muy intensa.
+- indice_competitividad: Un puntaje de 0 a 100 que mide qué tan reñida es una elección. IMPORTANTE: un valor ALTO (cercano a 100) significa MUY COMPETITIVO. Un valor BAJO significa que un partido domina.
+- porc_jovenes: Porcentaje de la población entre 18 y 24 años.
+- porc_adultos_mayores: Porcentaje de la población mayor a 65 años.
+- indice_digitalizacion: Un puntaje de 0 a 100 que mide la adopción tecnológica (internet, PC, celular). Es un indicador de modernidad.
+- GRAPROES: Grado promedio de escolaridad en años. Un indicador socioeconómico clave.
+- porc_hogares_jefa_mujer: Porcentaje de hogares liderados por una mujer.
+- porc_poblacion_migrante: Porcentaje de residentes nacidos fuera de Colima. Indica arraigo comunitario o dinamismo poblacional.
+- tasa_desocupacion: Porcentaje de la población económicamente activa que está desempleada.
+- porc_sin_servicios_salud: Porcentaje de la población sin acceso a servicios de salud. Un indicador clave de vulnerabilidad.
+
+### Tablas Complementarias
+- insights_secciones: una fila por sección (columna seccion, se une con secciones.seccion) y una columna 0/1 por cada insight estratégico automático (ej. prioridad_salud, competitividad_critica, baja_digitalizacion). 1 significa que la sección cumple ese insight.
+- reglas_insights: catálogo de los insights (id = nombre de la columna en insights_secciones, etiqueta, texto y condicion). Consúltala para saber qué significa cada insight.
+- zonas: una fila por sección (columna seccion, se une con secciones.seccion) con la zona de campaña a la que pertenece (columna zona). Las zonas son grupos de secciones contiguas con perfiles similares y lista nominal balanceada; cada fila repite los agregados de su zona (secciones_en_zona, lista_nominal_promedio_total y el promedio de cada indicador de perfil). Úsala para preguntas por zona o para planear recorridos de campaña.
+
+### Instrucciones de Salida
+1. Analiza la pregunta del usuario para entender su intención estratégica.
+2. Usa el diccionario de datos para elegir las mejores columnas para tu consulta SQL.
+3. Genera una consulta SQL en dialecto SQLite.
+4. Una vez que tengas los resultados, no te limite a mostrarlos. Escribe un resumen ejecutivo en español, explicando los hallazgos y dando recomendaciones prácticas de estrategia electoral o política pública.
+5. Si presentas una lista de secciones, usa un formato de viñetas (bullets).
+6. Siempre responde en español y actúa como un analista político experimentado.
+"""# --- FIN DEL PROMPT ---
+
+
+# --- 1. Construcción del Agente ---
+
+def crear_llm(proveedor, api_key, modelo=None):
+    """Modelo de chat del proveedor (importación diferida: solo se carga la pila que se usa)."""
+    modelo = modelo or PROVEEDORES_ANALISTA[proveedor]['modelo']
+    if proveedor == 'openai':
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=modelo, temperature=0.1, api_key=api_key,
+                          timeout=TIEMPO_LIMITE_LLM, max_retries=REINTENTOS_LLM)
+    if proveedor == 'anthropic':
+        from langchain_anthropic import ChatAnthropic
+        return ChatAnthropic(model=modelo, temperature=0.1, api_key=api_key,
+                             timeout=TIEMPO_LIMITE_LLM, max_retries=REINTENTOS_LLM)
+    raise ValueError(f"Proveedor desconocido: '{proveedor}'. Opciones: {sorted(PROVEEDORES_ANALISTA)}")
+
+
+def crear_agente_sql(ruta_db, api_key, modelo=None, proveedor='openai'):
+    """
+    Construye el agente SQL sobre la base publicada (solo lectura) con el prompt estratégico.
+    LangChain se importa aquí y no al cargar el módulo: es la pila más pesada de la app
+    y el mapa no la necesita para su primer render.
+    """
+    with PERFILADOR.fase("importar langchain"):
+        from sqlalchemy import create_engine
+        from langchain_community.agent_toolkits.sql.base import create_sql_agent
+        from langchain_community.utilities import SQLDatabase
+
+    with PERFILADOR.fase(f"construir agente SQL ({proveedor})"):
+        engine = create_engine(f'sqlite:///file:{ruta_db}?mode=ro&uri=true')
+        db = SQLDatabase(engine=engine)
+        llm = crear_llm(proveedor, api_key, modelo)
+        return create_sql_agent(
+            llm=llm, db=db, agent_type=PROVEEDORES_ANALISTA[proveedor]['agent_type'],
+            verbose=False, prompt_suffix=PROMPT_ANALISTA
+        )
+
+
+def claves_proveedores(fuente):
+    """{proveedor: api_key} de los proveedores con clave en `fuente` (st.secrets u os.environ)."""
+    return {
+        proveedor: fuente[config['clave']]
+        for proveedor, config in PROVEEDORES_ANALISTA.items() if fuente.get(config['clave'])
+    }
+
+
+def modelos_proveedores(*fuentes):
+    """{proveedor: modelo} con los modelos definidos en `fuentes` (la primera que lo tenga gana)."""
+    modelos = {}
+    for proveedor, config in PROVEEDORES_ANALISTA.items():
+        modelo = next((fuente.get(config['variable_modelo']) for fuente in fuentes if fuente.get(config['variable_modelo'])), None)
+        if modelo:
+            modelos[proveedor] = modelo
+    return modelos
+
+
+def crear_router_analista(ruta_db, claves, tiempo_limite=TIEMPO_LIMITE, hedging=False, modelos=None):
+    """
+    Un agente SQL por proveedor con clave, detrás de un `RouterProveedores` (tiempo límite,
+    respaldo y hedging opcional). `modelos` ({proveedor: modelo}) sustituye el modelo por defecto.
+    Un proveedor que no se puede construir (p. ej. sin su paquete instalado) se omite con un
+    aviso mientras quede al menos uno.
+    """
+    modelos = modelos or {}
+    proveedores, errores = [], []
+    for proveedor, api_key in claves.items():
+        try:
+            proveedores.append((proveedor, crear_agente_sql(ruta_db, api_key, modelos.get(proveedor), proveedor)))
+        except Exception as e:
+            logger.warning("Proveedor %s no disponible: %s", proveedor, e)
+            errores.append(f"{proveedor}: {e}")
+    if not proveedores:
+        raise RuntimeError("Ningún proveedor LLM disponible" + (f" ({'; '.join(errores)})" if errores else
+                           f": define {' o '.join(c['clave'] for c in PROVEEDORES_ANALISTA.values())}"))
+    return RouterProveedores(proveedores, tiempo_limite=tiempo_limite, hedging=hedging)
+
+
+class AgenteSimulado:
+    """
+    Sustituto local del agente (sin red ni API key) con la misma interfaz `invoke`.
+    Responde con una consulta fija sobre la base publicada tras una latencia configurable,
+    para probar la API y la interfaz sin consumir un LLM.
+    """
+
+    def __init__(self, ruta_db, latencia=0.0):
+        self.ruta_db = ruta_db
+        self.latencia = latencia
+
+    def invoke(self, pregunta):
+        time.sleep(self.latencia)
+        with sqlite3.connect(f"file:{self.ruta_db}?mode=ro", uri=True) as conexion:
+            filas = conexion.execute(
+                "SELECT seccion, indice_competitividad FROM secciones ORDER BY indice_competitividad DESC LIMIT 5"
+            ).fetchall()
+        secciones = "\n".join(f"- Sección {seccion}: competitividad {valor:.0f}/100" for seccion, valor in filas)
+        return {
+            'input': pregunta,
+            'output': f"*(Analista simulado, sin LLM)* Pregunta recibida: \"{pregunta}\".\n\nSecciones más competitivas:\n{secciones}",
+        }
+
+
+# --- 2. Arranque en Segundo Plano ---
+
+class AgenteEnSegundoPlano:
+    """
+    Construye el agente en un hilo aparte para que el mapa se dibuje sin esperarlo.
+    `listo()` no bloquea; `obtener()` espera y devuelve el agente (o relanza el error
+    de construcción).
+    """
+
+    def __init__(self, constructor, *args, **kwargs):
+        ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agente")
+        self._futuro = ejecutor.submit(constructor, *args, **kwargs)
+        ejecutor.shutdown(wait=False)
+
+    def listo(self):
+        return self._futuro.done()
+
+    def obtener(self, timeout=None):
+        return self._futuro.result(timeout=timeout)
@@ -0,0 +1,436 @@
+# api_secciones.py - Servicio HTTP/JSON sin interfaz sobre el núcleo cacheado (dataset publicado, índice, agregados y agente)
+#
+# Uso:
+#   python api_secciones.py                              # agente real (OPENAI_API_KEY y/o ANTHROPIC_API_KEY)
+#   python api_secciones.py --hedging --tiempo-limite 45 # respaldo en paralelo si el principal pasa su p95
+#   python api_secciones.py --analista-simulado          # sin LLM, para uso local y pruebas de carga
+#   python api_secciones.py --analista-simulado --latencia-simulada 2 --latencia-respaldo 0.5 --hedging
+#   python api_secciones.py --puerto 8600 --procesos 4   # varios procesos sobre el mismo puerto
+#
+# Endpoints:
+#   GET  /salud                      versión publicada, estado del analista y latencia por proveedor
+#   GET  /secciones/{id}             ficha completa de una sección
+#   GET  /secciones?perfil=Jóvenes&insight=prioridad_salud&partido=morena&rango=indice_competitividad:60:
+#                   &campos=seccion,pct_voto_morena&orden=indice_competitividad&desc=1&limite=20
+#   GET  /rankings/{metrica}?limite=10   (metrica: movilizacion | competitividad)
+#   GET  /promedios                  agregados municipales
+#   GET  /umbrales?partido_dominante=morena   umbrales de perfil (percentil 70) de las particiones elegidas
+#   POST /analista                   {"pregunta": "..."} -> respuesta del agente SQL
+
+# --- CORE LIBRARIES ---
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+from aiohttp import web
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import (
+    abrir_tabla, tabla_a_geodataframe, leer_puntero, rutas_version, RUTA_DATOS_FINAL, DIRECTORIO_PUBLICADOS
+)
+from indicadores import (
+    asegurar_dataset_produccion, calcular_promedios, calcular_rankings, obtener_semaforo_competitividad,
+    separar_etiquetas_perfil, construir_indice_secciones, construir_predicado_filtros, INDICADORES_MAPA,
+    leer_sketches_perfil, umbrales_desde_sketches, CUANTIL_PERFIL
+)
+from reglas_insights import REGLAS_INSIGHTS, evaluar_reglas
+from agente_analista import (
+    crear_router_analista, claves_proveedores, modelos_proveedores, AgenteSimulado, AgenteEnSegundoPlano
+)
+from router_proveedores import RouterProveedores, TIEMPO_LIMITE
+
+
+logger = logging.getLogger("api_secciones")
+
+PUERTO = 8600
+TIEMPO_KEEPALIVE = 75          # segundos que una conexión ociosa se conserva abierta
+INTERVALO_VERIFICACION = 2.0   # cada cuánto se revisa si hay una versión publicada nueva
+CONSULTAS_ANALISTA = 4         # consultas simultáneas al agente por proceso
+LIMITE_LISTA = 100
+CAMPOS_LISTA = ['seccion', 'perfil_descriptivo', 'partido_dominante', *INDICADORES_MAPA.values()]
+
+
+# --- 1. Núcleo por Versión ---
+
+class NucleoSecciones:
+    """
+    Todo lo que la API sirve para una versión publicada, calculado una sola vez:
+    dataset mapeado en memoria, agregados, rankings, insights, índice de bitmaps y
+    la ficha JSON de cada sección ya serializada (una consulta por id no recalcula nada).
+    """
+
+    def __init__(self, version):
+        self.version = version
+        tabla = abrir_tabla(DIRECTORIO_PUBLICADOS, version)
+        gdf = tabla_a_geodataframe(tabla)
+        self.sketches_perfil = leer_sketches_perfil(tabla)
+        self.promedios = {clave: float(valor) for clave, valor in calcular_promedios(gdf).items()}
+        self.rankings = calcular_rankings(gdf)
+        tabla_insights = evaluar_reglas(gdf, self.promedios)
+        self.indice = construir_indice_secciones(gdf, tabla_insights)
+
+        self.datos = gdf.drop(columns='geometry')
+        self.registros = json.loads(self.datos.to_json(orient='records', force_ascii=False))
+        centroides = gdf.geometry.to_crs(gdf.estimate_utm_crs()).centroid.to_crs(gdf.crs)
+        insights = tabla_insights.to_numpy()
+
+        self.fichas = {}
+        for posicion, registro in enumerate(self.registros):
+            icono, nivel, descripcion, color = obtener_semaforo_competitividad(registro['indice_competitividad'])
+            ficha = {
+                'version': version,
+                'seccion': registro['seccion'],
+                'perfil': {
+                    'descripcion': registro['perfil_descriptivo'],
+                    'etiquetas': separar_etiquetas_perfil(registro['perfil_descriptivo']),
+                },
+                'semaforo': {'icono': icono, 'nivel': nivel, 'descripcion': descripcion, 'color': color},
+                'rankings': {
+                    metrica: int(serie.iloc[posicion]) for metrica, serie in self.rankings.items()
+                } | {'total_secciones': len(gdf)},
+                'insights': [
+                    {'id': regla['id'], 'etiqueta': regla['etiqueta'], 'texto': regla['texto']}
+                    for regla, activa in zip(REGLAS_INSIGHTS, insights[posicion]) if activa
+                ],
+                'centroide': [float(centroides.iloc[posicion].y), float(centroides.iloc[posicion].x)],
+                'indicadores': registro,
+            }
+            self.fichas[int(registro['seccion'])] = _a_json(ficha)
+
+    def ruta_db(self):
+        return str(rutas_version(DIRECTORIO_PUBLICADOS, self.version)['sqlite'])
+
+    def listar(self, predicado, campos, orden=None, descendente=False, limite=LIMITE_LISTA, desplazamiento=0):
+        """Secciones que cumplen el predicado (resuelto con bitmaps), ordenadas y paginadas."""
+        posiciones = self.indice.seleccionar(predicado)
+        if orden:
+            valores = self.datos[orden].to_numpy()[posiciones]
+            orden_posiciones = np.argsort(valores, kind='stable')
+            posiciones = posiciones[orden_posiciones[::-1] if descendente else orden_posiciones]
+        pagina = posiciones[desplazamiento:desplazamiento + limite]
+        return {
+            'version': self.version,
+            'total': int(len(posiciones)),
+            'secciones': [{campo: self.registros[p][campo] for campo in campos} for p in pagina],
+        }
+
+    def ranking(self, metrica, limite):
+        posiciones_ranking = self.rankings[metrica].to_numpy()
+        columna = 'indice_movilizacion' if metrica == 'movilizacion' else 'indice_competitividad'
+        return {
+            'version': self.version,
+            'metrica': metrica,
+            'secciones': [
+                {'posicion': int(posiciones_ranking[p]), 'seccion': self.registros[p]['seccion'], 'valor': self.registros[p][columna]}
+                for p in np.argsort(posiciones_ranking, kind='stable')[:limite]
+            ],
+        }
+
+
+class NucleoAPI:
+    """
+    Núcleo vigente del proceso. Revisa el puntero de publicación a lo sumo cada
+    INTERVALO_VERIFICACION segundos y, si hay versión nueva, construye su núcleo en un hilo
+    (sin bloquear el bucle de eventos) mientras se sigue sirviendo el anterior; al terminar
+    cambia núcleo y agente juntos y relanza el agente en segundo plano.
+    """
+
+    def __init__(self, fabrica_agente):
+        self.fabrica_agente = fabrica_agente
+        self.nucleo = None
+        self.agente = None
+        self._ultima_verificacion = 0.0
+        self._reconstruccion = None
+
+    def cargar(self):
+        """Carga síncrona de la versión vigente, al crear la aplicación (antes de servir)."""
+        self._ultima_verificacion = time.monotonic()
+        puntero = leer_puntero(DIRECTORIO_PUBLICADOS)
+        if puntero:
+            self._activar(NucleoSecciones(puntero['version']))
+
+    def _activar(self, nucleo):
+        # Sin `await` entre ambas asignaciones: ningún handler ve el núcleo nuevo con el agente viejo
+        agente = AgenteEnSegundoPlano(self.fabrica_agente, nucleo.ruta_db())
+        self.nucleo, self.agente = nucleo, agente
+
+    async def _reconstruir(self, version):
+        try:
+            nucleo = await asyncio.to_thread(NucleoSecciones, version)
+        except Exception:
+            logger.exception("No se pudo cargar la versión %s; se sigue sirviendo la anterior", version)
+        else:
+            self._activar(nucleo)
+        finally:
+            self._reconstruccion = None
+
+    async def vigente(self):
+        ahora = time.monotonic()
+        if self.nucleo is None or ahora - self._ultima_verificacion >= INTERVALO_VERIFICACION:
+            self._ultima_verificacion = ahora
+            puntero = leer_puntero(DIRECTORIO_PUBLICADOS)
+            nueva = puntero and (self.nucleo is None or puntero['version'] != self.nucleo.version)
+            if nueva and self._reconstruccion is None:
+                self._reconstruccion = asyncio.create_task(self._reconstruir(puntero['version']))
+        if self.nucleo is None and self._reconstruccion is not None:
+            await asyncio.shield(self._reconstruccion)
+        if self.nucleo is None:
+            raise web.HTTPServiceUnavailable(reason="No hay dataset publicado")
+        return self.nucleo
+
+
+# --- 2. Utilidades HTTP ---
+
+def _a_json(datos):
+    return json.dumps(datos, ensure_ascii=False).encode('utf-8')
+
+
+def _respuesta(cuerpo, status=200, encabezados=None):
+    if not isinstance(cuerpo, bytes):
+        cuerpo = _a_json(cuerpo)
+    return web.Response(body=cuerpo, status=status, content_type='application/json', charset='utf-8', headers=encabezados)
+
+
+def _error(status, mensaje, encabezados=None):
+    return _respuesta({'error': mensaje}, status, encabezados)
+
+
+def _entero_no_negativo(consulta, nombre, defecto):
+    texto = consulta.get(nombre, defecto)
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise ValueError(f"'{nombre}' debe ser un entero") from None
+    if valor < 0:
+        raise ValueError(f"'{nombre}' no puede ser negativo")
+    return valor
+
+
+def _leer_rango(texto, columnas_validas):
+    """'columna:min:max' (min o max pueden ir vacíos) -> (columna, (min, max))."""
+    partes = texto.split(':')
+    if len(partes) != 3:
+        raise ValueError(f"Rango mal formado: '{texto}'. Formato: 'columna:min:max' (min o max pueden ir vacíos)")
+    columna, *limites = partes
+    if columna not in columnas_validas:
+        raise ValueError(f"Rango sobre columna no indexada: '{columna}'. Opciones: {sorted(columnas_validas)}")
+    valores = []
+    for nombre, limite in zip(('mínimo', 'máximo'), limites):
+        try:
+            valor = float(limite) if limite else None
+        except ValueError:
+            valor = math.nan
+        if valor is not None and not math.isfinite(valor):
+            raise ValueError(f"Rango '{texto}': el {nombre} debe ser un número, no '{limite}'")
+        valores.append(valor)
+    minimo, maximo = valores
+    if minimo is not None and maximo is not None and minimo > maximo:
+        raise ValueError(f"Rango '{texto}': el mínimo es mayor que el máximo")
+    return columna, (minimo, maximo)
+
+
+# --- 3. Endpoints ---
+
+rutas = web.RouteTableDef()
+CLAVE_API = web.AppKey('api', NucleoAPI)
+CLAVE_SEMAFORO = web.AppKey('semaforo_analista', asyncio.Semaphore)
+
+
+@rutas.get('/salud')
+async def salud(request):
+    api = request.app[CLAVE_API]
+    nucleo = await api.vigente()
+    estado = {'version': nucleo.version, 'secciones': len(nucleo.fichas), 'analista': 'calentando'}
+    if api.agente.listo():
+        try:
+            estado['proveedores'] = api.agente.obtener().resumen_latencias()
+            estado['analista'] = 'listo'
+        except Exception:
+            estado['analista'] = 'error'
+    return _respuesta(estado)
+
+
+@rutas.get('/secciones/{seccion}')
+async def obtener_seccion(request):
+    nucleo = await request.app[CLAVE_API].vigente()
+    try:
+        return _respuesta(nucleo.fichas[int(request.match_info['seccion'])])
+    except (KeyError, ValueError):
+        return _error(404, f"Sección {request.match_info['seccion']} no encontrada")
+
+
+@rutas.get('/secciones')
+async def listar_secciones(request):
+    nucleo = await request.app[CLAVE_API].vigente()
+    consulta = request.query
+    try:
+        rangos = dict(_leer_rango(texto, nucleo.indice.rangos) for texto in consulta.getall('rango', []))
+        predicado = construir_predicado_filtros(
+            consulta.getall('perfil', []), consulta.getall('insight', []), consulta.getall('partido', []), rangos
+        )
+        campos = consulta['campos'].split(',') if 'campos' in consulta else CAMPOS_LISTA
+        orden = consulta.get('orden')
+        desconocidas = [c for c in [*campos, orden] if c and c not in nucleo.datos.columns]
+        if desconocidas:
+            raise ValueError(f"Columnas desconocidas: {desconocidas}")
+        limite = min(_entero_no_negativo(consulta, 'limite', LIMITE_LISTA), len(nucleo.fichas))
+        desplazamiento = _entero_no_negativo(consulta, 'desplazamiento', 0)
+    except ValueError as e:
+        return _error(400, str(e))
+    descendente = consulta.get('desc', '0') not in ('0', 'false', '')
+    return _respuesta(nucleo.listar(predicado, campos, orden, descendente, limite, desplazamiento))
+
+
+@rutas.get('/rankings/{metrica}')
+async def obtener_ranking(request):
+    nucleo = await request.app[CLAVE_API].vigente()
+    metrica = request.match_info['metrica']
+    if metrica not in nucleo.rankings:
+        return _error(404, f"Ranking desconocido: '{metrica}'. Opciones: {sorted(nucleo.rankings)}")
+    try:
+        limite = _entero_no_negativo(request.query, 'limite', 10)
+    except ValueError as e:
+        return _error(400, str(e))
+    return _respuesta(nucleo.ranking(metrica, limite))
+
+
+@rutas.get('/promedios')
+async def obtener_promedios(request):
+    nucleo = await request.app[CLAVE_API].vigente()
+    return _respuesta({'version': nucleo.version, 'promedios': nucleo.promedios})
+
+
+@rutas.get('/umbrales')
+async def obtener_umbrales(request):
+    nucleo = await request.app[CLAVE_API].vigente()
+    filtros = {columna: request.query.getall(columna) for columna in set(request.query)}
+    try:
+        umbrales, error = umbrales_desde_sketches(nucleo.sketches_perfil, filtros)
+    except ValueError as e:
+        return _error(400, f"{e}. Particiones: {nucleo.sketches_perfil.columnas_particion}")
+    if umbrales is None:
+        return _error(404, f"Ninguna partición coincide con {filtros}")
+    return _respuesta({
+        'version': nucleo.version,
+        'filtros': filtros,
+        'cuantil': CUANTIL_PERFIL,
+        'umbrales': umbrales,
+        'error_rango': error,
+        'particiones': nucleo.sketches_perfil.particiones(),
+    })
+
+
+@rutas.post('/analista')
+async def consultar_analista(request):
+    api = request.app[CLAVE_API]
+    nucleo = await api.vigente()
+    try:
+        pregunta = (await request.json())['pregunta'].strip()
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return _error(400, 'Se espera un JSON {"pregunta": "..."}')
+    if not pregunta:
+        return _error(400, "La pregunta está vacía")
+
+    arranque = api.agente
+    if not arranque.listo():
+        return _error(503, "El analista está calentando motores", {'Retry-After': '2'})
+    try:
+        agente = arranque.obtener()
+    except Exception as e:
+        return _error(503, f"Error al inicializar el agente LLM: {e}")
+
+    # El agente es bloqueante (LangChain síncrono): corre en un hilo, acotado por un semáforo
+    inicio = time.perf_counter()
+    async with request.app[CLAVE_SEMAFORO]:
+        try:
+            respuesta = await asyncio.to_thread(agente.invoke, pregunta)
+        except Exception as e:
+            return _error(502, f"Error del analista: {e}")
+    return _respuesta({
+        'version': nucleo.version,
+        'pregunta': pregunta,
+        'respuesta': respuesta['output'],
+        'proveedor': respuesta['proveedor'],
+        'intentos': respuesta['intentos'],
+        'segundos': round(time.perf_counter() - inicio, 3),
+    })
+
+
+# --- 4. Servidor ---
+
+def crear_aplicacion(fabrica_agente):
+    """Aplicación aiohttp lista para servir (útil también para pruebas con aiohttp.test_utils)."""
+    aplicacion = web.Application()
+    aplicacion[CLAVE_API] = NucleoAPI(fabrica_agente)
+    aplicacion[CLAVE_SEMAFORO] = asyncio.Semaphore(CONSULTAS_ANALISTA)
+    aplicacion.add_routes(rutas)
+    aplicacion[CLAVE_API].cargar()
+    return aplicacion
+
+
+def fabrica_agente_para(analista_simulado, latencia_simulada=0.0, latencia_respaldo=None,
+                        tiempo_limite=TIEMPO_LIMITE, hedging=False):
+    """
+    Constructor del agente por ruta de base: el enrutador sobre los proveedores reales con clave
+    en el entorno, o sobre analistas simulados locales (un respaldo si se da `latencia_respaldo`).
+    """
+    if analista_simulado:
+        def fabrica(ruta_db):
+            proveedores = [('simulado', AgenteSimulado(ruta_db, latencia_simulada))]
+            if latencia_respaldo is not None:
+                proveedores.append(('simulado_respaldo', AgenteSimulado(ruta_db, latencia_respaldo)))
+            return RouterProveedores(proveedores, tiempo_limite=tiempo_limite, hedging=hedging)
+        return fabrica
+    claves = claves_proveedores(os.environ)
+    if not claves:
+        raise SystemExit("❌ Define OPENAI_API_KEY y/o ANTHROPIC_API_KEY o usa --analista-simulado.")
+    modelos = modelos_proveedores(os.environ)
+    return lambda ruta_db: crear_router_analista(
+        ruta_db, claves, tiempo_limite=tiempo_limite, hedging=hedging, modelos=modelos
+    )
+
+
+def servir(host, puerto, reutilizar_puerto, opciones_agente):
+    aplicacion = crear_aplicacion(fabrica_agente_para(**opciones_agente))
+    web.run_app(
+        aplicacion, host=host, port=puerto, keepalive_timeout=TIEMPO_KEEPALIVE,
+        reuse_port=reutilizar_puerto, access_log=None, print=None
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP/JSON de secciones, rankings, agregados y analista.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos que comparten el puerto (SO_REUSEPORT)")
+    parser.add_argument("--analista-simulado", action="store_true", help="Usar el analista local sin LLM")
+    parser.add_argument("--latencia-simulada", type=float, default=0.0, help="Segundos que tarda el analista simulado")
+    parser.add_argument("--latencia-respaldo", type=float, help="Agrega un analista simulado de respaldo con esta latencia")
+    parser.add_argument("--tiempo-limite", type=float, default=TIEMPO_LIMITE, help="Segundos por proveedor antes del respaldo")
+    parser.add_argument("--hedging", action="store_true", help="Lanzar el respaldo si el principal supera su p95")
+    args = parser.parse_args()
+
+    # Se publica (si hace falta) antes de arrancar: los procesos solo mapean la versión vigente
+    version = asegurar_dataset_produccion(DIRECTORIO_PUBLICADOS, RUTA_DATOS_FINAL)
+    print(f"✅ API de secciones (versión {version}) en http://{args.host}:{args.puerto} con {args.procesos} proceso(s)")
+
+    opciones_agente = {
+        'analista_simulado': args.analista_simulado, 'latencia_simulada': args.latencia_simulada,
+        'latencia_respaldo': args.latencia_respaldo, 'tiempo_limite': args.tiempo_limite, 'hedging': args.hedging,
+    }
+    argumentos = (args.host, args.puerto, args.procesos > 1, opciones_agente)
+    procesos = [multiprocessing.Process(target=servir, args=argumentos, daemon=True) for _ in range(args.procesos - 1)]
+    for proceso in procesos:
+        proceso.start()
+    servir(*argumentos)
+
+
+if __name__ == "__main__":
+    main()
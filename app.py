@@ -2,24 +2,48 @@
 
 # --- CORE LIBRARIES ---
 import os
-from pathlib import Path
+import secrets
+import sqlite3
+from contextlib import closing
+
+# --- PERFIL DE ARRANQUE ---
+# Se importa primero para medir el resto de las importaciones.
+from perfil_arranque import PERFILADOR
 
 # --- DATA & ANALYSIS ---
-import pandas as pd
-import geopandas as gpd
-from sqlalchemy import create_engine
-import folium
-import matplotlib.pyplot as plt
-import mapclassify
+with PERFILADOR.fase("importar numpy/pandas"):
+    import numpy as np
+    import pandas as pd
 
 # --- STREAMLIT & VISUALIZATION ---
-import streamlit as st
-from streamlit_folium import st_folium
-
-# --- LANGCHAIN ECOSYSTEM ---
-from langchain_openai import ChatOpenAI
-from langchain_community.agent_toolkits.sql.base import create_sql_agent
-from langchain_community.utilities import SQLDatabase
+with PERFILADOR.fase("importar streamlit/folium"):
+    import streamlit as st
+    from streamlit_folium import st_folium
+
+# LangChain ya no se importa aquí: el agente se construye en segundo plano
+# (ver agente_analista.py) mientras el mapa se dibuja.
+
+# --- MÓDULOS DEL PROYECTO ---
+with PERFILADOR.fase("importar módulos del proyecto"):
+    from mapa_secciones import (
+        publicar_geometria, calcular_estilo_indicador, precalcular_estilos, crear_mapa_base, crear_capa_estilo,
+        crear_capa_zonas
+    )
+    from dataset_compartido import (
+        abrir_tabla, tabla_a_geodataframe, rutas_version, DIRECTORIO_SCRIPT, RUTA_DATOS_FINAL, DIRECTORIO_PUBLICADOS
+    )
+    from indicadores import (
+        preparar_dataset, asegurar_dataset_produccion, calcular_promedios, calcular_rankings,
+        obtener_semaforo_competitividad, construir_indice_secciones, construir_predicado_filtros, INDICADORES_MAPA,
+        leer_sketches_perfil, umbrales_desde_sketches
+    )
+    from reglas_insights import REGLAS_INSIGHTS, firma_reglas, evaluar_reglas, textos_insights
+    from filtros_secciones import firma_predicado
+    from historial_chat import (
+        HistorialChat, recortar_ventana, VENTANA_MENSAJES, MENSAJES_VISIBLES, PASO_CARGA
+    )
+    from agente_analista import crear_router_analista, claves_proveedores, modelos_proveedores, AgenteEnSegundoPlano
+    from router_proveedores import ErrorProveedores, TIEMPO_LIMITE
 
 
 # --- 1. Configuración de la Página ---
@@ -31,17 +55,11 @@ st.set_page_config(
 
 # --- 2. Funciones de Carga y Lógica (Cacheadas para Rendimiento) ---
 
-@st.cache_data
-def generar_perfil_seccion(fila, umbrales):
-    """Genera una descripción textual del perfil de una sección electoral usando umbrales pre-calculados."""
-    perfiles = []
-    if fila['porc_jovenes'] > umbrales['Jóvenes']: perfiles.append("Jóvenes")
-    if fila['porc_poblacion_migrante'] > umbrales['Migrantes']: perfiles.append("Migrantes")
-    if fila['GRAPROES'] > umbrales['Alta Escolaridad']: perfiles.append("Alta Escolaridad")
-    if fila['porc_adultos_mayores'] > umbrales['Adultos Mayores']: perfiles.append("Adultos Mayores")
-    if fila['indice_digitalizacion'] > umbrales['Alta Digitalización']: perfiles.append("Alta Digitalización")
-    return "Predominantemente " + ", ".join(perfiles) if perfiles else "Perfil Mixto / Promedio"
-
+# Las cachés se indexan por versión publicada: un refresco incremental (actualizar_secciones.py)
+# publica una versión nueva, las sesiones la leen en su siguiente rerun y las entradas de
+# versiones viejas se desalojan solas (sin reiniciar el servidor).
+VERSIONES_EN_CACHE = 2
+ESTILOS_FILTRADOS_EN_CACHE = 256
 
 def cargar_y_perfilar_datos(ruta_archivo):
     """
@@ -49,111 +67,177 @@ def cargar_y_perfilar_datos(ruta_archivo):
     consistente, y aplica el perfilamiento.
     """
     try:
-        gdf = gpd.read_file(ruta_archivo).to_crs("EPSG:4326")
-        
-               
-        # 1. Eliminamos la columna original que no es confiable.
-        if 'tasa_participacion_promedio' in gdf.columns:
-            gdf = gdf.drop(columns=['tasa_participacion_promedio'])
-            
-        # 2. Creamos nuestro nuevo y consistente "Índice de Movilización Histórica".
-        # Evitamos división por cero por si alguna lista nominal fuera 0.
-        gdf['indice_movilizacion'] = gdf.apply(
-            lambda row: row['votos_totales_acumulados'] / row['lista_nominal_promedio'] if row['lista_nominal_promedio'] > 0 else 0,
-            axis=1
-        )
-        # 3. Creamos el índice de competitividad intuitivo
-        gdf['indice_competitividad'] = 100 - gdf['competitividad']
-     
-    
-        umbrales = {
-            'Jóvenes': gdf['porc_jovenes'].quantile(0.70),
-            'Migrantes': gdf['porc_poblacion_migrante'].quantile(0.70),
-            'Alta Escolaridad': gdf['GRAPROES'].quantile(0.70),
-            'Adultos Mayores': gdf['porc_adultos_mayores'].quantile(0.70),
-            'Alta Digitalización': gdf['indice_digitalizacion'].quantile(0.70),
-        }
-        gdf['perfil_descriptivo'] = gdf.apply(generar_perfil_seccion, axis=1, umbrales=umbrales)
-        
-        return gdf
+        return preparar_dataset(ruta_archivo)
     except Exception as e:
         st.error(f"Error al cargar y perfilar los datos: {e}")
         return None
         
-@st.cache_data
-def calcular_promedios_municipales(_df):
+@st.cache_resource(max_entries=VERSIONES_EN_CACHE)
+def cargar_dataset_publicado(version_datos):
+    """Mapea en memoria la versión publicada (compartida entre procesos) y arma el GeoDataFrame."""
+    try:
+        return tabla_a_geodataframe(abrir_tabla(DIRECTORIO_PUBLICADOS, version_datos))
+    except Exception as e:
+        st.error(f"Error al abrir el dataset publicado: {e}")
+        return None
+
+@st.cache_data(max_entries=VERSIONES_EN_CACHE)
+def cargar_zonas(_gdf, version_datos):
+    """Zonas de campaña publicadas (tabla `zonas`) disueltas en un polígono por zona; None si la versión no las tiene."""
+    ruta_db = rutas_version(DIRECTORIO_PUBLICADOS, version_datos)['sqlite']
+    with closing(sqlite3.connect(f"file:{ruta_db}?mode=ro", uri=True)) as conexion:
+        try:
+            zonas = pd.read_sql("SELECT seccion, zona, secciones_en_zona FROM zonas", conexion)
+        except pd.errors.DatabaseError:
+            return None
+    secciones = _gdf[['seccion', 'geometry']].merge(zonas, on='seccion')
+    return secciones.dissolve(by='zona', aggfunc='first').reset_index()
+
+@st.cache_resource(max_entries=VERSIONES_EN_CACHE)
+def cargar_sketches_perfil(version_datos):
+    """Sketches de umbrales de perfil por partición publicados con la versión."""
+    return leer_sketches_perfil(abrir_tabla(DIRECTORIO_PUBLICADOS, version_datos))
+
+@st.cache_data(max_entries=VERSIONES_EN_CACHE)
+def calcular_promedios_municipales(_df, version_datos):
     """Calcula los promedios de las métricas clave para todo el municipio."""
-    promedios = {
-        'movilizacion': _df['indice_movilizacion'].mean(), # <-- CORREGIDO: Usa la nueva métrica
-        'competitividad': _df['indice_competitividad'].mean(),
-        'escolaridad': _df['GRAPROES'].mean(),
-        'digitalizacion': _df['indice_digitalizacion'].mean(),
-        'jovenes': _df['porc_jovenes'].mean(),
-        'adultos_mayores': _df['porc_adultos_mayores'].mean(),
-        'desocupacion': _df['tasa_desocupacion'].mean(),
-        'sin_servicios_salud': _df['porc_sin_servicios_salud'].mean()
-    }
-    return promedios
+    return calcular_promedios(_df)
     
-def obtener_semaforo_competitividad(valor):
-    """Devuelve color y descripción según el índice de competitividad."""
-    if valor >= 80:
-        return "🔥", "MUY Alta", "Campo de batalla electoral", "red"
-    elif valor >= 60:
-        return "⚡", "Alta", "Zona de disputa", "orange"
-    elif valor >= 40:
-        return "🟡", "Media", "Moderadamente disputada", "yellow"
-    else:
-        return "🛡️", "Baja", "Sección consolidada", "green"
+@st.cache_data(max_entries=VERSIONES_EN_CACHE)
+def calcular_rankings_municipales(_df, version_datos):
+    """Calcula (una vez por versión) la posición de cada sección en los rankings municipales."""
+    return calcular_rankings(_df)
+
+@st.cache_data(max_entries=VERSIONES_EN_CACHE)
+def materializar_insights(_df, version_datos, firma):
+    """Tabla sección × insight (booleana); solo se recalcula si cambian los datos o las reglas."""
+    return evaluar_reglas(_df, calcular_promedios_municipales(_df, version_datos))
+
+# Con ARRANQUE_DIFERIDO=0 el chat espera al agente antes de dibujarse (comportamiento anterior).
+ARRANQUE_DIFERIDO = os.environ.get("ARRANQUE_DIFERIDO", "1") != "0"
+# Enrutador de proveedores: con OPENAI_API_KEY y ANTHROPIC_API_KEY en secrets, Anthropic es el respaldo.
+# ANALISTA_HEDGING=1 lanza también el respaldo si el principal supera su p95 de latencia.
+# ANALISTA_MODELO / ANALISTA_MODELO_RESPALDO (secrets o entorno) cambian el modelo de cada proveedor.
+ANALISTA_HEDGING = os.environ.get("ANALISTA_HEDGING", "0") == "1"
+ANALISTA_TIEMPO_LIMITE = float(os.environ.get("ANALISTA_TIEMPO_LIMITE", TIEMPO_LIMITE))
+
+@st.cache_resource(max_entries=VERSIONES_EN_CACHE)
+def inicializar_agente(ruta_db):
+    """Lanza (una vez por proceso y versión) la construcción del agente SQL en un hilo de segundo plano."""
+    try:
+        claves = claves_proveedores(st.secrets)
+        return AgenteEnSegundoPlano(
+            crear_router_analista, ruta_db, claves,
+            tiempo_limite=ANALISTA_TIEMPO_LIMITE, hedging=ANALISTA_HEDGING,
+            modelos=modelos_proveedores(st.secrets, os.environ)
+        )
+    except Exception as e:
+        st.error(f"Error al inicializar el agente LLM: {e}")
+        return None
 
-@st.cache_resource
-def inicializar_agente(_df):
-    """Inicializa la DB y el agente SQL con el prompt estratégico."""
+def obtener_agente(arranque):
+    """Espera al agente construido en segundo plano; si su construcción falló, muestra el error."""
+    if arranque is None:
+        return None
     try:
-        df_analisis = _df.drop(columns=['geometry'], errors='ignore')
-        engine = create_engine('sqlite:///manzanillo_data.db')
-        df_analisis.to_sql('secciones', engine, index=False, if_exists='replace')
-        db = SQLDatabase(engine=engine)
-        openai_api_key = st.secrets["OPENAI_API_KEY"]
-        llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.1,api_key=openai_api_key)
-
-        # --- INICIO DEL PROMPT COMPLETO Y RESTAURADO ---
-        prompt_personalizado = """
-### Persona y Tarea Principal
-Eres "Analista Político Estratégico", un asistente de IA experto en el análisis de datos electorales y sociodemográficos de Manzanillo, Colima.
-Tu única tarea es responder a las preguntas del usuario generando y ejecutando consultas SQL sobre una tabla llamada 'secciones', y luego interpretar los resultados de forma clara y analítica.
-
-### Diccionario de Datos Clave
-Aquí tienes el significado de las columnas más importantes para tu análisis:
-- seccion: El identificador único de la sección electoral.
-- partido_dominante: El partido político con más votos históricos en la sección.
-- pct_voto_morena, pct_voto_oposicion: Porcentaje de votos para Morena y la oposición.
-- indice_movilizacion: Mide la 'productividad' de votos de una sección a lo largo del tiempo (votos acumulados / votante promedio). NO es un porcentaje. Un valor ALTO indica una movilización electoral histórica muy intensa.
-- indice_competitividad: Un puntaje de 0 a 100 que mide qué tan reñida es una elección. IMPORTANTE: un valor ALTO (cercano a 100) significa MUY COMPETITIVO. Un valor BAJO significa que un partido domina.
-- porc_jovenes: Porcentaje de la población entre 18 y 24 años.
-- porc_adultos_mayores: Porcentaje de la población mayor a 65 años.
-- indice_digitalizacion: Un puntaje de 0 a 100 que mide la adopción tecnológica (internet, PC, celular). Es un indicador de modernidad.
-- GRAPROES: Grado promedio de escolaridad en años. Un indicador socioeconómico clave.
-- porc_hogares_jefa_mujer: Porcentaje de hogares liderados por una mujer.
-- porc_poblacion_migrante: Porcentaje de residentes nacidos fuera de Colima. Indica arraigo comunitario o dinamismo poblacional.
-- tasa_desocupacion: Porcentaje de la población económicamente activa que está desempleada.
-- porc_sin_servicios_salud: Porcentaje de la población sin acceso a servicios de salud. Un indicador clave de vulnerabilidad.
-
-### Instrucciones de Salida
-1. Analiza la pregunta del usuario para entender su intención estratégica.
-2. Usa el diccionario de datos para elegir las mejores columnas para tu consulta SQL.
-3. Genera una consulta SQL en dialecto SQLite.
-4. Una vez que tengas los resultados, no te limite a mostrarlos. Escribe un resumen ejecutivo en español, explicando los hallazgos y dando recomendaciones prácticas de estrategia electoral o política pública.
-5. Si presentas una lista de secciones, usa un formato de viñetas (bullets).
-6. Siempre responde en español y actúa como un analista político experimentado.
-"""# --- FIN DEL PROMPT ---
-        
-        agente = create_sql_agent(llm=llm, db=db, agent_type="openai-tools", verbose=False, prompt_suffix=prompt_personalizado)
-        return agente
+        return arranque.obtener()
     except Exception as e:
         st.error(f"Error al inicializar el agente LLM: {e}")
         return None
 
+@st.fragment(run_every=1.0)
+def esperar_agente(arranque):
+    """Aviso mientras el agente calienta; al quedar listo se re-ejecuta la app para mostrar el chat."""
+    if arranque.listo():
+        st.rerun()
+    st.info("🔥 El analista está calentando motores... el mapa ya está disponible mientras tanto.")
+
+@st.cache_resource(max_entries=VERSIONES_EN_CACHE)
+def publicar_geometria_secciones(_gdf, version_datos):
+    """
+    Publica la geometría como GeoJSON estático y devuelve su URL (se evalúa una vez por versión;
+    la URL solo cambia si cambian la geometría o el tooltip).
+    """
+    nombre = publicar_geometria(_gdf, DIRECTORIO_SCRIPT / "static")
+    base_url = st.get_option("server.baseUrlPath").strip("/")
+    prefijo = f"/{base_url}" if base_url else ""
+    return f"{prefijo}/app/static/{nombre}"
+
+@st.cache_data(max_entries=VERSIONES_EN_CACHE)
+def precalcular_estilos_mapa(_gdf, _indice, version_datos, columnas):
+    """Pre-calcula cortes por cuantiles y clases por sección para cada indicador × etiqueta de perfil."""
+    filtros = {firma_predicado({}): None}
+    for nombre in _indice.etiquetas:
+        if nombre.startswith('perfil:'):
+            predicado = construir_predicado_filtros([nombre.removeprefix('perfil:')], [], [], {})
+            filtros[firma_predicado(predicado)] = _indice.mascara(predicado)
+    return precalcular_estilos(_gdf, columnas, filtros)
+
+@st.cache_data(max_entries=ESTILOS_FILTRADOS_EN_CACHE)
+def calcular_estilo_filtrado(_gdf, _mascara, version_datos, columna, firma_filtro):
+    """Cortes y clases de un indicador para combinaciones de filtro no pre-calculadas."""
+    return calcular_estilo_indicador(_gdf, columna, _mascara)
+
+@st.cache_resource(max_entries=VERSIONES_EN_CACHE)
+def construir_indice_filtros(_gdf, _tabla_insights, version_datos, firma, columnas_rango):
+    """Pre-calcula (una vez por versión) los bitmaps por etiqueta de perfil, insight, partido y cubeta de indicador."""
+    return construir_indice_secciones(_gdf, _tabla_insights, columnas_rango)
+
+# --- Funciones del historial de chat ---
+MENSAJE_BIENVENIDA = "Hola, soy tu analista estratégico. ¿Qué necesitas evaluar?"
+
+@st.cache_resource
+def obtener_historial_chat():
+    """Abre (una vez por proceso) el almacén SQLite del historial de conversaciones."""
+    return HistorialChat(DIRECTORIO_SCRIPT / "historial_chat.db")
+
+def identificar_conversacion():
+    """
+    Devuelve (usuario, sesión). Con usuario autenticado la sesión va en la URL para sobrevivir
+    recargas: el enlace solo abre la conversación para ese mismo usuario. Sin autenticación la
+    sesión es un token aleatorio que vive solo en session_state y nunca en la URL, así que un
+    enlace compartido no da acceso al historial (a cambio, recargar empieza una conversación nueva).
+    """
+    usuario = st.user.get("email")
+    if usuario:
+        if "sesion" not in st.query_params:
+            st.query_params["sesion"] = secrets.token_urlsafe(16)
+        return usuario, st.query_params["sesion"]
+    if "sesion" in st.query_params:
+        del st.query_params["sesion"]  # Enlaces anteriores: la sesión anónima ya no se lee de la URL
+    if "token_conversacion" not in st.session_state:
+        st.session_state.token_conversacion = secrets.token_urlsafe(16)
+    return "anonimo", st.session_state.token_conversacion
+
+def inicializar_historial(reiniciar=False):
+    """Carga en session_state solo la ventana reciente de la conversación (o la reinicia)."""
+    historial = obtener_historial_chat()
+    usuario, sesion = identificar_conversacion()
+    if reiniciar:
+        historial.limpiar(usuario, sesion)
+    st.session_state.messages = historial.ultimos(usuario, sesion, VENTANA_MENSAJES)
+    st.session_state.total_mensajes = historial.contar(usuario, sesion)
+    st.session_state.mensajes_visibles = MENSAJES_VISIBLES
+    if not st.session_state.messages:
+        agregar_mensaje("assistant", MENSAJE_BIENVENIDA)
+
+def agregar_mensaje(rol, contenido):
+    """Persiste un mensaje y lo agrega a la ventana acotada en session_state."""
+    if "messages" not in st.session_state:
+        inicializar_historial()
+    usuario, sesion = identificar_conversacion()
+    mensaje = obtener_historial_chat().agregar(usuario, sesion, rol, contenido)
+    st.session_state.messages = recortar_ventana(st.session_state.messages + [mensaje])
+    st.session_state.total_mensajes += 1
+
+def mensajes_a_mostrar():
+    """Cola visible del chat; si se pidieron mensajes anteriores a la ventana, se leen de SQLite."""
+    num_visibles = st.session_state.mensajes_visibles
+    if num_visibles <= len(st.session_state.messages):
+        return st.session_state.messages[-num_visibles:]
+    usuario, sesion = identificar_conversacion()
+    return obtener_historial_chat().ultimos(usuario, sesion, num_visibles)
+
 # --- Función búsqueda ---
 def centrar_mapa_en_seccion(gdf, seccion_id):
     """Centra el mapa en una sección específica y devuelve sus coordenadas."""
@@ -173,31 +257,93 @@ def centrar_mapa_en_seccion(gdf, seccion_id):
 st.title("Sistema de Inteligencia Electoral: Manzanillo")
 st.markdown("Analiza datos seccionales con mapas interactivos, KPIs y consultas inteligentes con IA.")
 
-DIRECTORIO_SCRIPT = Path(__file__).parent
-RUTA_DATOS_FINAL = DIRECTORIO_SCRIPT / "1_datos" / "02_procesados" / "dataset_produccion.gpkg"
-gdf_data = cargar_y_perfilar_datos(RUTA_DATOS_FINAL)
+# Solo el primer proceso (o un cambio en el archivo fuente o en las reglas) prepara y publica
+# el dataset; el resto de los workers mapea la misma versión sin reconstruir nada.
+with PERFILADOR.fase("publicar y mapear dataset"):
+    version_datos = asegurar_dataset_produccion(
+        DIRECTORIO_PUBLICADOS, RUTA_DATOS_FINAL, preparar=cargar_y_perfilar_datos
+    )
+    gdf_data = cargar_dataset_publicado(version_datos) if version_datos else None
+
+# El agente empieza a construirse ya, en paralelo al resto del script (índices, mapa).
+arranque_agente = inicializar_agente(str(rutas_version(DIRECTORIO_PUBLICADOS, version_datos)['sqlite'])) if version_datos else None
 
 if gdf_data is not None:
     # Calcular promedios municipales
-    promedios = calcular_promedios_municipales(gdf_data)
+    promedios = calcular_promedios_municipales(gdf_data, version_datos)
+    
+opciones_visualizacion = INDICADORES_MAPA
+with PERFILADOR.fase("insights e índice de filtros"):
+    tabla_insights = materializar_insights(gdf_data, version_datos, firma_reglas())
+    indice_filtros = construir_indice_filtros(
+        gdf_data, tabla_insights, version_datos, firma_reglas(), tuple(opciones_visualizacion.values())
+    )
     
 with st.sidebar:
         st.header("Controles del Mapa")  
-        perfiles_unicos = sorted(gdf_data['perfil_descriptivo'].unique())
-        opciones_filtro = ["— Mostrar Todas las Secciones —"] + perfiles_unicos
-        perfil_seleccionado = st.selectbox("Filtra secciones por Perfil Sociodemográfico:", options=opciones_filtro)
-        st.caption("Selecciona un perfil para aislarlo en el mapa.")
+        etiquetas_perfil = sorted(nombre.removeprefix('perfil:') for nombre in indice_filtros.etiquetas if nombre.startswith('perfil:'))
+        perfiles_seleccionados = st.multiselect(
+            "Filtra secciones por Perfil Sociodemográfico:",
+            options=etiquetas_perfil,
+            placeholder="Ej: Jóvenes"
+        )
+        st.caption("Muestra solo las secciones que tienen todas las etiquetas de perfil elegidas.")
+        
+        etiquetas_insights = {regla['etiqueta']: regla['id'] for regla in REGLAS_INSIGHTS}
+        insights_seleccionados = st.multiselect(
+            "Filtra por Insight Estratégico:",
+            options=list(etiquetas_insights.keys()),
+            placeholder="Ej: Prioridad salud"
+        )
+        st.caption("Muestra solo las secciones que cumplen todos los insights elegidos.")
+        
+        with st.expander("🎚️ Filtros Avanzados"):
+            partidos_seleccionados = st.multiselect(
+                "Partido dominante:",
+                options=sorted(indice_filtros.categorias['partido_dominante'].keys()),
+                placeholder="Cualquiera"
+            )
+            rangos_seleccionados = {}
+            for nombre, columna in opciones_visualizacion.items():
+                limite_inferior = float(np.floor(gdf_data[columna].min()))
+                limite_superior = float(np.ceil(gdf_data[columna].max()))
+                rango = st.slider(
+                    nombre, limite_inferior, limite_superior, (limite_inferior, limite_superior),
+                    help=f"Promedio municipal: {gdf_data[columna].mean():.1f}"
+                )
+                if rango != (limite_inferior, limite_superior):
+                    rangos_seleccionados[columna] = rango
+
+            # Umbrales de perfil (percentil 70) del municipio y, si se eligieron partidos, dentro de
+            # esas secciones: se fusionan los sketches por partición publicados, sin reordenar datos.
+            sketches_perfil = cargar_sketches_perfil(version_datos)
+            umbrales_municipio, error_umbrales = umbrales_desde_sketches(sketches_perfil)
+            tabla_umbrales = pd.DataFrame({'Municipio': umbrales_municipio})
+            if partidos_seleccionados:
+                umbrales_seleccion, error_seleccion = umbrales_desde_sketches(
+                    sketches_perfil, {'partido_dominante': partidos_seleccionados}
+                )
+                if umbrales_seleccion:
+                    tabla_umbrales['Partidos elegidos'] = pd.Series(umbrales_seleccion)
+                    error_umbrales = max(error_umbrales, error_seleccion)
+            st.markdown("**📏 Umbrales de perfil (percentil 70)**")
+            st.dataframe(tabla_umbrales.round(2), use_container_width=True)
+            st.caption(
+                "Umbrales exactos." if not error_umbrales
+                else f"Umbrales aproximados: su rango real está en 70% ± {error_umbrales:.1%}."
+            )
         
         st.divider()
               
-        opciones_visualizacion = {
-            "Índice de Movilización": "indice_movilizacion",
-            'Porcentaje Voto Morena': 'pct_voto_morena',
-            'Índice de Competitividad': 'indice_competitividad',
-            'Índice de Digitalización': 'indice_digitalizacion',
-        }
         opcion_seleccionada_nombre = st.selectbox("Visualiza por indicador electoral:", options=list(opciones_visualizacion.keys()))
         columna_a_visualizar = opciones_visualizacion[opcion_seleccionada_nombre]  
+        zonas_campana = cargar_zonas(gdf_data, version_datos)
+        mostrar_zonas = zonas_campana is not None and st.checkbox("🧭 Mostrar zonas de campaña")
+        if mostrar_zonas:
+            st.caption(
+                f"{len(zonas_campana)} zonas contiguas con perfiles similares y lista nominal balanceada. "
+                "Se reconfiguran con `python zonas_campana.py`."
+            )
         st.divider()
 
         # --- BUSCADOR DE SECCIONES CON AUTO-CENTRADO (VERSIÓN ÚNICA Y CORREGIDA) ---
@@ -301,10 +447,16 @@ with st.sidebar:
         st.header("Detalle de Sección")
         detalle_placeholder = st.empty()
 
-if perfil_seleccionado == "— Mostrar Todas las Secciones —":
-    gdf_filtrado = gdf_data
-else:
-    gdf_filtrado = gdf_data[gdf_data['perfil_descriptivo'] == perfil_seleccionado]
+# Filtro compuesto resuelto con bitmaps: el mapa recibe posiciones, no un GeoDataFrame copiado
+predicado_filtro = construir_predicado_filtros(
+    perfiles_seleccionados,
+    [etiquetas_insights[etiqueta] for etiqueta in insights_seleccionados],
+    partidos_seleccionados,
+    rangos_seleccionados
+)
+firma_filtro = firma_predicado(predicado_filtro)
+mascara_filtro = indice_filtros.mascara(predicado_filtro)
+posiciones_filtro = np.flatnonzero(mascara_filtro)
 
 col_mapa, col_chat = st.columns([2, 1])
 
@@ -312,49 +464,38 @@ col_mapa, col_chat = st.columns([2, 1])
 # BLOQUE 3: CREACIÓN DEL MAPA    
 with col_mapa:
     st.subheader("🗺️ Exploración Geoespacial")
-    st.info(f"Mostrando **{len(gdf_filtrado)}** de **{len(gdf_data)}** secciones.")
+    st.info(f"Mostrando **{len(posiciones_filtro)}** de **{len(gdf_data)}** secciones.")
     
-    # Crear el mapa base
-    m = gdf_filtrado.explore(
-        column=columna_a_visualizar, cmap='plasma', tooltip=['seccion', 'perfil_descriptivo'],
-        popup=False, legend=True, scheme='quantiles',
-        legend_kwds={'caption': opcion_seleccionada_nombre},
-        style_kwds={'stroke': True, 'color': 'black', 'weight': 0.6},
-        tiles="CartoDB positron"
-    )    
+    # Mapa base: la geometría viaja una sola vez (por URL) y su script no cambia entre reruns
+    with PERFILADOR.fase("publicar geometría y mapa base"):
+        url_geometria = publicar_geometria_secciones(gdf_data, version_datos)
+        m = crear_mapa_base(url_geometria, gdf_data.total_bounds)
+    
+    # Estilo pre-calculado: al cambiar de indicador o filtro solo se envía el arreglo de clases
+    with PERFILADOR.fase("pre-calcular estilos del mapa"):
+        estilos_mapa = precalcular_estilos_mapa(gdf_data, indice_filtros, version_datos, tuple(opciones_visualizacion.values()))
+    estilo_actual = estilos_mapa.get((columna_a_visualizar, firma_filtro))
+    if estilo_actual is None:
+        estilo_actual = calcular_estilo_filtrado(gdf_data, mascara_filtro, version_datos, columna_a_visualizar, firma_filtro)
     
     # Configuración de zoom y centro por defecto
-    zoom_personalizado = 12
+    centro_mapa, zoom_personalizado = None, None
     
     # *** LÓGICA DE CENTRADO ***
-    if 'centrar_seccion' in st.session_state:
-        centro_data = st.session_state.centrar_seccion
-        m.location = [centro_data['lat'], centro_data['lon']]
+    centro_data = st.session_state.get('centrar_seccion')
+    if centro_data is not None:
+        centro_mapa = [centro_data['lat'], centro_data['lon']]
         zoom_personalizado = 16  # Zoom más cercano para la sección específica
-        
-        # Agregar marcador especial para la sección seleccionada
-        folium.Marker(
-            location=[centro_data['lat'], centro_data['lon']],
-            icon=folium.Icon(color='red', icon='star', prefix='fa'),
-            popup=f"Sección {centro_data['seccion']} (Seleccionada)",
-            tooltip=f"Sección {centro_data['seccion']} - SELECCIONADA"
-        ).add_to(m)
     
-    # Aplicar zoom personalizado (DEBE IR DESPUÉS del centrado)
-    m.zoom_start = zoom_personalizado
-    
-    # Agregar números de sección como marcadores
-    for idx, row in gdf_filtrado.iterrows():
-        centroid = row.geometry.centroid
-        folium.Marker(
-            location=[centroid.y, centroid.x],
-            icon=folium.DivIcon(
-                icon_size=(150,36), icon_anchor=(7,20),
-                html=f'<div style="font-size: 11pt; font-weight: bold; color: #333; text-shadow: 1px 1px 2px white;">{row.seccion}</div>',
-            )
-        ).add_to(m)
+    # Capa dinámica: estilo del indicador, números de sección y marcador de la sección seleccionada
+    capa_estilo = crear_capa_estilo(gdf_data, posiciones_filtro, estilo_actual, opcion_seleccionada_nombre, centro_data)
     
-    map_data = st_folium(m, use_container_width=True, height=600)
+    with PERFILADOR.fase("render del mapa"):
+        map_data = st_folium(
+            m, use_container_width=True, height=600,
+            feature_group_to_add=[capa_estilo, crear_capa_zonas(zonas_campana)] if mostrar_zonas else capa_estilo,
+            center=centro_mapa, zoom=zoom_personalizado
+        )
 
 # --- Chat con agente ---
 with col_chat:
@@ -363,26 +504,36 @@ with col_chat:
         st.subheader("🤖 Analista Virtual Estratégico")
     with col_limpiar:
         if st.button("🗑️ Limpiar Chat", help="Borrar historial de conversación"):
-            st.session_state.messages = [{"role": "assistant", "content": "Hola, soy tu analista estratégico. ¿Qué necesitas evaluar?"}]
+            inicializar_historial(reiniciar=True)
             st.rerun()
     
-    agente_sql = inicializar_agente(gdf_data)
+    # Mientras el agente calienta en segundo plano se muestra un aviso que se refresca solo
+    agente_sql = None
+    if arranque_agente is not None and ARRANQUE_DIFERIDO and not arranque_agente.listo():
+        esperar_agente(arranque_agente)
+    else:
+        agente_sql = obtener_agente(arranque_agente)
     if agente_sql:
-        # 1. Inicializar el historial de chat si no existe
+        # 1. Inicializar el historial de chat si no existe (solo la ventana reciente)
         if "messages" not in st.session_state:
-            st.session_state.messages = [{"role": "assistant", "content": "Hola, soy tu analista estratégico. ¿Qué necesitas evaluar?"}]
+            inicializar_historial()
         
-        # 2. Mostrar todos los mensajes del historial en el contenedor
+        # 2. Mostrar solo la cola visible; los mensajes anteriores se cargan bajo demanda
         chat_container = st.container(height=400)
         with chat_container:
-            for message in st.session_state.messages:
+            visibles = mensajes_a_mostrar()
+            if st.session_state.total_mensajes > len(visibles):
+                if st.button("⬆️ Cargar mensajes anteriores", key="cargar_anteriores_btn"):
+                    st.session_state.mensajes_visibles += PASO_CARGA
+                    st.rerun()
+            for message in visibles:
                 with st.chat_message(message["role"]):
                     st.markdown(message["content"])
         
         # 3. Aceptar la entrada del usuario del cuadro de texto.
         #    Esta sección ahora SOLO agrega el mensaje del usuario y refresca.
         if prompt := st.chat_input("Ej: Secciones más competitivas..."):
-            st.session_state.messages.append({"role": "user", "content": prompt})
+            agregar_mensaje("user", prompt)
             st.rerun()
 
         # 4. NUEVA LÓGICA CENTRAL DE RESPUESTA
@@ -395,12 +546,15 @@ with col_chat:
                     with st.spinner("🔍 Analizando y formulando estrategia..."):
                         # Obtiene el último prompt del historial para enviarlo al agente
                         ultimo_prompt_usuario = st.session_state.messages[-1]["content"]
-                        response = agente_sql.invoke(ultimo_prompt_usuario)
-                        respuesta_texto = response['output']
+                        try:
+                            response = agente_sql.invoke(ultimo_prompt_usuario)
+                            respuesta_texto = response['output']
+                        except ErrorProveedores as e:
+                            respuesta_texto = f"⚠️ El analista no pudo responder: {e}. Intenta de nuevo en unos momentos."
                         st.markdown(respuesta_texto)
             
             # Agrega la respuesta del asistente al historial para que sea permanente
-            st.session_state.messages.append({"role": "assistant", "content": respuesta_texto})
+            agregar_mensaje("assistant", respuesta_texto)
 
 
 # --- INICIA EL NUEVO CÓDIGO DEL PANEL ---
@@ -457,6 +611,7 @@ with detalle_placeholder.container():
                         label=f"Competitividad ({nivel})", 
                         value=f"{indice_competitividad:.0f}/100",
                         delta=f"{(indice_competitividad - promedios['competitividad']):+.0f} vs Promedio",
+                        delta_color="off",
                         help=f"{emoji} {desc}"
                     )
             
@@ -477,13 +632,15 @@ with detalle_placeholder.container():
                     st.metric(
                         label="👨‍🎓 Jóvenes (18-24)",
                         value=f"{jovenes:.1f}%",
-                        delta=f"{(jovenes - promedios['jovenes']):+.1f}% vs Promedio"
+                        delta=f"{(jovenes - promedios['jovenes']):+.1f}% vs Promedio",
+                        delta_color="off"
                     )
                 with col2:
                     st.metric(
                         label="👴 Adultos Mayores (+65)",
                         value=f"{adultos_mayores:.1f}%",
-                        delta=f"{(adultos_mayores - promedios['adultos_mayores']):+.1f}% vs Promedio"
+                        delta=f"{(adultos_mayores - promedios['adultos_mayores']):+.1f}% vs Promedio",
+                        delta_color="off"
                     )
                 
                 st.divider()
@@ -514,13 +671,15 @@ with detalle_placeholder.container():
                     st.metric(
                         label="💼 Tasa de Desocupación",
                         value=f"{desocupacion:.1f}%",
-                        delta=f"{(desocupacion - promedios['desocupacion']):+.1f}% vs Promedio"
+                        delta=f"{(desocupacion - promedios['desocupacion']):+.1f}% vs Promedio",
+                        delta_color="inverse"
                     )
                 with col2:
                     st.metric(
                         label="🏥 Sin Servicios de Salud",
                         value=f"{sin_servicios_salud:.1f}%",
-                        delta=f"{(sin_servicios_salud - promedios['sin_servicios_salud']):+.1f}% vs Promedio"
+                        delta=f"{(sin_servicios_salud - promedios['sin_servicios_salud']):+.1f}% vs Promedio",
+                        delta_color="inverse"
                     )
         
         # --- EXPANSOR 3: CONTEXTO MUNICIPAL ---
@@ -528,8 +687,9 @@ with detalle_placeholder.container():
             st.caption("Posición de la sección dentro del municipio")
             
             # Ranking de la sección
-            ranking_movilizacion = (gdf_data['indice_movilizacion'].rank(ascending=False, method='min').loc[seccion_seleccionada_data.name]).astype(int)
-            ranking_competitividad = (gdf_data['indice_competitividad'].rank(ascending=False, method='min').loc[seccion_seleccionada_data.name]).astype(int)
+            rankings = calcular_rankings_municipales(gdf_data, version_datos)
+            ranking_movilizacion = rankings['movilizacion'].loc[seccion_seleccionada_data.name]
+            ranking_competitividad = rankings['competitividad'].loc[seccion_seleccionada_data.name]
             
             col1, col2 = st.columns(2)
             with col1:
@@ -547,42 +707,7 @@ with detalle_placeholder.container():
         
         # --- EXPANSOR 4: INSIGHTS ESTRATÉGICOS ---
         with st.expander("🎯 **Análisis Estratégico Automático**"):
-            insights = []
-            
-            # Análisis de participación
-            if movilizacion > promedios['movilizacion'] + 5:
-                insights.append("🟢 **Fortaleza:** Alta movilización cívica - Ciudadanía comprometida")
-            elif movilizacion < promedios['movilizacion'] - 5:
-                insights.append("🔴 **Oportunidad:** Baja movilización - Potencial de movilización")
-            else:
-                insights.append("🟡 **Estándar:** movilización dentro del promedio municipal")
-            
-            # Análisis de competitividad
-            if indice_competitividad >= 80:
-                insights.append("🔥 **Crítico:** Sección muy competitiva - Campo de batalla, cada voto cuenta")
-            elif indice_competitividad >= 60:
-                insights.append("⚡ **Importante:** Sección competitiva - Zona de disputa electoral")
-            elif indice_competitividad <= 30:
-                insights.append("🛡️ **Estable:** Dominio partidista consolidado")
-            
-            # Análisis tecnológico
-            if digitalizacion > promedios['digitalizacion'] + 10:
-                insights.append("📱 **Ventaja:** Alta conectividad - Estrategias digitales efectivas")
-            elif digitalizacion < promedios['digitalizacion'] - 10:
-                insights.append("📻 **Adaptación:** Baja digitalización - Enfocar en medios tradicionales")
-            
-            # Análisis demográfico
-            if jovenes > promedios['jovenes'] + 5:
-                insights.append("👨‍🎓 **Perfil:** Población joven - Mensajes de cambio y oportunidad")
-            if adultos_mayores > promedios['adultos_mayores'] + 5:
-                insights.append("👴 **Perfil:** Población envejecida - Mensajes de estabilidad y seguridad")
-            
-            # Análisis de vulnerabilidad
-            if sin_servicios_salud > promedios['sin_servicios_salud'] + 5:
-                insights.append("🏥 **Prioridad:** Vulnerabilidad en salud - Enfoque en políticas sanitarias")
-            
-            if desocupacion > promedios['desocupacion'] + 2:
-                insights.append("💼 **Preocupación:** Alta desocupación - Oportunidad para propuestas de empleo")
+            insights = textos_insights(tabla_insights.loc[seccion_seleccionada_data.name])
             
             # Mostrar insights
             for insight in insights:
@@ -598,7 +723,7 @@ with detalle_placeholder.container():
                 f"Analiza en detalle la sección {seccion_id}, incluyendo fortalezas, "
                 f"debilidades y recomendaciones estratégicas específicas basadas en todos sus indicadores"
             )
-            st.session_state.messages.append({"role": "user", "content": consulta_detallada})
+            agregar_mensaje("user", consulta_detallada)
             st.rerun()
     
     else:
@@ -616,3 +741,17 @@ with detalle_placeholder.container():
 
 # --- FINALIZA EL NUEVO CÓDIGO DEL PANEL ---
 
+
+# --- PERFIL DE ARRANQUE (diagnóstico: agregar ?perfil_arranque=1 a la URL) ---
+if "perfil_arranque" in st.query_params:
+    with st.sidebar.expander("⏱️ Perfil de Arranque", expanded=True):
+        fases_arranque = pd.DataFrame(PERFILADOR.reporte())
+        if not fases_arranque.empty:
+            st.dataframe(
+                fases_arranque.round({'inicio_s': 3, 'duracion_s': 3}),
+                hide_index=True, use_container_width=True
+            )
+        st.caption("Tiempo medido en la primera ejecución del proceso; las fases del agente corren en el hilo 'agente'.")
+        if agente_sql is not None:
+            st.markdown("**Latencia por proveedor LLM**")
+            st.dataframe(pd.DataFrame(agente_sql.resumen_latencias()).T, use_container_width=True)
@@ -0,0 +1,238 @@
+# asignar_secciones.py - Asignación masiva y en streaming de puntos georreferenciados a su sección electoral
+#
+# Uso:
+#   python asignar_secciones.py visitas.csv --salida visitas_con_seccion.csv --conteos conteos_visitas.csv
+#   python asignar_secciones.py eventos.parquet --salida eventos_secciones.parquet --col-lat lat --col-lon lng
+#   python asignar_secciones.py puntos.csv --crs EPSG:32613 --col-lat y --col-lon x --distancia-maxima 250
+
+# --- CORE LIBRARIES ---
+import argparse
+import time
+from pathlib import Path
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from pyproj import Transformer
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import abrir_tabla, tabla_a_geodataframe, RUTA_DATOS_FINAL, DIRECTORIO_PUBLICADOS
+from indicadores import asegurar_dataset_produccion
+
+
+TAMANO_BLOQUE = 100_000
+DISTANCIA_MAXIMA = 500  # metros: puntos en el borde (costa, error de GPS) se asignan a la sección más cercana
+
+# Cómo se asignó cada punto (columna `metodo_asignacion` de la salida)
+CONTENIDA, CERCANA, FUERA, SIN_COORDENADAS = 'contenida', 'cercana', 'fuera', 'sin_coordenadas'
+
+
+# --- 1. Índice Espacial de Secciones ---
+
+class AsignadorSecciones:
+    """
+    Índice STRtree sobre la geometría de las secciones (en un CRS métrico) que asigna
+    arreglos completos de puntos con operaciones vectorizadas:
+    1) punto dentro de polígono ('contenida'); si cae en un límite compartido gana la primera sección;
+    2) si no cae en ninguna, la sección más cercana a menos de `distancia_maxima` metros ('cercana');
+    3) si no, sin sección ('fuera').
+    El árbol solo resuelve cajas envolventes; la prueba exacta usa polígonos preparados,
+    mucho más rápida que evaluar el predicado dentro de la consulta del árbol.
+    """
+
+    def __init__(self, gdf, crs_puntos="EPSG:4326", distancia_maxima=DISTANCIA_MAXIMA):
+        crs_metrico = gdf.estimate_utm_crs()
+        self.secciones = gdf['seccion'].to_numpy()
+        self.geometrias = gdf.geometry.to_crs(crs_metrico).to_numpy()
+        shapely.prepare(self.geometrias)
+        self.arbol = shapely.STRtree(self.geometrias)
+        self.transformador = Transformer.from_crs(crs_puntos, crs_metrico, always_xy=True)
+        self.distancia_maxima = distancia_maxima
+
+    @staticmethod
+    def _mejor_por_punto(idx_punto, idx_seccion, distancias):
+        """De los pares (punto, sección) deja uno por punto: menor distancia y, ante empate, menor índice de sección."""
+        orden = np.lexsort((idx_seccion, distancias, idx_punto))
+        idx_punto, idx_seccion, distancias = idx_punto[orden], idx_seccion[orden], distancias[orden]
+        primeros = np.r_[True, idx_punto[1:] != idx_punto[:-1]] if len(orden) else np.zeros(0, dtype=bool)
+        return idx_punto[primeros], idx_seccion[primeros], distancias[primeros]
+
+    def asignar(self, x, y):
+        """
+        Devuelve (posicion, metodo, distancia_m) por punto; `posicion` es la fila de la
+        sección en el dataset (-1 si no se asignó). `x`/`y` vienen en el CRS de los puntos
+        (lon/lat para EPSG:4326).
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        posicion = np.full(len(x), -1, dtype=np.int64)
+        metodo = np.full(len(x), FUERA, dtype=object)
+        distancia = np.full(len(x), np.nan)
+
+        validos = np.isfinite(x) & np.isfinite(y)
+        metodo[~validos] = SIN_COORDENADAS
+        indices_validos = np.flatnonzero(validos)
+        if not len(indices_validos):
+            return posicion, metodo, distancia
+        puntos = shapely.points(*self.transformador.transform(x[validos], y[validos]))
+
+        # 1) Punto en polígono: candidatos por caja envolvente y prueba exacta con polígonos preparados
+        idx_punto, idx_seccion = self.arbol.query(puntos)
+        dentro = shapely.intersects(self.geometrias[idx_seccion], puntos[idx_punto])
+        idx_punto, idx_seccion, _ = self._mejor_por_punto(
+            idx_punto[dentro], idx_seccion[dentro], np.zeros(int(dentro.sum()))
+        )
+        contenidos = indices_validos[idx_punto]
+        posicion[contenidos] = idx_seccion
+        metodo[contenidos] = CONTENIDA
+        distancia[contenidos] = 0.0
+
+        # 2) Respaldo para los no contenidos: secciones a menos de `distancia_maxima` (ventana cuadrada
+        #    en el árbol + dwithin preparado) y, entre ellas, la más cercana
+        pendientes = np.setdiff1d(np.arange(len(puntos)), idx_punto, assume_unique=True)
+        if len(pendientes) and self.distancia_maxima:
+            d = self.distancia_maxima
+            ventanas = shapely.box(*(shapely.bounds(puntos[pendientes]).T + np.array([[-d], [-d], [d], [d]])))
+            idx_pendiente, idx_seccion = self.arbol.query(ventanas)
+            cerca = shapely.dwithin(self.geometrias[idx_seccion], puntos[pendientes[idx_pendiente]], d)
+            idx_pendiente, idx_seccion = idx_pendiente[cerca], idx_seccion[cerca]
+            distancias = shapely.distance(puntos[pendientes[idx_pendiente]], self.geometrias[idx_seccion])
+            idx_pendiente, idx_seccion, distancias = self._mejor_por_punto(idx_pendiente, idx_seccion, distancias)
+            cercanos = indices_validos[pendientes[idx_pendiente]]
+            posicion[cercanos] = idx_seccion
+            metodo[cercanos] = CERCANA
+            distancia[cercanos] = distancias
+        return posicion, metodo, distancia
+
+
+# --- 2. Lectura y Escritura por Bloques ---
+
+def leer_por_bloques(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """Itera el archivo de entrada (CSV o Parquet) en DataFrames de a lo sumo `tamano_bloque` filas."""
+    ruta = Path(ruta)
+    if ruta.suffix.lower() in ('.parquet', '.pq'):
+        for lote in pq.ParquetFile(ruta).iter_batches(batch_size=tamano_bloque):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(ruta, chunksize=tamano_bloque, low_memory=False)
+
+
+class EscritorIncremental:
+    """Agrega bloques a un CSV (encabezado solo en el primero) o a un Parquet (un row group por bloque)."""
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self.es_parquet = self.ruta.suffix.lower() in ('.parquet', '.pq')
+        self._escritor_parquet = None
+        self._esquema = None
+        self._primer_bloque = True
+
+    def escribir(self, df):
+        if self.es_parquet:
+            tabla = pa.Table.from_pandas(df, schema=self._esquema, preserve_index=False)
+            if self._escritor_parquet is None:
+                self._esquema = tabla.schema
+                self._escritor_parquet = pq.ParquetWriter(self.ruta, self._esquema)
+            self._escritor_parquet.write_table(tabla)
+        else:
+            df.to_csv(self.ruta, mode='w' if self._primer_bloque else 'a', header=self._primer_bloque, index=False)
+        self._primer_bloque = False
+
+    def cerrar(self):
+        if self._escritor_parquet is not None:
+            self._escritor_parquet.close()
+
+
+def escribir_tabla(df, ruta):
+    ruta = Path(ruta)
+    if ruta.suffix.lower() in ('.parquet', '.pq'):
+        df.to_parquet(ruta, index=False)
+    else:
+        df.to_csv(ruta, index=False)
+
+
+# --- 3. Orquestación ---
+
+def asignar_archivo(entrada, salida, conteos=None, col_lat='lat', col_lon='lon', crs="EPSG:4326",
+                    tamano_bloque=TAMANO_BLOQUE, distancia_maxima=DISTANCIA_MAXIMA):
+    """
+    Asigna cada fila de `entrada` a su sección y escribe la salida enriquecida bloque por
+    bloque (columnas `seccion`, `metodo_asignacion`, `distancia_m`). La memoria depende del
+    tamaño de bloque, no del archivo: los conteos por sección se acumulan en arreglos fijos.
+    Devuelve el DataFrame de conteos por sección (se une con `secciones` por `seccion`).
+    """
+    version = asegurar_dataset_produccion(DIRECTORIO_PUBLICADOS, RUTA_DATOS_FINAL)
+    gdf = tabla_a_geodataframe(abrir_tabla(DIRECTORIO_PUBLICADOS, version))
+    asignador = AsignadorSecciones(gdf, crs, distancia_maxima)
+
+    num_secciones = len(gdf)
+    eventos = np.zeros(num_secciones, dtype=np.int64)
+    eventos_cercanos = np.zeros(num_secciones, dtype=np.int64)
+    totales = {CONTENIDA: 0, CERCANA: 0, FUERA: 0, SIN_COORDENADAS: 0}
+
+    inicio = time.perf_counter()
+    escritor = EscritorIncremental(salida)
+    try:
+        for bloque in leer_por_bloques(entrada, tamano_bloque):
+            faltantes = [c for c in (col_lat, col_lon) if c not in bloque.columns]
+            if faltantes:
+                raise SystemExit(f"❌ Columnas de coordenadas no encontradas: {faltantes}. Usa --col-lat/--col-lon.")
+            x = pd.to_numeric(bloque[col_lon], errors='coerce').to_numpy(dtype=float)
+            y = pd.to_numeric(bloque[col_lat], errors='coerce').to_numpy(dtype=float)
+            posicion, metodo, distancia = asignador.asignar(x, y)
+
+            asignados = posicion >= 0
+            eventos += np.bincount(posicion[asignados], minlength=num_secciones)
+            eventos_cercanos += np.bincount(posicion[metodo == CERCANA], minlength=num_secciones)
+            for clave, cantidad in zip(*np.unique(metodo, return_counts=True)):
+                totales[clave] += int(cantidad)
+
+            seccion = pd.array(asignador.secciones[np.maximum(posicion, 0)], dtype='Int64')
+            seccion[~asignados] = pd.NA
+            bloque['seccion'] = seccion
+            bloque['metodo_asignacion'] = metodo
+            bloque['distancia_m'] = np.round(distancia, 1)
+            escritor.escribir(bloque)
+    finally:
+        escritor.cerrar()
+
+    tabla_conteos = pd.DataFrame({
+        'seccion': asignador.secciones,
+        'eventos': eventos,
+        'eventos_cercanos': eventos_cercanos,
+    })
+    if conteos:
+        escribir_tabla(tabla_conteos, conteos)
+
+    procesados = sum(totales.values())
+    print(
+        f"✅ {procesados:,} puntos en {time.perf_counter() - inicio:.1f}s -> {salida} | "
+        + ", ".join(f"{clave}: {cantidad:,}" for clave, cantidad in totales.items())
+    )
+    return tabla_conteos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asigna puntos georreferenciados (CSV/Parquet) a su sección electoral.")
+    parser.add_argument("entrada", help="Archivo CSV o Parquet con coordenadas")
+    parser.add_argument("--salida", help="Archivo enriquecido (default: <entrada>_secciones.<ext>)")
+    parser.add_argument("--conteos", help="Archivo de conteos por sección (CSV o Parquet)")
+    parser.add_argument("--col-lat", default="lat", help="Columna de latitud / coordenada Y (default: lat)")
+    parser.add_argument("--col-lon", default="lon", help="Columna de longitud / coordenada X (default: lon)")
+    parser.add_argument("--crs", default="EPSG:4326", help="CRS de las coordenadas de entrada (default: EPSG:4326)")
+    parser.add_argument("--tamano-bloque", type=int, default=TAMANO_BLOQUE, help="Filas por bloque")
+    parser.add_argument("--distancia-maxima", type=float, default=DISTANCIA_MAXIMA,
+                        help="Metros para asignar por cercanía los puntos fuera de toda sección (0 = desactivar)")
+    args = parser.parse_args()
+
+    entrada = Path(args.entrada)
+    salida = args.salida or entrada.with_name(f"{entrada.stem}_secciones{entrada.suffix}")
+    asignar_archivo(entrada, salida, args.conteos, args.col_lat, args.col_lon, args.crs,
+                    args.tamano_bloque, args.distancia_maxima)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# dataset_compartido.py - Dataset preparado en Arrow IPC, mapeado en memoria y compartido entre procesos
+
+# --- CORE LIBRARIES ---
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+# --- DATA & ANALYSIS ---
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.ipc
+from sqlalchemy import create_engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+
+# Rutas del proyecto: las comparten la app, la API y los scripts de línea de comandos
+DIRECTORIO_SCRIPT = Path(__file__).parent
+RUTA_DATOS_FINAL = DIRECTORIO_SCRIPT / "1_datos" / "02_procesados" / "dataset_produccion.gpkg"
+DIRECTORIO_PUBLICADOS = DIRECTORIO_SCRIPT / "1_datos" / "03_publicados"
+
+COLUMNA_GEOMETRIA_WKB = 'geometria_wkb'
+ARCHIVO_PUNTERO = 'ACTUAL.json'
+CONSERVAR_VERSIONES = 3
+COLUMNA_CLAVE = 'seccion'
+INDICE_CLAVE = 'ux_secciones_seccion'
+
+
+# --- 1. Versiones ---
+
+def calcular_version_datos(ruta_archivo):
+    """Devuelve un identificador corto del archivo fuente (tamaño + fecha de modificación)."""
+    estado = os.stat(ruta_archivo)
+    firma = f"{Path(ruta_archivo).name}:{estado.st_size}:{estado.st_mtime_ns}"
+    return hashlib.sha1(firma.encode()).hexdigest()[:12]
+
+
+def calcular_fuente(ruta_archivo, firma_extra=None):
+    """Identifica lo que origina una publicación: el archivo fuente y, opcionalmente, una firma extra."""
+    fuente = calcular_version_datos(ruta_archivo)
+    return f"{fuente}+{firma_extra}" if firma_extra else fuente
+
+
+def nueva_version():
+    """Genera un identificador de versión ordenable por fecha."""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def leer_puntero(directorio):
+    """Lee el puntero de la versión publicada ({'version', 'fuente'}) o None si no existe."""
+    try:
+        return json.loads((Path(directorio) / ARCHIVO_PUNTERO).read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _escribir_atomico(ruta, escribir):
+    """
+    Escribe en un archivo temporal y lo renombra: los lectores nunca ven archivos a medias.
+    El temporal es propio de cada proceso e hilo, así dos escritores simultáneos no se pisan.
+    """
+    ruta = Path(ruta)
+    temporal = ruta.with_name(f".{ruta.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    escribir(temporal)
+    os.replace(temporal, ruta)
+
+
+@contextmanager
+def bloqueo_publicacion(directorio):
+    """Serializa la publicación entre procesos (el primero publica, los demás reutilizan)."""
+    Path(directorio).mkdir(parents=True, exist_ok=True)
+    with open(Path(directorio) / '.publicacion.lock', 'w') as candado:
+        if fcntl is not None:
+            fcntl.flock(candado, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(candado, fcntl.LOCK_UN)
+
+
+# --- 2. Publicación ---
+
+def rutas_version(directorio, version):
+    """Rutas de los artefactos de una versión: tabla Arrow y base SQLite para el agente."""
+    directorio = Path(directorio)
+    return {
+        'arrow': directorio / f"secciones_{version}.arrow",
+        'sqlite': directorio / f"secciones_{version}.db",
+    }
+
+
+def _tabla_arrow(gdf, metadatos=None):
+    """Tabla Arrow de atributos + geometría WKB, con el CRS (y `metadatos` {clave: texto}) en los metadatos."""
+    atributos = gdf.drop(columns=[gdf.geometry.name])
+    tabla = pa.Table.from_pandas(atributos, preserve_index=False)
+    tabla = tabla.append_column(COLUMNA_GEOMETRIA_WKB, pa.array(gdf.geometry.to_wkb(), type=pa.binary()))
+    metadatos_tabla = dict(tabla.schema.metadata or {})
+    metadatos_tabla[b'crs'] = gdf.crs.to_string().encode() if gdf.crs is not None else b''
+    for clave, texto in (metadatos or {}).items():
+        metadatos_tabla[clave.encode()] = texto.encode()
+    return tabla.replace_schema_metadata(metadatos_tabla)
+
+
+def _escribir_arrow(ruta, tabla):
+    with pa.OSFile(str(ruta), 'wb') as archivo:
+        with pa.ipc.new_file(archivo, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+
+
+def _activar_version(directorio, version, fuente, **extra):
+    """Cambia el puntero a `version` de forma atómica y limpia versiones viejas."""
+    puntero = json.dumps({'version': version, 'fuente': fuente, 'publicado': time.time(), **extra})
+    _escribir_atomico(Path(directorio) / ARCHIVO_PUNTERO, lambda ruta: ruta.write_text(puntero, encoding='utf-8'))
+    limpiar_versiones_antiguas(directorio, conservar=version)
+    return version
+
+
+def publicar_dataset(gdf, directorio, fuente, tablas_extra=None, version=None, metadatos=None):
+    """
+    Publica el dataset preparado como una nueva versión:
+    - Arrow IPC sin compresión (atributos + geometría WKB) para mapearlo en memoria;
+      `metadatos` ({clave: texto}) viajan en el esquema (ver `leer_metadato`).
+    - SQLite con la tabla 'secciones' (y `tablas_extra`) lista para el agente.
+    Al final cambia el puntero de forma atómica y devuelve la versión publicada.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    version = version or nueva_version()
+    rutas = rutas_version(directorio, version)
+    atributos = gdf.drop(columns=[gdf.geometry.name])
+
+    def escribir_sqlite(ruta):
+        engine = create_engine(f'sqlite:///{ruta}')
+        atributos.to_sql('secciones', engine, index=False, if_exists='replace')
+        for nombre, df_extra in (tablas_extra or {}).items():
+            df_extra.to_sql(nombre, engine, index=False, if_exists='replace')
+        engine.dispose()
+        with closing(sqlite3.connect(ruta)) as conexion, conexion:
+            conexion.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {INDICE_CLAVE} ON secciones ({COLUMNA_CLAVE})")
+
+    _escribir_atomico(rutas['arrow'], lambda ruta: _escribir_arrow(ruta, _tabla_arrow(gdf, metadatos)))
+    _escribir_atomico(rutas['sqlite'], escribir_sqlite)
+    return _activar_version(directorio, version, fuente)
+
+
+def publicar_actualizacion(gdf, directorio, fuente, version_base, secciones_modificadas, tablas_extra=None, metadatos=None):
+    """
+    Publica una versión nueva a partir de `version_base` cuando solo cambiaron algunas secciones:
+    el Arrow (inmutable) se reescribe completo, pero la base SQLite se copia de la versión base
+    y solo recibe UPSERTs de las filas modificadas (las `tablas_extra` se reemplazan).
+    Se llama con `bloqueo_publicacion` tomado; el cambio de puntero es atómico.
+    """
+    directorio = Path(directorio)
+    version = nueva_version()
+    rutas, rutas_base = rutas_version(directorio, version), rutas_version(directorio, version_base)
+    atributos = gdf.drop(columns=[gdf.geometry.name])
+    filas = atributos[atributos[COLUMNA_CLAVE].isin(secciones_modificadas)]
+
+    def escribir_sqlite(ruta):
+        with closing(sqlite3.connect(rutas_base['sqlite'])) as origen, closing(sqlite3.connect(ruta)) as destino:
+            origen.backup(destino)
+            columnas = list(filas.columns)
+            nombres = ", ".join(f'"{c}"' for c in columnas)
+            asignaciones = ", ".join(f'"{c}" = excluded."{c}"' for c in columnas if c != COLUMNA_CLAVE)
+            with destino:
+                destino.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {INDICE_CLAVE} ON secciones ({COLUMNA_CLAVE})")
+                destino.executemany(
+                    f"INSERT INTO secciones ({nombres}) VALUES ({', '.join('?' * len(columnas))}) "
+                    f"ON CONFLICT({COLUMNA_CLAVE}) DO UPDATE SET {asignaciones}",
+                    filas.astype(object).where(filas.notna(), None).itertuples(index=False, name=None)
+                )
+                for nombre, df_extra in (tablas_extra or {}).items():
+                    df_extra.to_sql(nombre, destino, index=False, if_exists='replace')
+
+    _escribir_atomico(rutas['arrow'], lambda ruta: _escribir_arrow(ruta, _tabla_arrow(gdf, metadatos)))
+    _escribir_atomico(rutas['sqlite'], escribir_sqlite)
+    return _activar_version(directorio, version, fuente, base=version_base)
+
+
+def limpiar_versiones_antiguas(directorio, conservar, maximo=CONSERVAR_VERSIONES):
+    """Borra artefactos de versiones viejas (los procesos que aún las mapean no se ven afectados en POSIX)."""
+    versiones = sorted(
+        {ruta.stem.removeprefix('secciones_') for ruta in Path(directorio).glob('secciones_*.arrow')},
+        reverse=True
+    )
+    for version in versiones[maximo:]:
+        if version == conservar:
+            continue
+        for ruta in rutas_version(directorio, version).values():
+            ruta.unlink(missing_ok=True)
+
+
+def asegurar_publicacion(directorio, ruta_fuente, preparar, tablas_extra=None, firma_extra=None, metadatos=None):
+    """
+    Devuelve la versión vigente. Solo si no hay puntero o el archivo fuente (o `firma_extra`)
+    cambió, llama a `preparar()` (que devuelve el GeoDataFrame listo) y publica una versión
+    nueva; `tablas_extra(gdf)` devuelve las tablas adicionales para la base SQLite y
+    `metadatos(gdf)` los metadatos del esquema Arrow.
+    """
+    fuente = calcular_fuente(ruta_fuente, firma_extra)
+    puntero = leer_puntero(directorio)
+    if puntero is not None and puntero.get('fuente') == fuente:
+        return puntero['version']
+    with bloqueo_publicacion(directorio):
+        puntero = leer_puntero(directorio)  # Otro proceso pudo publicar mientras esperábamos
+        if puntero is not None and puntero.get('fuente') == fuente:
+            return puntero['version']
+        gdf = preparar()
+        if gdf is None:
+            return None
+        return publicar_dataset(
+            gdf, directorio, fuente, tablas_extra(gdf) if tablas_extra else None,
+            metadatos=metadatos(gdf) if metadatos else None
+        )
+
+
+# --- 3. Lectura sin copias ---
+
+def abrir_tabla(directorio, version):
+    """Mapea en memoria (solo lectura) la tabla Arrow de una versión publicada."""
+    fuente = pa.memory_map(str(rutas_version(directorio, version)['arrow']), 'r')
+    return pa.ipc.open_file(fuente).read_all()
+
+
+def leer_metadato(tabla, clave):
+    """Texto del metadato `clave` publicado con la tabla, o None (versiones publicadas sin él)."""
+    valor = (tabla.schema.metadata or {}).get(clave.encode())
+    return valor.decode() if valor is not None else None
+
+
+def tabla_a_dataframe(tabla):
+    """
+    Construye el DataFrame de atributos. Con `split_blocks` las columnas numéricas
+    sin nulos quedan como vistas de solo lectura sobre el archivo mapeado.
+    """
+    columnas = [c for c in tabla.column_names if c != COLUMNA_GEOMETRIA_WKB]
+    return tabla.select(columnas).to_pandas(split_blocks=True, self_destruct=False)
+
+
+def tabla_a_geodataframe(tabla):
+    """Construye el GeoDataFrame: atributos sin copia + geometría decodificada desde WKB."""
+    df = tabla_a_dataframe(tabla)
+    crs = (tabla.schema.metadata or {}).get(b'crs') or None
+    geometria = gpd.GeoSeries.from_wkb(
+        tabla.column(COLUMNA_GEOMETRIA_WKB).to_numpy(zero_copy_only=False),
+        crs=crs.decode() if crs else None
+    )
+    return gpd.GeoDataFrame(df, geometry=geometria)
@@ -0,0 +1,149 @@
+# filtros_secciones.py - Motor de filtros compuestos sobre índices de bitmaps pre-calculados
+
+# --- CORE LIBRARIES ---
+import json
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+
+
+NUM_CUBETAS = 32
+
+
+def firma_predicado(predicado):
+    """Representación canónica de un predicado (sirve como llave de caché)."""
+    return json.dumps(predicado, sort_keys=True, ensure_ascii=False)
+
+
+class IndiceBitmaps:
+    """
+    Índice de bitmaps empaquetados (1 bit por sección) para resolver filtros compuestos
+    con AND/OR/NOT bit a bit en lugar de copiar y filtrar el GeoDataFrame.
+
+    - Etiquetas: un bitmap por etiqueta (ej. 'perfil:Jóvenes', 'insight:prioridad_salud').
+    - Categorías: un bitmap por valor de cada columna categórica (ej. partido_dominante).
+    - Rangos: cada indicador se divide en cubetas por cuantiles con bitmaps acumulados;
+      las cubetas interiores del rango se resuelven con bitmaps y solo las dos cubetas
+      de frontera se comprueban valor por valor.
+
+    Predicados (dicts anidables):
+        {'y': [p1, p2, ...]}   {'o': [p1, p2, ...]}   {'no': p}
+        {'etiqueta': 'perfil:Jóvenes'}
+        {'categoria': 'partido_dominante', 'valores': ['morena', 'pan']}
+        {'rango': 'indice_competitividad', 'min': 60, 'max': None}
+    """
+
+    def __init__(self, num_filas):
+        self.num_filas = num_filas
+        self.etiquetas = {}
+        self.categorias = {}
+        self.rangos = {}
+
+    # --- Construcción ---
+
+    def _empaquetar(self, mascara):
+        return np.packbits(np.asarray(mascara, dtype=bool))
+
+    def _desde_posiciones(self, posiciones):
+        mascara = np.zeros(self.num_filas, dtype=bool)
+        mascara[posiciones] = True
+        return self._empaquetar(mascara)
+
+    @classmethod
+    def construir(cls, df, columnas_rango=(), columnas_categoria=(), etiquetas=None, num_cubetas=NUM_CUBETAS):
+        """Pre-calcula todos los bitmaps del índice a partir del DataFrame y de máscaras de etiquetas."""
+        indice = cls(len(df))
+        for nombre, mascara in (etiquetas or {}).items():
+            indice.etiquetas[nombre] = indice._empaquetar(mascara)
+
+        for columna in columnas_categoria:
+            valores = df[columna].to_numpy()
+            indice.categorias[columna] = {
+                valor: indice._empaquetar(valores == valor) for valor in np.unique(valores[~df[columna].isna().to_numpy()])
+            }
+
+        for columna in columnas_rango:
+            valores = df[columna].to_numpy(dtype=float)
+            cuantiles = np.linspace(0, 1, num_cubetas + 1)[1:-1]
+            cortes = np.unique(np.nanquantile(valores, cuantiles)) if (~np.isnan(valores)).any() else np.array([])
+            cubeta = np.searchsorted(cortes, valores, side='right')  # NaN cae en la última cubeta
+            num = len(cortes) + 1
+            miembros = [np.flatnonzero(cubeta == k) for k in range(num)]
+            acumulados = [indice._empaquetar(cubeta < k) for k in range(num + 1)]
+            indice.rangos[columna] = {
+                'valores': valores, 'cortes': cortes, 'miembros': miembros, 'acumulados': acumulados
+            }
+        return indice
+
+    # --- Primitivas ---
+
+    def todos(self):
+        return self._empaquetar(np.ones(self.num_filas, dtype=bool))
+
+    def ninguno(self):
+        return self._empaquetar(np.zeros(self.num_filas, dtype=bool))
+
+    def etiqueta(self, nombre):
+        return self.etiquetas.get(nombre, self.ninguno())
+
+    def categoria(self, columna, valores):
+        resultado = self.ninguno()
+        for valor in valores:
+            if valor in self.categorias[columna]:
+                resultado = resultado | self.categorias[columna][valor]
+        return resultado
+
+    def rango(self, columna, minimo=None, maximo=None):
+        datos = self.rangos[columna]
+        cortes, acumulados, miembros = datos['cortes'], datos['acumulados'], datos['miembros']
+        if minimo is not None and maximo is not None and minimo > maximo:
+            return self.ninguno()
+        k_min = int(np.searchsorted(cortes, minimo, side='right')) if minimo is not None else 0
+        k_max = int(np.searchsorted(cortes, maximo, side='right')) if maximo is not None else len(cortes)
+
+        # Cubetas estrictamente interiores: todas sus filas cumplen el rango
+        resultado = acumulados[k_max] & ~acumulados[k_min + 1] if k_max > k_min + 1 else self.ninguno()
+
+        # Cubetas de frontera: comprobación exacta solo sobre sus filas
+        frontera = miembros[k_min] if k_min == k_max else np.concatenate([miembros[k_min], miembros[k_max]])
+        valores = datos['valores'][frontera]
+        cumple = ~np.isnan(valores)
+        if minimo is not None:
+            cumple &= valores >= minimo
+        if maximo is not None:
+            cumple &= valores <= maximo
+        return resultado | self._desde_posiciones(frontera[cumple])
+
+    # --- Evaluación ---
+
+    def evaluar(self, predicado):
+        """Evalúa un predicado compuesto y devuelve su bitmap empaquetado."""
+        if not predicado:
+            return self.todos()
+        if 'y' in predicado:
+            resultado = self.todos()
+            for sub in predicado['y']:
+                resultado = resultado & self.evaluar(sub)
+            return resultado
+        if 'o' in predicado:
+            resultado = self.ninguno()
+            for sub in predicado['o']:
+                resultado = resultado | self.evaluar(sub)
+            return resultado
+        if 'no' in predicado:
+            return ~self.evaluar(predicado['no'])
+        if 'etiqueta' in predicado:
+            return self.etiqueta(predicado['etiqueta'])
+        if 'categoria' in predicado:
+            return self.categoria(predicado['categoria'], predicado['valores'])
+        if 'rango' in predicado:
+            return self.rango(predicado['rango'], predicado.get('min'), predicado.get('max'))
+        raise ValueError(f"Predicado no reconocido: {predicado}")
+
+    def mascara(self, predicado):
+        """Máscara booleana (una posición por sección) del predicado."""
+        return np.unpackbits(self.evaluar(predicado), count=self.num_filas).astype(bool)
+
+    def seleccionar(self, predicado):
+        """Posiciones de las secciones que cumplen el predicado."""
+        return np.flatnonzero(self.mascara(predicado))
@@ -0,0 +1,351 @@
+# generar_fichas.py - Generación masiva de fichas por sección (HTML/PDF) en paralelo
+#
+# Uso:
+#   python generar_fichas.py --salida fichas/
+#   python generar_fichas.py --secciones 254 255 --formato pdf
+#   python generar_fichas.py --perfil "Jóvenes" --procesos 8
+
+# --- CORE LIBRARIES ---
+import argparse
+import base64
+import io
+import math
+import os
+import re
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from jinja2 import Template
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import (
+    abrir_tabla, tabla_a_geodataframe, DIRECTORIO_SCRIPT, RUTA_DATOS_FINAL, DIRECTORIO_PUBLICADOS
+)
+from indicadores import (
+    asegurar_dataset_produccion, calcular_promedios, calcular_rankings, obtener_semaforo_competitividad
+)
+from reglas_insights import evaluar_reglas, textos_insights
+
+
+DIRECTORIO_CACHE = DIRECTORIO_SCRIPT / "1_datos" / "cache_mapas"
+URL_TESELAS = "https://a.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png"
+ORIGEN_MERCATOR = 20037508.342789244
+SECCIONES_POR_TAREA = 16
+
+# (etiqueta, columna, clave en promedios o None, formato, unidad, sentido)
+# sentido: 1 = más alto es mejor, -1 = más alto es peor, 0 = sin valoración (el delta no se colorea)
+METRICAS = {
+    "Indicadores Electorales": [
+        ("Movilización Electoral", 'indice_movilizacion', 'movilizacion', "{:.1f}", "%", 1),
+        ("Índice de Competitividad", 'indice_competitividad', 'competitividad', "{:.0f}", "/100", 0),
+        ("Voto Histórico Morena", 'pct_voto_morena', None, "{:.1f}", "%", 0),
+        ("Voto Histórico Oposición", 'pct_voto_oposicion', None, "{:.1f}", "%", 0),
+    ],
+    "Perfil Sociodemográfico": [
+        ("Jóvenes (18-24)", 'porc_jovenes', 'jovenes', "{:.1f}", "%", 0),
+        ("Adultos Mayores (+65)", 'porc_adultos_mayores', 'adultos_mayores', "{:.1f}", "%", 0),
+        ("Población Migrante", 'porc_poblacion_migrante', None, "{:.1f}", "%", 0),
+        ("Hogares Jefa Mujer", 'porc_hogares_jefa_mujer', None, "{:.1f}", "%", 0),
+        ("Escolaridad Promedio", 'GRAPROES', 'escolaridad', "{:.1f}", " años", 1),
+        ("Índice de Digitalización", 'indice_digitalizacion', 'digitalizacion', "{:.0f}", "/100", 1),
+        ("Tasa de Desocupación", 'tasa_desocupacion', 'desocupacion', "{:.1f}", "%", -1),
+        ("Sin Servicios de Salud", 'porc_sin_servicios_salud', 'sin_servicios_salud', "{:.1f}", "%", -1),
+    ],
+}
+
+PLANTILLA_FICHA = Template("""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Sección {{ seccion }} - Ficha Estratégica</title>
+<style>
+  body { font-family: sans-serif; color: #222; margin: 24px; }
+  h1 { margin-bottom: 0; } .perfil { color: #666; margin-top: 4px; }
+  table { border-collapse: collapse; width: 100%; margin-bottom: 16px; }
+  th, td { border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: left; }
+  td.num { text-align: right; } .pos { color: #1a7f37; } .neg { color: #c62828; }
+  .mapa { float: right; width: 42%; margin-left: 16px; }
+  @media print { body { margin: 0; } }
+</style>
+</head>
+<body>
+<img class="mapa" src="data:image/png;base64,{{ mapa_png }}" alt="Ubicación de la sección {{ seccion }}">
+<h1>Sección {{ seccion }}</h1>
+<p class="perfil">Perfil predominante: {{ perfil }}</p>
+{% if partido_dominante %}<p><b>Partido Dominante:</b> {{ partido_dominante }}</p>{% endif %}
+<p><b>Competitividad:</b> {{ semaforo[0] }} {{ semaforo[1] }} — {{ semaforo[2] }}</p>
+{% for grupo, filas in bloques.items() %}
+<h2>{{ grupo }}</h2>
+<table>
+  <tr><th>Indicador</th><th>Valor</th><th>vs Promedio Municipal</th></tr>
+  {% for fila in filas %}
+  <tr><td>{{ fila.etiqueta }}</td><td class="num">{{ fila.valor }}</td>
+      <td class="num {{ fila.clase }}">{{ fila.delta }}</td></tr>
+  {% endfor %}
+</table>
+{% endfor %}
+<h2>Contexto Municipal</h2>
+<table>
+  <tr><td>Ranking de Movilización</td><td class="num">#{{ ranking_movilizacion }} de {{ total_secciones }}</td></tr>
+  <tr><td>Ranking de Competitividad</td><td class="num">#{{ ranking_competitividad }} de {{ total_secciones }}</td></tr>
+</table>
+<h2>Análisis Estratégico Automático</h2>
+<ul>
+{% for insight in insights %}  <li>{{ insight }}</li>
+{% else %}  <li>Esta sección presenta un perfil equilibrado sin características sobresalientes.</li>
+{% endfor %}</ul>
+</body>
+</html>
+""")
+
+PLANTILLA_INDICE = Template("""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Fichas por Sección</title></head>
+<body style="font-family: sans-serif;">
+<h1>Fichas por Sección ({{ fichas|length }})</h1>
+<ul>{% for seccion, archivo in fichas %}<li><a href="{{ archivo }}">Sección {{ seccion }}</a></li>{% endfor %}</ul>
+</body></html>
+""")
+
+
+# --- 1. Mapa Base (teselas + contornos, una sola vez por versión) ---
+
+def _tesela_a_metros(x, y, z):
+    """Esquina superior izquierda de una tesela XYZ en Web Mercator."""
+    tamano = 2 * ORIGEN_MERCATOR / 2 ** z
+    return -ORIGEN_MERCATOR + x * tamano, ORIGEN_MERCATOR - y * tamano
+
+
+def descargar_mosaico(limites, directorio_cache, url=URL_TESELAS, max_teselas=4):
+    """
+    Arma el mosaico de teselas que cubre `limites` (EPSG:3857), guardando cada
+    tesela en disco para no volver a descargarla. Devuelve (imagen, extent) o None.
+    """
+    minx, miny, maxx, maxy = limites
+    z = int(np.clip(math.floor(math.log2(2 * ORIGEN_MERCATOR * max_teselas / max(maxx - minx, maxy - miny))), 1, 18))
+    tamano = 2 * ORIGEN_MERCATOR / 2 ** z
+    x0, x1 = int((minx + ORIGEN_MERCATOR) // tamano), int((maxx + ORIGEN_MERCATOR) // tamano)
+    y0, y1 = int((ORIGEN_MERCATOR - maxy) // tamano), int((ORIGEN_MERCATOR - miny) // tamano)
+
+    filas = []
+    try:
+        for y in range(y0, y1 + 1):
+            fila = []
+            for x in range(x0, x1 + 1):
+                ruta = Path(directorio_cache) / "teselas" / str(z) / str(x) / f"{y}.png"
+                if not ruta.exists():
+                    ruta.parent.mkdir(parents=True, exist_ok=True)
+                    peticion = urllib.request.Request(
+                        url.format(z=z, x=x, y=y), headers={"User-Agent": "inteligencia-electoral/1.0"}
+                    )
+                    with urllib.request.urlopen(peticion, timeout=10) as respuesta:
+                        ruta.write_bytes(respuesta.read())
+                fila.append(plt.imread(ruta)[..., :3])
+            filas.append(np.hstack(fila))
+    except OSError as e:
+        print(f"⚠️ Sin mapa base de teselas ({e}); se dibujarán solo los contornos.")
+        return None
+
+    izquierda, arriba = _tesela_a_metros(x0, y0, z)
+    derecha, abajo = _tesela_a_metros(x1 + 1, y1 + 1, z)
+    return np.vstack(filas), (izquierda, derecha, abajo, arriba)
+
+
+def preparar_mapa_base(gdf, version, directorio_cache, usar_teselas=True):
+    """Dibuja una vez el mapa municipal (teselas + contornos) y lo guarda en la caché local."""
+    directorio_cache = Path(directorio_cache)
+    directorio_cache.mkdir(parents=True, exist_ok=True)
+    ruta = directorio_cache / f"mapa_base_{version}{'' if usar_teselas else '_sin_teselas'}.npz"
+    gdf_mercator = gdf.to_crs("EPSG:3857")
+    minx, miny, maxx, maxy = gdf_mercator.total_bounds
+    margen = 0.05 * max(maxx - minx, maxy - miny)
+    encuadre = (minx - margen, maxx + margen, miny - margen, maxy + margen)
+    if ruta.exists():
+        return ruta, encuadre
+
+    mosaico = descargar_mosaico((minx, miny, maxx, maxy), directorio_cache) if usar_teselas else None
+    if usar_teselas and mosaico is None:
+        # Sin conexión: no se guarda bajo el nombre con teselas para reintentarlo la próxima vez
+        ruta = directorio_cache / f"mapa_base_{version}_sin_teselas.npz"
+    fig, ax = plt.subplots(figsize=(4, 4), dpi=100)
+    if mosaico is not None:
+        ax.imshow(mosaico[0], extent=mosaico[1], interpolation='bilinear')
+    gdf_mercator.boundary.plot(ax=ax, color='#555555', linewidth=0.4)
+    ax.set_xlim(encuadre[0], encuadre[1])
+    ax.set_ylim(encuadre[2], encuadre[3])
+    ax.set_axis_off()
+    fig.subplots_adjust(0, 0, 1, 1)
+    fig.canvas.draw()
+    imagen = np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
+    plt.close(fig)
+    np.savez(ruta, imagen=imagen)
+    return ruta, encuadre
+
+
+# --- 2. Trabajadores del Pool ---
+
+_CONTEXTO = {}
+
+
+def _inicializar_trabajador(version, contexto, ruta_mapa_base, encuadre):
+    """Cada proceso mapea el mismo Arrow publicado (sin copiar) y carga los agregados compartidos."""
+    gdf = tabla_a_geodataframe(abrir_tabla(DIRECTORIO_PUBLICADOS, version))
+    _CONTEXTO.update(contexto)
+    _CONTEXTO['gdf'] = gdf
+    _CONTEXTO['geometria_mercator'] = gdf.geometry.to_crs("EPSG:3857")
+    _CONTEXTO['mapa_base'] = np.load(ruta_mapa_base)['imagen']
+    _CONTEXTO['encuadre'] = encuadre
+
+
+def _dibujar_mapa(posicion):
+    """Mapa estático pequeño: mapa base en caché + la sección resaltada."""
+    fig, ax = plt.subplots(figsize=(4, 4), dpi=100)
+    ax.imshow(_CONTEXTO['mapa_base'], extent=_CONTEXTO['encuadre'])
+    geometria = _CONTEXTO['geometria_mercator'].iloc[[posicion]]
+    geometria.plot(ax=ax, facecolor='#d62728', edgecolor='black', linewidth=0.8, alpha=0.7)
+    ax.set_xlim(*_CONTEXTO['encuadre'][:2])
+    ax.set_ylim(*_CONTEXTO['encuadre'][2:])
+    ax.set_axis_off()
+    fig.subplots_adjust(0, 0, 1, 1)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    plt.close(fig)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _formatear_bloques(fila, promedios):
+    """
+    Valores y deltas vs promedio municipal con el mismo formato que el panel de detalle;
+    el color del delta sigue el sentido de la métrica (verde = mejor que el promedio).
+    """
+    bloques = {}
+    for grupo, metricas in METRICAS.items():
+        filas = []
+        for etiqueta, columna, clave_promedio, formato, unidad, sentido in metricas:
+            valor = fila.get(columna, 0.0)
+            delta, clase = "—", ""
+            if clave_promedio is not None:
+                diferencia = valor - promedios[clave_promedio]
+                delta = ("+" if diferencia >= 0 else "") + formato.format(diferencia) + unidad.replace("/100", "")
+                valoracion = sentido * diferencia
+                clase = "pos" if valoracion > 0 else "neg" if valoracion < 0 else ""
+            filas.append({'etiqueta': etiqueta, 'valor': formato.format(valor) + unidad, 'delta': delta, 'clase': clase})
+        bloques[grupo] = filas
+    return bloques
+
+
+def _renderizar_ficha(posicion):
+    """Genera el HTML de la ficha de la sección en la posición dada."""
+    fila = _CONTEXTO['gdf'].iloc[posicion]
+    promedios = _CONTEXTO['promedios']
+    partido = fila.get('partido_dominante')
+    insights = [
+        re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", texto)
+        for texto in textos_insights(_CONTEXTO['insights'].iloc[posicion])
+    ]
+    return PLANTILLA_FICHA.render(
+        seccion=fila['seccion'],
+        perfil=fila.get('perfil_descriptivo', 'No disponible'),
+        partido_dominante=partido.title() if isinstance(partido, str) else None,
+        semaforo=obtener_semaforo_competitividad(fila.get('indice_competitividad', 0.0)),
+        bloques=_formatear_bloques(fila, promedios),
+        ranking_movilizacion=_CONTEXTO['ranking_movilizacion'][posicion],
+        ranking_competitividad=_CONTEXTO['ranking_competitividad'][posicion],
+        total_secciones=_CONTEXTO['total_secciones'],
+        insights=insights,
+        mapa_png=_dibujar_mapa(posicion),
+    )
+
+
+def _procesar_lote(posiciones, directorio_salida, formato):
+    """Renderiza y escribe un lote de fichas; devuelve [(seccion, archivo)]."""
+    resultado = []
+    for posicion in posiciones:
+        seccion = _CONTEXTO['gdf'].iloc[posicion]['seccion']
+        html = _renderizar_ficha(posicion)
+        if formato == 'pdf':
+            from weasyprint import HTML
+            archivo = f"seccion_{seccion}.pdf"
+            HTML(string=html).write_pdf(Path(directorio_salida) / archivo)
+        else:
+            archivo = f"seccion_{seccion}.html"
+            (Path(directorio_salida) / archivo).write_text(html, encoding='utf-8')
+        resultado.append((seccion, archivo))
+    return resultado
+
+
+# --- 3. Orquestación ---
+
+def generar_fichas(directorio_salida, secciones=None, perfil=None, formato='html', procesos=None, usar_teselas=True):
+    """Genera las fichas de todas las secciones (o del subconjunto filtrado) en un pool de procesos."""
+    if formato == 'pdf':
+        try:
+            import weasyprint  # noqa: F401
+        except ImportError:
+            raise SystemExit("❌ Para generar PDF instala 'weasyprint' (pip install weasyprint).")
+
+    version = asegurar_dataset_produccion(DIRECTORIO_PUBLICADOS, RUTA_DATOS_FINAL)
+    gdf = tabla_a_geodataframe(abrir_tabla(DIRECTORIO_PUBLICADOS, version))
+
+    # Agregados municipales e insights: se calculan una vez sobre todo el municipio y se comparten
+    promedios = calcular_promedios(gdf)
+    rankings = calcular_rankings(gdf)
+    contexto = {
+        'promedios': promedios,
+        'insights': evaluar_reglas(gdf, promedios).reset_index(drop=True),
+        'ranking_movilizacion': rankings['movilizacion'].to_numpy(),
+        'ranking_competitividad': rankings['competitividad'].to_numpy(),
+        'total_secciones': len(gdf),
+    }
+
+    seleccion = np.ones(len(gdf), dtype=bool)
+    if secciones:
+        seleccion &= gdf['seccion'].isin(secciones).to_numpy()
+    if perfil:
+        seleccion &= gdf['perfil_descriptivo'].str.contains(perfil, regex=False).to_numpy()
+    posiciones = np.flatnonzero(seleccion).tolist()
+    if not posiciones:
+        print("⚠️ Ninguna sección cumple el filtro.")
+        return []
+
+    ruta_mapa_base, encuadre = preparar_mapa_base(gdf, version, DIRECTORIO_CACHE, usar_teselas)
+    directorio_salida = Path(directorio_salida)
+    directorio_salida.mkdir(parents=True, exist_ok=True)
+    lotes = [posiciones[i:i + SECCIONES_POR_TAREA] for i in range(0, len(posiciones), SECCIONES_POR_TAREA)]
+    procesos = min(procesos or os.cpu_count() or 1, len(lotes))
+
+    inicio = time.perf_counter()
+    fichas = []
+    with ProcessPoolExecutor(
+        max_workers=procesos,
+        initializer=_inicializar_trabajador,
+        initargs=(version, contexto, ruta_mapa_base, encuadre),
+    ) as pool:
+        for resultado in pool.map(_procesar_lote, lotes, [directorio_salida] * len(lotes), [formato] * len(lotes)):
+            fichas.extend(resultado)
+
+    (directorio_salida / "index.html").write_text(PLANTILLA_INDICE.render(fichas=fichas), encoding='utf-8')
+    print(f"✅ {len(fichas)} fichas generadas en {directorio_salida} ({time.perf_counter() - inicio:.1f}s, {procesos} procesos)")
+    return fichas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera fichas estratégicas imprimibles por sección electoral.")
+    parser.add_argument("--salida", default="fichas", help="Directorio de salida (default: fichas/)")
+    parser.add_argument("--secciones", nargs="*", type=int, help="Solo estas secciones")
+    parser.add_argument("--perfil", help="Solo secciones cuyo perfil contenga esta etiqueta (ej. 'Jóvenes')")
+    parser.add_argument("--formato", choices=["html", "pdf"], default="html")
+    parser.add_argument("--procesos", type=int, help="Número de procesos (default: núcleos disponibles)")
+    parser.add_argument("--sin-teselas", action="store_true", help="No descargar el mapa base de teselas")
+    args = parser.parse_args()
+    generar_fichas(args.salida, args.secciones, args.perfil, args.formato, args.procesos, not args.sin_teselas)
+
+
+if __name__ == "__main__":
+    main()
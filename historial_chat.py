@@ -0,0 +1,103 @@
+# historial_chat.py - Historial de conversación persistente (SQLite) con ventana acotada y retención
+
+# --- CORE LIBRARIES ---
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+
+VENTANA_MENSAJES = 20      # Máximo de mensajes que se conservan en session_state
+MENSAJES_VISIBLES = 10     # Mensajes que se dibujan por defecto
+PASO_CARGA = 10            # Mensajes adicionales al pulsar "Cargar anteriores"
+RETENCION_DIAS = 30        # Conversaciones sin actividad en este plazo se borran
+INTERVALO_PURGA = 3600     # Segundos mínimos entre purgas automáticas
+
+
+class HistorialChat:
+    """
+    Almacén de mensajes del chat en un archivo SQLite local, particionado por
+    usuario y sesión. La app solo mantiene en memoria una ventana acotada y
+    consulta aquí los mensajes más antiguos cuando se piden. Las conversaciones
+    inactivas más de `retencion_dias` se purgan al abrir y, como mucho una vez
+    por `INTERVALO_PURGA`, al agregar mensajes.
+    """
+
+    def __init__(self, ruta_db, retencion_dias=RETENCION_DIAS):
+        self.ruta_db = Path(ruta_db)
+        self.retencion_dias = retencion_dias
+        self._ultima_purga = 0.0
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mensajes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    usuario TEXT NOT NULL,
+                    sesion TEXT NOT NULL,
+                    rol TEXT NOT NULL,
+                    contenido TEXT NOT NULL,
+                    creado REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_mensajes_sesion ON mensajes (usuario, sesion, id)"
+            )
+        self.purgar_inactivas()
+
+    def _conectar(self):
+        """Abre una conexión nueva (una por operación: seguro entre hilos de Streamlit)."""
+        return sqlite3.connect(self.ruta_db, timeout=10)
+
+    def agregar(self, usuario, sesion, rol, contenido):
+        """Guarda un mensaje y devuelve su representación para la ventana en memoria."""
+        with closing(self._conectar()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO mensajes (usuario, sesion, rol, contenido, creado) VALUES (?, ?, ?, ?, ?)",
+                (usuario, sesion, rol, contenido, time.time())
+            )
+            mensaje = {"id": cursor.lastrowid, "role": rol, "content": contenido}
+        if time.time() - self._ultima_purga >= INTERVALO_PURGA:
+            self.purgar_inactivas()
+        return mensaje
+
+    def ultimos(self, usuario, sesion, n):
+        """Devuelve los últimos `n` mensajes de la sesión en orden cronológico."""
+        with closing(self._conectar()) as conn:
+            filas = conn.execute(
+                "SELECT id, rol, contenido FROM mensajes WHERE usuario = ? AND sesion = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (usuario, sesion, n)
+            ).fetchall()
+        return [{"id": id_, "role": rol, "content": contenido} for id_, rol, contenido in reversed(filas)]
+
+    def contar(self, usuario, sesion):
+        """Número total de mensajes guardados para la sesión."""
+        with closing(self._conectar()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM mensajes WHERE usuario = ? AND sesion = ?",
+                (usuario, sesion)
+            ).fetchone()[0]
+
+    def limpiar(self, usuario, sesion):
+        """Borra todos los mensajes de la sesión."""
+        with closing(self._conectar()) as conn, conn:
+            conn.execute("DELETE FROM mensajes WHERE usuario = ? AND sesion = ?", (usuario, sesion))
+
+    def purgar_inactivas(self):
+        """
+        Borra completas las conversaciones cuyo último mensaje es más antiguo que la retención
+        (una conversación activa no pierde su inicio). Devuelve el número de mensajes borrados.
+        """
+        self._ultima_purga = time.time()
+        limite = self._ultima_purga - self.retencion_dias * 86400
+        with closing(self._conectar()) as conn, conn:
+            return conn.execute(
+                "DELETE FROM mensajes WHERE (usuario, sesion) IN ("
+                "SELECT usuario, sesion FROM mensajes GROUP BY usuario, sesion HAVING MAX(creado) < ?)",
+                (limite,)
+            ).rowcount
+
+
+def recortar_ventana(mensajes, maximo=VENTANA_MENSAJES):
+    """Conserva solo la cola de la conversación para que la memoria por sesión no crezca."""
+    return mensajes[-maximo:] if len(mensajes) > maximo else mensajes
@@ -0,0 +1,505 @@
+# indicadores.py - Perfilamiento, promedios, rankings y publicación del dataset de producción (sin Streamlit)
+
+# --- CORE LIBRARIES ---
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import (
+    asegurar_publicacion, publicar_actualizacion, bloqueo_publicacion, leer_puntero, calcular_fuente,
+    abrir_tabla, tabla_a_geodataframe, tabla_a_dataframe, leer_metadato, calcular_version_datos, rutas_version
+)
+from filtros_secciones import IndiceBitmaps
+from sketches_cuantiles import SketchesParticionados
+from reglas_insights import firma_reglas, tablas_sql_insights
+
+
+logger = logging.getLogger("indicadores")
+
+# Indicadores que se pueden visualizar en el mapa y filtrar por rango (etiqueta -> columna)
+INDICADORES_MAPA = {
+    "Índice de Movilización": "indice_movilizacion",
+    'Porcentaje Voto Morena': 'pct_voto_morena',
+    'Índice de Competitividad': 'indice_competitividad',
+    'Índice de Digitalización': 'indice_digitalizacion',
+}
+
+
+# --- 1. Perfilamiento ---
+
+# Etiqueta de perfil -> columna cuyo percentil 70 municipal define el umbral
+COLUMNAS_PERFIL = {
+    'Jóvenes': 'porc_jovenes',
+    'Migrantes': 'porc_poblacion_migrante',
+    'Alta Escolaridad': 'GRAPROES',
+    'Adultos Mayores': 'porc_adultos_mayores',
+    'Alta Digitalización': 'indice_digitalizacion',
+}
+CUANTIL_PERFIL = 0.70
+# Columnas cuyas combinaciones de valores forman las particiones de los sketches de umbrales
+# (a escala estatal/nacional se agregan entidad, distrito, municipio...). Las ausentes se ignoran.
+COLUMNAS_PARTICION_PERFIL = ('partido_dominante',)
+METADATO_SKETCHES = 'sketches_perfil'
+
+# Columnas derivadas por fila y las columnas fuente de las que dependen
+DERIVADAS_POR_FILA = {
+    'indice_movilizacion': ('votos_totales_acumulados', 'lista_nominal_promedio'),
+    'indice_competitividad': ('competitividad',),
+}
+COLUMNAS_DERIVADAS = (*DERIVADAS_POR_FILA, 'perfil_descriptivo')
+
+
+def generar_perfil_seccion(fila, umbrales):
+    """Genera una descripción textual del perfil de una sección electoral usando umbrales pre-calculados."""
+    perfiles = []
+    if fila['porc_jovenes'] > umbrales['Jóvenes']: perfiles.append("Jóvenes")
+    if fila['porc_poblacion_migrante'] > umbrales['Migrantes']: perfiles.append("Migrantes")
+    if fila['GRAPROES'] > umbrales['Alta Escolaridad']: perfiles.append("Alta Escolaridad")
+    if fila['porc_adultos_mayores'] > umbrales['Adultos Mayores']: perfiles.append("Adultos Mayores")
+    if fila['indice_digitalizacion'] > umbrales['Alta Digitalización']: perfiles.append("Alta Digitalización")
+    return "Predominantemente " + ", ".join(perfiles) if perfiles else "Perfil Mixto / Promedio"
+
+
+def separar_etiquetas_perfil(perfil_descriptivo):
+    """Descompone un `perfil_descriptivo` en sus etiquetas individuales (ej. ['Jóvenes', 'Migrantes'])."""
+    if perfil_descriptivo.startswith("Predominantemente "):
+        return perfil_descriptivo.removeprefix("Predominantemente ").split(", ")
+    return [perfil_descriptivo]
+
+
+def construir_sketches_perfil(df):
+    """Sketches de cuantiles de las columnas de perfil, uno por partición (exactos con pocos datos)."""
+    particiones = [c for c in COLUMNAS_PARTICION_PERFIL if c in df.columns]
+    return SketchesParticionados.construir(df, COLUMNAS_PERFIL.values(), particiones)
+
+
+def umbrales_desde_sketches(sketches, filtros=None):
+    """
+    (umbrales, error_rango) del percentil 70 de cada etiqueta sobre las particiones que cumplen
+    `filtros` ({columna_particion: [valores]}; None = todo el dataset). `error_rango` es 0 en
+    modo exacto; si no, el rango real de cada umbral está en 0.70 ± error. (None, None) si la
+    selección está vacía.
+    """
+    valores, error = sketches.cuantiles(CUANTIL_PERFIL, filtros)
+    if valores is None:
+        return None, None
+    return {etiqueta: valores[columna] for etiqueta, columna in COLUMNAS_PERFIL.items()}, error
+
+
+def calcular_umbrales(gdf):
+    """Umbral municipal (percentil 70) de cada etiqueta de perfil, fusionando los sketches por partición."""
+    umbrales, _ = umbrales_desde_sketches(construir_sketches_perfil(gdf))
+    return umbrales
+
+
+def calcular_derivada(gdf, columna):
+    """Calcula una columna derivada por fila (solo depende de valores de la misma sección)."""
+    if columna == 'indice_movilizacion':
+        # Evitamos división por cero por si alguna lista nominal fuera 0.
+        return gdf.apply(
+            lambda row: row['votos_totales_acumulados'] / row['lista_nominal_promedio'] if row['lista_nominal_promedio'] > 0 else 0,
+            axis=1
+        )
+    if columna == 'indice_competitividad':
+        return 100 - gdf['competitividad']
+    raise ValueError(f"Columna derivada desconocida: {columna}")
+
+
+def preparar_dataset(ruta_archivo):
+    """
+    Carga los datos, RECALCULA una métrica de participación/movilización
+    consistente, y aplica el perfilamiento.
+    """
+    gdf = gpd.read_file(ruta_archivo).to_crs("EPSG:4326")
+
+    # 1. Eliminamos la columna original que no es confiable.
+    if 'tasa_participacion_promedio' in gdf.columns:
+        gdf = gdf.drop(columns=['tasa_participacion_promedio'])
+
+    # 2. Creamos nuestro nuevo y consistente "Índice de Movilización Histórica".
+    gdf['indice_movilizacion'] = calcular_derivada(gdf, 'indice_movilizacion')
+    # 3. Creamos el índice de competitividad intuitivo
+    gdf['indice_competitividad'] = calcular_derivada(gdf, 'indice_competitividad')
+
+    umbrales = calcular_umbrales(gdf)
+    gdf['perfil_descriptivo'] = gdf.apply(generar_perfil_seccion, axis=1, umbrales=umbrales)
+    return gdf
+
+
+# --- 2. Agregados Municipales ---
+
+def calcular_promedios(df):
+    """Calcula los promedios de las métricas clave para todo el municipio."""
+    return {
+        'movilizacion': df['indice_movilizacion'].mean(),
+        'competitividad': df['indice_competitividad'].mean(),
+        'escolaridad': df['GRAPROES'].mean(),
+        'digitalizacion': df['indice_digitalizacion'].mean(),
+        'jovenes': df['porc_jovenes'].mean(),
+        'adultos_mayores': df['porc_adultos_mayores'].mean(),
+        'desocupacion': df['tasa_desocupacion'].mean(),
+        'sin_servicios_salud': df['porc_sin_servicios_salud'].mean()
+    }
+
+
+def calcular_rankings(df):
+    """Posición de cada sección en movilización y competitividad (1 = más alta), alineada al índice."""
+    return {
+        'movilizacion': df['indice_movilizacion'].rank(ascending=False, method='min').astype(int),
+        'competitividad': df['indice_competitividad'].rank(ascending=False, method='min').astype(int),
+    }
+
+
+# --- 3. Semáforo ---
+
+def obtener_semaforo_competitividad(valor):
+    """Devuelve color y descripción según el índice de competitividad."""
+    if valor >= 80:
+        return "🔥", "MUY Alta", "Campo de batalla electoral", "red"
+    elif valor >= 60:
+        return "⚡", "Alta", "Zona de disputa", "orange"
+    elif valor >= 40:
+        return "🟡", "Media", "Moderadamente disputada", "yellow"
+    else:
+        return "🛡️", "Baja", "Sección consolidada", "green"
+
+
+# --- 4. Publicación del Dataset de Producción ---
+
+def tablas_para_agente(gdf, config_zonas=None, zonas_previas=None):
+    """
+    Tablas que se publican junto a 'secciones' para que el agente SQL las consulte (insights y zonas).
+    `zonas_previas` (sección -> zona) conserva la asignación de zonas (ver `calcular_zonas`).
+    """
+    return {
+        **tablas_sql_insights(gdf, calcular_promedios(gdf)),
+        'zonas': calcular_zonas(gdf, config_zonas, zonas_previas),
+    }
+
+
+def metadatos_para_publicar(gdf):
+    """Metadatos que viajan en el esquema Arrow de cada versión: los sketches de umbrales por partición."""
+    return {METADATO_SKETCHES: construir_sketches_perfil(gdf).a_json()}
+
+
+def leer_sketches_perfil(tabla):
+    """Sketches publicados con la versión; las versiones anteriores a ellos se recalculan desde la tabla."""
+    texto = leer_metadato(tabla, METADATO_SKETCHES)
+    if texto is not None:
+        return SketchesParticionados.desde_json(texto)
+    columnas = [c for c in (*COLUMNAS_PERFIL.values(), *COLUMNAS_PARTICION_PERFIL) if c in tabla.column_names]
+    return construir_sketches_perfil(tabla_a_dataframe(tabla.select(columnas)))
+
+
+def firma_dataset(ruta_fuente):
+    """Firma de todo lo que, además del archivo fuente, define el dataset publicado: reglas y actualizaciones."""
+    firma = f"{firma_reglas()}+{firma_config_zonas(ruta_fuente)}"
+    firma_cambios = firma_actualizaciones(ruta_fuente)
+    return f"{firma}+{firma_cambios}" if firma_cambios else firma
+
+
+def asegurar_dataset_produccion(directorio, ruta_fuente, preparar=preparar_dataset):
+    """
+    Devuelve la versión publicada vigente; la re-publica si cambió el archivo fuente,
+    las reglas de insights o la configuración de zonas (sus tablas SQL se materializan con
+    cada versión) o la bitácora de actualizaciones, que se vuelve a aplicar sobre el dataset
+    recién preparado.
+    """
+    def preparar_con_actualizaciones():
+        gdf = preparar(ruta_fuente)
+        if gdf is None:
+            return None
+        return reaplicar_actualizaciones(gdf, ruta_fuente)
+
+    return asegurar_publicacion(
+        directorio, ruta_fuente, preparar_con_actualizaciones,
+        tablas_extra=lambda gdf: tablas_para_agente(gdf, leer_config_zonas(ruta_fuente)),
+        firma_extra=firma_dataset(ruta_fuente), metadatos=metadatos_para_publicar
+    )
+
+
+# --- 5. Índice de Filtros ---
+
+def construir_indice_secciones(gdf, tabla_insights, columnas_rango=tuple(INDICADORES_MAPA.values())):
+    """Bitmaps por etiqueta de perfil, insight, partido dominante y cubeta de cada indicador."""
+    etiquetas_por_seccion = gdf['perfil_descriptivo'].map(separar_etiquetas_perfil)
+    etiquetas = {}
+    for etiqueta in sorted(set().union(*etiquetas_por_seccion)):
+        etiquetas[f"perfil:{etiqueta}"] = etiquetas_por_seccion.map(lambda tags: etiqueta in tags).to_numpy()
+    for id_insight in tabla_insights.columns:
+        etiquetas[f"insight:{id_insight}"] = tabla_insights[id_insight].to_numpy()
+    return IndiceBitmaps.construir(
+        gdf, columnas_rango=columnas_rango, columnas_categoria=['partido_dominante'], etiquetas=etiquetas
+    )
+
+
+def construir_predicado_filtros(etiquetas_perfil, ids_insights, partidos, rangos):
+    """Traduce los criterios elegidos a un predicado compuesto (AND de todos los criterios)."""
+    condiciones = [{'etiqueta': f"perfil:{etiqueta}"} for etiqueta in etiquetas_perfil]
+    condiciones += [{'etiqueta': f"insight:{id_insight}"} for id_insight in ids_insights]
+    if partidos:
+        condiciones.append({'categoria': 'partido_dominante', 'valores': list(partidos)})
+    condiciones += [{'rango': columna, 'min': minimo, 'max': maximo} for columna, (minimo, maximo) in rangos.items()]
+    return {'y': condiciones} if condiciones else {}
+
+
+# --- 6. Actualizaciones Incrementales ---
+
+def ruta_actualizaciones(ruta_fuente):
+    """Bitácora de correcciones por fila, junto al archivo fuente (ej. dataset_produccion_actualizaciones.jsonl)."""
+    ruta_fuente = Path(ruta_fuente)
+    return ruta_fuente.with_name(f"{ruta_fuente.stem}_actualizaciones.jsonl")
+
+
+def leer_actualizaciones(ruta_fuente):
+    """Lotes de correcciones registrados, en orden de aplicación."""
+    ruta = ruta_actualizaciones(ruta_fuente)
+    if not ruta.exists():
+        return []
+    with open(ruta, encoding='utf-8') as archivo:
+        return [json.loads(linea) for linea in archivo if linea.strip()]
+
+
+def firma_actualizaciones(ruta_fuente):
+    """Huella corta de la bitácora de correcciones (None si no hay ninguna)."""
+    ruta = ruta_actualizaciones(ruta_fuente)
+    if not ruta.exists():
+        return None
+    return hashlib.sha1(ruta.read_bytes()).hexdigest()[:12]
+
+
+def registrar_actualizacion(ruta_fuente, cambios, motivo=""):
+    """
+    Agrega un lote a la bitácora: una re-publicación completa lo vuelve a aplicar mientras el
+    archivo fuente sea el mismo sobre el que se registró (su versión va en el lote).
+    """
+    registros = [
+        {columna: valor for columna, valor in registro.items() if pd.notna(valor)}
+        for registro in cambios.astype(object).to_dict('records')
+    ]
+    lote = {
+        'registrado': time.time(), 'motivo': motivo, 'fuente': calcular_version_datos(ruta_fuente),
+        'cambios': registros,
+    }
+    with open(ruta_actualizaciones(ruta_fuente), 'a', encoding='utf-8') as archivo:
+        archivo.write(json.dumps(lote, ensure_ascii=False, default=_a_nativo) + "\n")
+        archivo.flush()
+        os.fsync(archivo.fileno())
+
+
+def reaplicar_actualizaciones(gdf, ruta_fuente):
+    """
+    Vuelve a aplicar la bitácora sobre el dataset recién preparado. Se omiten (con un aviso):
+    - lotes registrados sobre otra versión del archivo fuente (se regeneró: sus correcciones
+      pueden estar ya incorporadas o no corresponder);
+    - secciones que ya no existen, y lotes que no se pueden aplicar (ej. columnas eliminadas).
+    Los lotes anteriores a este registro (sin 'fuente') se aplican.
+    """
+    version_fuente = calcular_version_datos(ruta_fuente)
+    for numero, lote in enumerate(leer_actualizaciones(ruta_fuente), start=1):
+        if lote.get('fuente', version_fuente) != version_fuente:
+            logger.warning("Lote %d de la bitácora omitido: se registró sobre otra versión de %s (%s, vigente %s)",
+                           numero, Path(ruta_fuente).name, lote['fuente'], version_fuente)
+            continue
+        try:
+            gdf, resumen = aplicar_actualizaciones(gdf, pd.DataFrame(lote['cambios']), omitir_desconocidas=True)
+        except ValueError as e:
+            logger.warning("Lote %d de la bitácora omitido: %s", numero, e)
+            continue
+        if resumen['secciones_desconocidas']:
+            logger.warning("Lote %d de la bitácora: secciones inexistentes omitidas %s",
+                           numero, resumen['secciones_desconocidas'])
+    return gdf
+
+
+def _a_nativo(valor):
+    return valor.item() if isinstance(valor, np.generic) else str(valor)
+
+
+def _asignar_valores(gdf, filas, columna, valores):
+    """Escribe `valores` en las `filas` de `columna`, ampliando a float si un entero recibe decimales."""
+    if pd.api.types.is_integer_dtype(gdf[columna]):
+        valores = pd.to_numeric(pd.Series(valores)).to_numpy()
+        if not np.all(np.mod(valores, 1) == 0):
+            gdf[columna] = gdf[columna].astype(float)
+    elif pd.api.types.is_float_dtype(gdf[columna]):
+        valores = pd.to_numeric(pd.Series(valores)).to_numpy()
+    gdf.iloc[filas, gdf.columns.get_loc(columna)] = pd.Series(valores).astype(gdf[columna].dtype).to_numpy()
+
+
+def aplicar_actualizaciones(gdf, cambios, omitir_desconocidas=False):
+    """
+    Aplica correcciones por fila (`cambios`: columna 'seccion' + columnas fuente; NaN = sin cambio)
+    y recalcula solo lo que depende de ellas:
+    - columnas derivadas por fila (movilización, competitividad) únicamente en las secciones tocadas;
+    - umbrales de perfil (percentil 70 municipal) si cambió alguna columna de perfil; si los umbrales
+      se movieron se re-perfilan todas las secciones, si no solo las tocadas.
+    Los promedios, rankings e insights dependen de todo el municipio y se recalculan (vectorizados)
+    al publicar / leer cada versión.
+    Las secciones inexistentes son un error, salvo con `omitir_desconocidas` (se descartan y se
+    listan en el resumen).
+    Devuelve (gdf_actualizado, resumen).
+    """
+    columnas = [c for c in cambios.columns if c != 'seccion']
+    invalidas = [c for c in columnas if c in COLUMNAS_DERIVADAS or c == gdf.geometry.name or c not in gdf.columns]
+    if invalidas:
+        raise ValueError(f"Columnas no actualizables (derivadas, geometría o inexistentes): {invalidas}")
+    posicion_por_seccion = pd.Series(np.arange(len(gdf)), index=gdf['seccion'].to_numpy())
+    desconocidas = sorted(set(cambios['seccion']) - set(posicion_por_seccion.index))
+    if desconocidas:
+        if not omitir_desconocidas:
+            raise ValueError(f"Secciones inexistentes: {desconocidas}")
+        cambios = cambios[~cambios['seccion'].isin(desconocidas)]
+
+    gdf = gdf.copy()
+    antes = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    umbrales_antes = calcular_umbrales(gdf)
+    posiciones = posicion_por_seccion.loc[cambios['seccion'].to_numpy()].to_numpy()
+
+    for columna in columnas:
+        presentes = cambios[columna].notna().to_numpy()
+        if presentes.any():
+            _asignar_valores(gdf, posiciones[presentes], columna, cambios[columna].to_numpy()[presentes])
+
+    def filas_distintas(columnas_comparar):
+        actual = pd.DataFrame(gdf[columnas_comparar])
+        iguales = (actual == antes[columnas_comparar]) | (actual.isna() & antes[columnas_comparar].isna())
+        return np.flatnonzero(~iguales.all(axis=1).to_numpy())
+
+    filas_tocadas = filas_distintas(columnas)
+    columnas_tocadas = {c for c in columnas if len(filas_distintas([c]))}
+
+    # 1. Derivadas por fila: solo en las secciones tocadas
+    for derivada, dependencias in DERIVADAS_POR_FILA.items():
+        if columnas_tocadas & set(dependencias) and len(filas_tocadas):
+            _asignar_valores(gdf, filas_tocadas, derivada, calcular_derivada(gdf.iloc[filas_tocadas], derivada).to_numpy())
+
+    # 2. Umbrales municipales y perfiles
+    umbrales = calcular_umbrales(gdf)
+    umbrales_cambiaron = umbrales != umbrales_antes
+    filas_perfil = np.arange(len(gdf)) if umbrales_cambiaron else filas_tocadas
+    if columnas_tocadas & set(COLUMNAS_PERFIL.values()) and len(filas_perfil):
+        perfiles = gdf.iloc[filas_perfil].apply(generar_perfil_seccion, axis=1, umbrales=umbrales)
+        _asignar_valores(gdf, filas_perfil, 'perfil_descriptivo', perfiles.to_numpy())
+
+    filas_modificadas = filas_distintas(list(antes.columns))
+    resumen = {
+        'secciones_modificadas': gdf['seccion'].to_numpy()[filas_modificadas].tolist(),
+        'columnas_actualizadas': sorted(columnas_tocadas),
+        'umbrales_cambiaron': umbrales_cambiaron,
+        'perfiles_recalculados': int(len(filas_perfil)) if columnas_tocadas & set(COLUMNAS_PERFIL.values()) else 0,
+        'secciones_desconocidas': desconocidas,
+    }
+    return gdf, resumen
+
+
+def actualizar_dataset_produccion(directorio, ruta_fuente, cambios, motivo=""):
+    """
+    Refresco incremental: aplica `cambios` sobre la versión vigente, los registra en la bitácora
+    y publica una versión nueva (SQLite por UPSERT de las filas modificadas). Las sesiones abiertas
+    y la API la toman en su siguiente rerun / consulta al leer el puntero.
+    Devuelve (version, resumen).
+    """
+    asegurar_dataset_produccion(directorio, ruta_fuente)
+    with bloqueo_publicacion(directorio):
+        puntero = leer_puntero(directorio)
+        if puntero is None or puntero.get('fuente') != calcular_fuente(ruta_fuente, firma_dataset(ruta_fuente)):
+            raise RuntimeError("La versión publicada no corresponde a la fuente actual; vuelve a intentarlo.")
+        base = puntero['version']
+        gdf = tabla_a_geodataframe(abrir_tabla(directorio, base))
+        gdf, resumen = aplicar_actualizaciones(gdf, cambios)
+        if not resumen['secciones_modificadas']:
+            return base, resumen
+
+        registrar_actualizacion(ruta_fuente, cambios, motivo)
+        # Las zonas se conservan: una corrección puntual no debe reacomodar todas las zonas
+        tablas = tablas_para_agente(gdf, leer_config_zonas(ruta_fuente), leer_zonas_publicadas(directorio, base))
+        version = publicar_actualizacion(
+            gdf, directorio, calcular_fuente(ruta_fuente, firma_dataset(ruta_fuente)), base,
+            resumen['secciones_modificadas'], tablas, metadatos_para_publicar(gdf)
+        )
+    return version, resumen
+
+
+# --- 7. Zonas de Campaña ---
+
+# Configuración por defecto de la regionalización; `zonas_campana.py` la ajusta por proyecto.
+CONFIG_ZONAS = {
+    'num_zonas': 8,
+    'indicadores': list(COLUMNAS_PERFIL.values()),
+    'columna_balance': 'lista_nominal_promedio',
+    'tolerancia': 0.5,
+    'minimo_secciones': 3,
+}
+
+
+def ruta_config_zonas(ruta_fuente):
+    """Configuración de zonas junto al archivo fuente (ej. dataset_produccion_zonas.json)."""
+    ruta_fuente = Path(ruta_fuente)
+    return ruta_fuente.with_name(f"{ruta_fuente.stem}_zonas.json")
+
+
+def leer_config_zonas(ruta_fuente):
+    """Configuración vigente: la guardada junto a la fuente sobre los valores por defecto."""
+    ruta = ruta_config_zonas(ruta_fuente)
+    guardada = json.loads(ruta.read_text(encoding='utf-8')) if ruta.exists() else {}
+    return {**CONFIG_ZONAS, **guardada}
+
+
+def guardar_config_zonas(ruta_fuente, config):
+    desconocidas = set(config) - set(CONFIG_ZONAS)
+    if desconocidas:
+        raise ValueError(f"Parámetros de zonas desconocidos: {sorted(desconocidas)}")
+    ruta_config_zonas(ruta_fuente).write_text(json.dumps(config, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+def firma_config_zonas(ruta_fuente):
+    """Huella corta de la configuración vigente: cambiarla re-publica el dataset con zonas nuevas."""
+    config = json.dumps(leer_config_zonas(ruta_fuente), sort_keys=True)
+    return hashlib.sha1(config.encode()).hexdigest()[:12]
+
+
+def leer_zonas_publicadas(directorio, version):
+    """Zona de cada sección (Series indexada por sección) en la tabla `zonas` de una versión; None si no la tiene."""
+    ruta = rutas_version(directorio, version)['sqlite']
+    with closing(sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)) as conexion:
+        try:
+            zonas = pd.read_sql("SELECT seccion, zona FROM zonas", conexion)
+        except pd.errors.DatabaseError:
+            return None
+    return zonas.set_index('seccion')['zona']
+
+
+def calcular_zonas(gdf, config=None, zonas_previas=None):
+    """
+    Tabla `zonas` (sección -> zona contigua + agregados de su zona) con la configuración dada.
+    Con `zonas_previas` que cubren todas las secciones (refresco incremental) se conserva esa
+    asignación y solo se recalculan los agregados por zona; la regionalización completa corre al
+    re-publicar desde la fuente o al cambiar la configuración.
+    `regionalizacion` (y con él scipy.sparse.csgraph) se importa aquí y no al cargar el módulo:
+    la app importa `indicadores` en el arranque y solo lee la tabla ya publicada.
+    """
+    from regionalizacion import regionalizar, tabla_zonas
+    config = {**CONFIG_ZONAS, **(config or {})}
+    faltantes = [c for c in (*config['indicadores'], config['columna_balance']) if c not in gdf.columns]
+    if faltantes:
+        raise ValueError(f"Columnas inexistentes en la configuración de zonas: {faltantes}")
+    if zonas_previas is not None and gdf['seccion'].isin(zonas_previas.index).all():
+        zonas = zonas_previas.loc[gdf['seccion'].to_numpy()].to_numpy()
+    else:
+        zonas = regionalizar(
+            gdf, min(config['num_zonas'], len(gdf)), config['indicadores'], config['columna_balance'],
+            config['tolerancia'], config['minimo_secciones']
+        )
+    return tabla_zonas(gdf, zonas, config['columna_balance'], config['indicadores'])
@@ -0,0 +1,314 @@
+# mapa_secciones.py - Mapa base con geometría única y re-coloreado en el navegador
+
+# --- CORE LIBRARIES ---
+import hashlib
+import os
+from pathlib import Path
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import pandas as pd
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import CONSERVAR_VERSIONES, _escribir_atomico
+
+
+NUM_CLASES = 5
+PALETA = 'plasma'
+PALETA_ZONAS = 'tab20'
+ESTILO_BORDE = {'stroke': True, 'color': 'black', 'weight': 0.6}
+
+
+# --- 1. Publicación de la Geometría ---
+
+COLUMNAS_GEOJSON = ['seccion', 'perfil_descriptivo']  # viajan con la geometría (tooltip)
+
+
+def publicar_geometria(gdf, directorio_static, conservar=CONSERVAR_VERSIONES):
+    """
+    Escribe la geometría de las secciones como GeoJSON estático para que el navegador la
+    descargue y la conserve entre reruns. Cada feature lleva su posición 'indice' para
+    alinear los arreglos de estilo.
+
+    El nombre sale de un hash de lo que contiene el archivo (geometría, orden y campos del
+    tooltip), no de la versión de datos: una actualización que solo toca indicadores reutiliza
+    el mismo archivo y URL, así el navegador no vuelve a descargarlo ni se reconstruye el mapa
+    base. Se conservan los `conservar` archivos usados más recientemente (como las versiones
+    publicadas) y se borran los demás.
+    """
+    directorio_static = Path(directorio_static)
+    directorio_static.mkdir(parents=True, exist_ok=True)
+    capa = gdf[[*COLUMNAS_GEOJSON, 'geometry']].to_crs("EPSG:4326")
+    capa.insert(0, 'indice', np.arange(len(capa)))
+    nombre = f"secciones_{firma_geometria(capa)}.geojson"
+    ruta = directorio_static / nombre
+    try:
+        os.utime(ruta)  # Marca el archivo como en uso para la limpieza
+    except FileNotFoundError:
+        _escribir_atomico(ruta, lambda temporal: temporal.write_text(capa.to_json(), encoding='utf-8'))
+    limpiar_geometrias_antiguas(directorio_static, nombre, conservar)
+    return nombre
+
+
+def firma_geometria(capa):
+    """Hash corto del contenido del GeoJSON: WKB de cada geometría y campos del tooltip, en orden."""
+    firma = hashlib.sha1()
+    for wkb in capa.geometry.to_wkb():
+        firma.update(wkb)
+    firma.update(pd.util.hash_pandas_object(pd.DataFrame(capa[COLUMNAS_GEOJSON]), index=False).to_numpy().tobytes())
+    return firma.hexdigest()[:12]
+
+
+def limpiar_geometrias_antiguas(directorio_static, en_uso, conservar=CONSERVAR_VERSIONES):
+    """
+    Borra los GeoJSON de secciones salvo `en_uso` y los `conservar` usados más recientemente.
+    Otro proceso puede estar limpiando a la vez: los archivos que desaparecen se ignoran.
+    """
+    usados = []
+    for ruta in Path(directorio_static).glob('secciones_*.geojson'):
+        try:
+            usados.append((ruta.stat().st_mtime, ruta))
+        except FileNotFoundError:
+            continue
+    for _, ruta in sorted(usados, reverse=True)[conservar:]:
+        if ruta.name != en_uso:
+            ruta.unlink(missing_ok=True)
+
+
+# --- 2. Cortes de Clase por Indicador ---
+
+def clasificar_cuantiles(valores, k):
+    """
+    Cortes por cuantiles y clase de cada valor, idénticos a `mapclassify.Quantiles`
+    (percentiles con interpolación lineal, cortes repetidos colapsados, intervalos
+    (corte anterior, corte]). Se calcula con numpy para no importar mapclassify
+    (y su pila scipy/scikit-learn) en el arranque.
+    """
+    percentiles = np.minimum(np.arange(1, k + 1) * (100.0 / k), 100.0)
+    cortes = np.unique(np.percentile(valores, percentiles))
+    clases = np.minimum(np.searchsorted(cortes, valores, side='left'), len(cortes) - 1)
+    return clases, [float(c) for c in cortes]
+
+
+def colores_paleta(num_clases, paleta=PALETA):
+    """Colores hex de la paleta; matplotlib se importa solo cuando se necesita."""
+    from matplotlib import colormaps
+    from matplotlib.colors import to_hex
+    return [to_hex(c) for c in colormaps[paleta].resampled(num_clases)(range(num_clases))]
+
+
+def calcular_estilo_indicador(gdf, columna, mascara=None, k=NUM_CLASES):
+    """
+    Clasifica un indicador por cuantiles (como `explore(scheme='quantiles')`) sobre
+    las secciones visibles y devuelve un arreglo compacto de clases por sección.
+    Las secciones fuera del filtro (o sin dato) reciben la clase -1 (ocultas).
+    """
+    valores = gdf[columna].to_numpy(dtype=float)
+    visibles = ~np.isnan(valores)
+    if mascara is not None:
+        visibles &= np.asarray(mascara, dtype=bool)
+
+    clases = np.full(len(valores), -1, dtype=int)
+    cortes = []
+    if visibles.any():
+        k_efectivo = int(min(k, len(np.unique(valores[visibles]))))
+        if k_efectivo > 1:
+            clases[visibles], cortes = clasificar_cuantiles(valores[visibles], k_efectivo)
+        else:
+            clases[visibles] = 0
+            cortes = [float(valores[visibles].max())]
+
+    colores = colores_paleta(max(len(cortes), 1))
+    minimo = float(valores[visibles].min()) if visibles.any() else 0.0
+    return {
+        'clases': clases.tolist(),
+        'colores': colores,
+        'cortes': cortes,
+        'minimo': minimo,
+    }
+
+
+def precalcular_estilos(gdf, columnas, filtros):
+    """
+    Pre-calcula el estilo de cada combinación indicador × filtro.
+    `filtros` es un dict {nombre_filtro: máscara booleana o None}.
+    """
+    return {
+        (columna, nombre_filtro): calcular_estilo_indicador(gdf, columna, mascara)
+        for columna in columnas
+        for nombre_filtro, mascara in filtros.items()
+    }
+
+
+def generar_leyenda_html(estilo, titulo):
+    """Construye el HTML de la leyenda a partir de los cortes pre-calculados."""
+    filas = []
+    limite_inferior = estilo['minimo']
+    for color, limite_superior in zip(estilo['colores'], estilo['cortes']):
+        filas.append(
+            f'<div><span style="display:inline-block;width:12px;height:12px;'
+            f'background:{color};margin-right:6px;"></span>'
+            f'{limite_inferior:,.2f} – {limite_superior:,.2f}</div>'
+        )
+        limite_inferior = limite_superior
+    return (
+        '<div style="background:white;padding:6px 8px;border-radius:4px;'
+        'font-size:9pt;color:#333;box-shadow:0 0 4px rgba(0,0,0,0.3);">'
+        f'<b>{titulo}</b>{"".join(filas)}</div>'
+    )
+
+
+# --- 3. Elementos Leaflet ---
+
+class CapaSecciones(MacroElement):
+    """
+    Capa GeoJSON que descarga la geometría por URL una sola vez y expone
+    `window.__seccionesAplicarEstilo` para re-colorear sin reconstruir el mapa.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var estiloBorde = {{ this.estilo_borde|tojson }};
+            var capa = L.geoJSON(null, {
+                style: function(feature) {
+                    return Object.assign({fillOpacity: 0}, estiloBorde);
+                },
+                onEachFeature: function(feature, layer) {
+                    layer.bindTooltip(
+                        '<b>seccion</b> ' + feature.properties.seccion +
+                        '<br><b>perfil_descriptivo</b> ' + feature.properties.perfil_descriptivo,
+                        {sticky: true}
+                    );
+                }
+            }).addTo({{ this._parent.get_name() }});
+            window.__seccionesCapa = capa;
+            window.__seccionesAplicarEstilo = function() {
+                var estilo = window.__seccionesEstilo;
+                if (!estilo) { return; }
+                capa.eachLayer(function(layer) {
+                    var clase = estilo.clases[layer.feature.properties.indice];
+                    var visible = clase !== undefined && clase >= 0;
+                    layer.setStyle(visible
+                        ? Object.assign({fillColor: estilo.colores[clase], fillOpacity: 0.5, opacity: 1}, estiloBorde)
+                        : {fillOpacity: 0, opacity: 0});
+                    var elemento = layer.getElement && layer.getElement();
+                    if (elemento) { elemento.style.pointerEvents = visible ? 'auto' : 'none'; }
+                });
+            };
+            fetch({{ this.url|tojson }})
+                .then(function(respuesta) { return respuesta.json(); })
+                .then(function(datos) {
+                    capa.addData(datos);
+                    window.__seccionesAplicarEstilo();
+                });
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, url):
+        super().__init__()
+        self._name = 'CapaSecciones'
+        self.url = url
+        self.estilo_borde = ESTILO_BORDE
+
+
+class EstiloSecciones(MacroElement):
+    """Publica el arreglo compacto de clases/colores y la leyenda del indicador activo."""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        window.__seccionesEstilo = {{ this.estilo|tojson }};
+        if (window.__seccionesAplicarEstilo) { window.__seccionesAplicarEstilo(); }
+        if (window.__seccionesLeyenda) { window.__seccionesLeyenda.remove(); }
+        window.__seccionesLeyenda = L.control({position: 'topright'});
+        window.__seccionesLeyenda.onAdd = function() {
+            var div = L.DomUtil.create('div');
+            div.innerHTML = {{ this.leyenda_html|tojson }};
+            return div;
+        };
+        window.__seccionesLeyenda.addTo({{ this._parent._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, estilo, titulo):
+        super().__init__()
+        self._name = 'EstiloSecciones'
+        self.estilo = {'clases': estilo['clases'], 'colores': estilo['colores']}
+        self.leyenda_html = generar_leyenda_html(estilo, titulo)
+
+
+# --- 4. Construcción del Mapa ---
+
+def crear_mapa_base(url_geometria, limites):
+    """
+    Crea el mapa base (teselas + capa de secciones por URL). No depende del
+    indicador ni del filtro, por lo que su script no cambia entre reruns.
+    """
+    minx, miny, maxx, maxy = limites
+    m = folium.Map(
+        location=[(miny + maxy) / 2, (minx + maxx) / 2],
+        zoom_start=12,
+        tiles="CartoDB positron"
+    )
+    CapaSecciones(url_geometria).add_to(m)
+    m.fit_bounds([[miny, minx], [maxy, maxx]])
+    return m
+
+
+def crear_capa_estilo(gdf, posiciones, estilo, titulo, centro_data=None):
+    """
+    Crea el FeatureGroup dinámico: estilo del indicador, etiquetas de las secciones
+    visibles (`posiciones`) y el marcador de la sección centrada. Es lo único que
+    viaja al navegador al cambiar de indicador o de filtro.
+    """
+    capa = folium.FeatureGroup(name="Estilo de secciones", control=False)
+    EstiloSecciones(estilo, titulo).add_to(capa)
+
+    secciones = gdf['seccion'].to_numpy()[posiciones]
+    for seccion, geometria in zip(secciones, gdf.geometry.values[posiciones]):
+        centroid = geometria.centroid
+        folium.Marker(
+            location=[centroid.y, centroid.x],
+            icon=folium.DivIcon(
+                icon_size=(150,36), icon_anchor=(7,20),
+                html=f'<div style="font-size: 11pt; font-weight: bold; color: #333; text-shadow: 1px 1px 2px white;">{seccion}</div>',
+            )
+        ).add_to(capa)
+
+    if centro_data is not None:
+        folium.Marker(
+            location=[centro_data['lat'], centro_data['lon']],
+            icon=folium.Icon(color='red', icon='star', prefix='fa'),
+            popup=f"Sección {centro_data['seccion']} (Seleccionada)",
+            tooltip=f"Sección {centro_data['seccion']} - SELECCIONADA"
+        ).add_to(capa)
+    return capa
+
+
+def crear_capa_zonas(zonas):
+    """
+    FeatureGroup con el contorno de cada zona de campaña (`zonas`: GeoDataFrame disuelto por zona)
+    y su número. No es interactiva: los clics siguen llegando a la sección de abajo.
+    """
+    capa = folium.FeatureGroup(name="Zonas de campaña", control=False)
+    colores = dict(zip(zonas['zona'], colores_paleta(len(zonas), PALETA_ZONAS)))
+    folium.GeoJson(
+        zonas[['zona', 'geometry']].to_json(),
+        style_function=lambda feature: {
+            'color': colores[feature['properties']['zona']], 'weight': 4, 'fill': False, 'dashArray': '6 4'
+        },
+        interactive=False,
+    ).add_to(capa)
+    for zona, punto in zip(zonas['zona'], zonas.geometry.representative_point()):
+        folium.Marker(
+            location=[punto.y, punto.x],
+            interactive=False,
+            icon=folium.DivIcon(
+                icon_size=(60, 24), icon_anchor=(30, 12),
+                html=f'<div style="font-size: 12pt; font-weight: bold; color: {colores[zona]}; '
+                     f'text-shadow: 1px 1px 2px white, -1px -1px 2px white;">Z{zona}</div>',
+            )
+        ).add_to(capa)
+    return capa
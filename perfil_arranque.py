@@ -0,0 +1,95 @@
+# perfil_arranque.py - Perfilador del arranque: tiempo de importación e inicialización por fase
+
+# --- CORE LIBRARIES ---
+import argparse
+import logging
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger("perfil_arranque")
+
+# Pilas pesadas que la app importa (o difiere); el CLI mide su importación en frío.
+PILAS_PESADAS = {
+    'streamlit': 'streamlit',
+    'geopandas': 'geopandas',
+    'folium': 'folium, streamlit_folium',
+    'matplotlib': 'matplotlib',
+    'pyarrow': 'pyarrow, pyarrow.ipc',
+    'scipy': 'scipy.sparse.csgraph',
+    'langchain_openai': 'langchain_openai',
+    'langchain_community': 'langchain_community.agent_toolkits.sql.base, langchain_community.utilities',
+}
+
+
+class PerfiladorArranque:
+    """
+    Registra la duración de cada fase del arranque (importaciones, carga de datos,
+    índices, agente). Cada fase se mide solo la primera vez que ocurre en el proceso:
+    en los reruns de Streamlit las importaciones y cachés ya están resueltas y no
+    deben diluir el perfil del arranque en frío.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fases = {}
+        self._candado = threading.Lock()
+
+    @contextmanager
+    def fase(self, nombre):
+        """Mide el bloque como la fase `nombre` (solo su primera ejecución en el proceso)."""
+        if nombre in self.fases:
+            yield
+            return
+        comienzo = time.perf_counter()
+        try:
+            yield
+        finally:
+            fin = time.perf_counter()
+            with self._candado:
+                if nombre not in self.fases:
+                    self.fases[nombre] = {
+                        'fase': nombre,
+                        'inicio_s': comienzo - self.inicio,
+                        'duracion_s': fin - comienzo,
+                        'hilo': threading.current_thread().name,
+                    }
+                    logger.info("%s: %.3f s (%s)", nombre, fin - comienzo, threading.current_thread().name)
+
+    def reporte(self):
+        """Fases registradas en orden de inicio (lista de dicts)."""
+        with self._candado:
+            return sorted(self.fases.values(), key=lambda f: f['inicio_s'])
+
+
+# Instancia única por proceso: la comparten app.py, el agente y el hilo de segundo plano.
+PERFILADOR = PerfiladorArranque()
+
+
+# --- CLI: costo de importación en frío por pila ---
+
+def medir_importacion_en_frio(modulos, interprete=sys.executable):
+    """Importa `modulos` en un intérprete limpio y devuelve los segundos que tardó."""
+    codigo = f"import time; t = time.perf_counter(); import {modulos}; print(time.perf_counter() - t)"
+    salida = subprocess.run([interprete, "-c", codigo], capture_output=True, text=True, check=True)
+    return float(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el costo de importación en frío de cada pila pesada de la app.")
+    parser.add_argument("--repeticiones", type=int, default=1, help="Mediciones por pila (se reporta la mínima).")
+    args = parser.parse_args()
+
+    for nombre, modulos in PILAS_PESADAS.items():
+        try:
+            segundos = min(medir_importacion_en_frio(modulos) for _ in range(args.repeticiones))
+            print(f"{nombre:<22}{segundos:8.2f} s")
+        except subprocess.CalledProcessError:
+            print(f"{nombre:<22}{'no disponible':>10}")
+
+
+if __name__ == "__main__":
+    main()
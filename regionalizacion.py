@@ -0,0 +1,255 @@
+# regionalizacion.py - Zonas de campaña contiguas y balanceadas (SKATER con restricciones de tamaño y balance)
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import breadth_first_order, connected_components, minimum_spanning_tree
+from shapely import STRtree
+
+
+TOLERANCIA_CONTIGUIDAD = 1.0  # metros: polígonos a esta distancia se consideran vecinos (huecos de digitalización)
+PESO_BALANCE = 0.5            # peso del balance frente a la homogeneidad al elegir cada corte
+
+
+# --- 1. Grafo de Contigüidad ---
+
+def construir_grafo_contiguidad(gdf, tolerancia=TOLERANCIA_CONTIGUIDAD):
+    """
+    Aristas (i, j) con i < j entre secciones que se tocan (contigüidad tipo reina, incluye esquinas),
+    en metros (CRS UTM). Las islas se unen a su sección más cercana para que el grafo sea conexo.
+    Se construye una vez por regionalización: solo depende de la geometría, no de los indicadores.
+    """
+    geometrias = gdf.geometry.to_crs(gdf.estimate_utm_crs()).values if gdf.crs is not None else gdf.geometry.values
+    arbol = STRtree(geometrias)
+    origen, destino = arbol.query(geometrias, predicate='dwithin', distance=tolerancia)
+    aristas = np.unique(np.column_stack([origen, destino])[origen < destino], axis=0)
+
+    n = len(geometrias)
+    while True:
+        num_componentes, etiquetas = connected_components(_matriz(aristas, n), directed=False)
+        if num_componentes <= 1:
+            return aristas
+        # Une el componente más pequeño con su vecino más cercano de otro componente
+        pequeno = np.argmin(np.bincount(etiquetas))
+        dentro, fuera = np.flatnonzero(etiquetas == pequeno), np.flatnonzero(etiquetas != pequeno)
+        (cerca, lejos), distancias = STRtree(geometrias[fuera]).query_nearest(geometrias[dentro], return_distance=True)
+        mejor = np.argmin(distancias)
+        par = sorted((dentro[cerca[mejor]], fuera[lejos[mejor]]))
+        aristas = np.vstack([aristas, par])
+
+
+def _matriz(aristas, n, pesos=None):
+    pesos = np.ones(len(aristas)) if pesos is None else pesos
+    return coo_matrix((pesos, (aristas[:, 0], aristas[:, 1])), shape=(n, n)).tocsr()
+
+
+# --- 2. SKATER con Restricciones ---
+
+def _estandarizar(df, indicadores):
+    valores = df[list(indicadores)].to_numpy(dtype=float)
+    medias = np.nanmean(valores, axis=0)
+    desviaciones = np.nanstd(valores, axis=0)
+    valores = np.where(np.isnan(valores), medias, valores)
+    return (valores - medias) / np.where(desviaciones > 0, desviaciones, 1)
+
+
+def promedio_por_zona(gdf, columna_balance, num_zonas):
+    """Total de `columna_balance` que le toca a cada zona: el centro de la banda de balance."""
+    return max(gdf[columna_balance].fillna(0).sum() / num_zonas, 1e-12)
+
+
+def regionalizar(gdf, num_zonas, indicadores, columna_balance, tolerancia=0.5, minimo_secciones=1,
+                 peso_balance=PESO_BALANCE):
+    """
+    Divide las secciones en `num_zonas` zonas contiguas con perfiles similares (SKATER):
+    1. Árbol de expansión mínima del grafo de contigüidad, con la distancia entre secciones en
+       los `indicadores` estandarizados como peso.
+    2. Se corta el árbol arista por arista; cada componente lleva la cuota de zonas que le toca
+       (al inicio todas). En cada paso se evalúan todos los cortes posibles a la vez (sumas por
+       subárbol en un recorrido del árbol): el corte reparte la cuota entre ambos lados en
+       proporción a su `columna_balance`, y es factible si cada lado tiene al menos
+       `minimo_secciones` por zona y un total entre (1 ± tolerancia) × el promedio por zona por
+       cada zona de su cuota. Se elige el que más reduce la suma de cuadrados intra-zona (relativa
+       a la total) menos `peso_balance` × su desbalance. Si ningún corte cumple el balance se toma
+       el que menos lo incumple (respetando el mínimo de secciones); si ni eso es posible se
+       devuelven las zonas formadas hasta ahí.
+    3. Reparación local: secciones de frontera se mueven entre zonas vecinas hasta que todas
+       quedan dentro del balance (o ya no hay movimiento que mejore), sin romper la contigüidad.
+
+    Devuelve la zona (1..N) de cada sección.
+    """
+    n = len(gdf)
+    if not 1 <= num_zonas <= n:
+        raise ValueError(f"El número de zonas debe estar entre 1 y {n}")
+    aristas = construir_grafo_contiguidad(gdf)
+
+    atributos = _estandarizar(gdf, indicadores)
+    balance = gdf[columna_balance].fillna(0).to_numpy(dtype=float)
+    promedio_zona = promedio_por_zona(gdf, columna_balance, num_zonas)
+
+    # Árbol de expansión mínima (el epsilon evita que scipy trate pesos 0 como arista ausente)
+    pesos = np.linalg.norm(atributos[aristas[:, 0]] - atributos[aristas[:, 1]], axis=1) + 1e-9
+    arbol = minimum_spanning_tree(_matriz(aristas, n, pesos)).tocoo()
+    arbol_aristas = np.column_stack([arbol.row, arbol.col])
+
+    # Estadísticos por sección: [conteo, balance, suma de cuadrados, atributos...]
+    estadisticos = np.column_stack([np.ones(n), balance, (atributos ** 2).sum(axis=1), atributos])
+
+    def suma_cuadrados(stats):
+        return stats[:, 2] - (stats[:, 3:] ** 2).sum(axis=1) / np.maximum(stats[:, 0], 1)
+
+    def desbalance(stats, cuota):
+        # Distancia (relativa al promedio) fuera de la banda permitida para `cuota` zonas
+        por_zona = stats[:, 1] / (cuota * promedio_zona)
+        return np.maximum(np.abs(por_zona - 1) - tolerancia, 0)
+
+    suma_cuadrados_total = max(suma_cuadrados(estadisticos.sum(axis=0, keepdims=True))[0], 1e-12)
+    cuota_por_seccion = np.full(n, num_zonas)
+
+    while cuota_por_seccion.max() > 1:
+        adyacencia = _matriz(arbol_aristas, n)
+        num_actual, zonas = connected_components(adyacencia, directed=False)
+
+        # Padre y orden de recorrido de cada sección dentro de su zona (árbol enraizado)
+        padre = np.full(n, -1)
+        orden = []
+        for zona in range(num_actual):
+            raiz = np.flatnonzero(zonas == zona)[0]
+            recorrido, predecesores = breadth_first_order(adyacencia, raiz, directed=False)
+            padre[recorrido[1:]] = predecesores[recorrido[1:]]
+            orden.append(recorrido)
+        orden = np.concatenate(orden)
+
+        # Sumas por subárbol (de las hojas hacia la raíz) y totales por zona
+        subarbol = estadisticos.copy()
+        for nodo in orden[::-1]:
+            if padre[nodo] >= 0:
+                subarbol[padre[nodo]] += subarbol[nodo]
+        totales = np.zeros((num_actual, estadisticos.shape[1]))
+        np.add.at(totales, zonas, estadisticos)
+        cuotas = np.zeros(num_actual, dtype=int)
+        cuotas[zonas] = cuota_por_seccion
+
+        # Todos los cortes candidatos a la vez: la arista (nodo, padre[nodo]) separa el subárbol del resto
+        # (cada corte se evalúa con las dos cuotas enteras vecinas a la proporcional para el subárbol)
+        nodos = np.flatnonzero((padre >= 0) & (cuotas[zonas] > 1))
+        proporcion = subarbol[nodos, 1] / np.maximum(totales[zonas[nodos], 1], 1e-12) * cuotas[zonas[nodos]]
+        candidatos = np.concatenate([nodos, nodos])
+        zona_candidato = zonas[candidatos]
+        cuota = cuotas[zona_candidato]
+        lado_a = subarbol[candidatos]
+        lado_b = totales[zona_candidato] - lado_a
+        cuota_a = np.clip(np.concatenate([np.floor(proporcion), np.ceil(proporcion)]), 1, cuota - 1)
+        cuota_b = cuota - cuota_a
+
+        minimo = (lado_a[:, 0] >= cuota_a * minimo_secciones) & (lado_b[:, 0] >= cuota_b * minimo_secciones)
+        incumplimiento = desbalance(lado_a, cuota_a) + desbalance(lado_b, cuota_b)
+        homogeneidad = (
+            suma_cuadrados(totales)[zona_candidato] - suma_cuadrados(lado_a) - suma_cuadrados(lado_b)
+        ) / suma_cuadrados_total
+        dispersion = (np.abs(lado_a[:, 1] / (cuota_a * promedio_zona) - 1)
+                      + np.abs(lado_b[:, 1] / (cuota_b * promedio_zona) - 1)) / 2
+        puntaje = homogeneidad - peso_balance * dispersion
+
+        if not minimo.any():
+            break
+        factible = minimo & (incumplimiento == 0)
+        if factible.any():
+            elegido = np.flatnonzero(factible)[np.argmax(puntaje[factible])]
+        else:
+            elegido = np.flatnonzero(minimo)[np.argmin(incumplimiento[minimo])]
+
+        corte = candidatos[elegido]
+        quitar = ((arbol_aristas[:, 0] == corte) & (arbol_aristas[:, 1] == padre[corte])) | \
+                 ((arbol_aristas[:, 1] == corte) & (arbol_aristas[:, 0] == padre[corte]))
+        arbol_aristas = arbol_aristas[~quitar]
+
+        # Reparte la cuota: el lado del subárbol recibe cuota_a y el resto cuota_b
+        _, nuevas = connected_components(_matriz(arbol_aristas, n), directed=False)
+        misma_zona = zonas == zona_candidato[elegido]
+        lado_subarbol = nuevas == nuevas[corte]
+        cuota_por_seccion[misma_zona & lado_subarbol] = cuota_a[elegido]
+        cuota_por_seccion[misma_zona & ~lado_subarbol] = cuota_b[elegido]
+
+    _, zonas = connected_components(_matriz(arbol_aristas, n), directed=False)
+    zonas = _reparar_balance(
+        zonas, aristas, balance, atributos, (1 - tolerancia) * promedio_zona, (1 + tolerancia) * promedio_zona,
+        minimo_secciones
+    )
+    # Numeración estable: zonas ordenadas por su sección de menor clave
+    primera = pd.Series(gdf['seccion'].to_numpy()).groupby(zonas).min().sort_values()
+    renumerar = np.empty(len(primera), dtype=int)
+    renumerar[primera.index.to_numpy()] = np.arange(1, len(primera) + 1)
+    return renumerar[zonas]
+
+
+def _reparar_balance(zonas, aristas, balance, atributos, piso, techo, minimo_secciones, max_movimientos=None):
+    """
+    Búsqueda local (estilo max-p) sobre el resultado de SKATER: mueve secciones de frontera a la
+    zona vecina mientras eso reduzca lo que las zonas se salen de [piso, techo]. Todos los
+    movimientos posibles (cada arista entre zonas, en ambos sentidos) se evalúan a la vez; se
+    aplica el mejor que deje la zona de origen contigua y con `minimo_secciones`. Ante empates
+    se prefiere la sección más parecida al promedio de la zona destino.
+    """
+    zonas = zonas.copy()
+    n = len(zonas)
+    vecinos = _matriz(np.vstack([aristas, aristas[:, ::-1]]), n)
+    origen = np.concatenate([aristas[:, 0], aristas[:, 1]])
+    destino = np.concatenate([aristas[:, 1], aristas[:, 0]])
+
+    def fuera_de_banda(totales):
+        return np.maximum(piso - totales, 0) + np.maximum(totales - techo, 0)
+
+    for _ in range(max_movimientos or 4 * n):
+        num_zonas = zonas.max() + 1
+        totales = np.bincount(zonas, balance, minlength=num_zonas)
+        if not fuera_de_banda(totales).any():
+            break
+        conteos = np.bincount(zonas, minlength=num_zonas)
+        medias = np.zeros((num_zonas, atributos.shape[1]))
+        np.add.at(medias, zonas, atributos)
+        medias /= np.maximum(conteos, 1)[:, None]
+
+        # Movimiento: la sección `origen` pasa de su zona a la de su vecina `destino`
+        frontera = zonas[origen] != zonas[destino]
+        seccion, zona_de, zona_a = origen[frontera], zonas[origen[frontera]], zonas[destino[frontera]]
+        mejora = (
+            fuera_de_banda(totales[zona_de] - balance[seccion]) + fuera_de_banda(totales[zona_a] + balance[seccion])
+            - fuera_de_banda(totales[zona_de]) - fuera_de_banda(totales[zona_a])
+        )
+        validos = (mejora < 0) & (conteos[zona_de] > minimo_secciones)
+        if not validos.any():
+            break
+        parecido = np.linalg.norm(atributos[seccion] - medias[zona_a], axis=1)
+        movido = False
+        for k in np.flatnonzero(validos)[np.lexsort((parecido[validos], mejora[validos]))]:
+            # La zona de origen debe seguir siendo contigua sin la sección
+            restantes = np.flatnonzero((zonas == zona_de[k]) & (np.arange(n) != seccion[k]))
+            num_partes, _ = connected_components(vecinos[restantes][:, restantes], directed=False)
+            if num_partes == 1:
+                zonas[seccion[k]] = zona_a[k]
+                movido = True
+                break
+        if not movido:
+            break
+    return zonas
+
+
+# --- 3. Tablas de Resultado ---
+
+def resumir_zonas(gdf, zonas, columna_balance, indicadores):
+    """Una fila por zona: secciones, total de `columna_balance` y promedio de cada indicador."""
+    df = pd.DataFrame(gdf[[columna_balance, *indicadores]]).assign(zona=zonas)
+    resumen = df.groupby('zona').agg(
+        secciones=(columna_balance, 'size'), **{f'{columna_balance}_total': (columna_balance, 'sum')},
+        **{f'{indicador}_promedio': (indicador, 'mean') for indicador in indicadores}
+    )
+    return resumen.reset_index()
+
+
+def tabla_zonas(gdf, zonas, columna_balance, indicadores):
+    """Tabla `zonas` para el agente: zona de cada sección junto con los agregados de su zona."""
+    resumen = resumir_zonas(gdf, zonas, columna_balance, indicadores)
+    resumen = resumen.rename(columns={'secciones': 'secciones_en_zona'})
+    return pd.DataFrame({'seccion': gdf['seccion'].to_numpy(), 'zona': zonas}).merge(resumen, on='zona', how='left')
@@ -0,0 +1,118 @@
+# reglas_insights.py - Reglas declarativas del "Análisis Estratégico Automático", evaluadas para todas las secciones
+
+# --- CORE LIBRARIES ---
+import hashlib
+import json
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import pandas as pd
+
+
+# Cada regla compara una columna contra un umbral absoluto (`valor`) o contra el promedio
+# municipal (`promedio` + `desplazamiento`). Dentro de un mismo `grupo` las reglas se evalúan
+# en orden y solo la primera que se cumple queda activa (if/elif); `resto` actúa como else.
+REGLAS_INSIGHTS = [
+    # Análisis de participación
+    {'id': 'fortaleza_movilizacion', 'grupo': 'movilizacion', 'etiqueta': 'Alta movilización',
+     'columna': 'indice_movilizacion', 'operador': '>', 'promedio': 'movilizacion', 'desplazamiento': 5,
+     'texto': "🟢 **Fortaleza:** Alta movilización cívica - Ciudadanía comprometida"},
+    {'id': 'oportunidad_movilizacion', 'grupo': 'movilizacion', 'etiqueta': 'Baja movilización',
+     'columna': 'indice_movilizacion', 'operador': '<', 'promedio': 'movilizacion', 'desplazamiento': -5,
+     'texto': "🔴 **Oportunidad:** Baja movilización - Potencial de movilización"},
+    {'id': 'estandar_movilizacion', 'grupo': 'movilizacion', 'etiqueta': 'Movilización promedio',
+     'resto': True,
+     'texto': "🟡 **Estándar:** movilización dentro del promedio municipal"},
+    # Análisis de competitividad
+    {'id': 'competitividad_critica', 'grupo': 'competitividad', 'etiqueta': 'Campo de batalla',
+     'columna': 'indice_competitividad', 'operador': '>=', 'valor': 80,
+     'texto': "🔥 **Crítico:** Sección muy competitiva - Campo de batalla, cada voto cuenta"},
+    {'id': 'competitividad_importante', 'grupo': 'competitividad', 'etiqueta': 'Zona de disputa',
+     'columna': 'indice_competitividad', 'operador': '>=', 'valor': 60,
+     'texto': "⚡ **Importante:** Sección competitiva - Zona de disputa electoral"},
+    {'id': 'dominio_consolidado', 'grupo': 'competitividad', 'etiqueta': 'Dominio consolidado',
+     'columna': 'indice_competitividad', 'operador': '<=', 'valor': 30,
+     'texto': "🛡️ **Estable:** Dominio partidista consolidado"},
+    # Análisis tecnológico
+    {'id': 'ventaja_digital', 'grupo': 'digitalizacion', 'etiqueta': 'Alta conectividad',
+     'columna': 'indice_digitalizacion', 'operador': '>', 'promedio': 'digitalizacion', 'desplazamiento': 10,
+     'texto': "📱 **Ventaja:** Alta conectividad - Estrategias digitales efectivas"},
+    {'id': 'baja_digitalizacion', 'grupo': 'digitalizacion', 'etiqueta': 'Baja digitalización',
+     'columna': 'indice_digitalizacion', 'operador': '<', 'promedio': 'digitalizacion', 'desplazamiento': -10,
+     'texto': "📻 **Adaptación:** Baja digitalización - Enfocar en medios tradicionales"},
+    # Análisis demográfico
+    {'id': 'poblacion_joven', 'grupo': 'jovenes', 'etiqueta': 'Población joven',
+     'columna': 'porc_jovenes', 'operador': '>', 'promedio': 'jovenes', 'desplazamiento': 5,
+     'texto': "👨‍🎓 **Perfil:** Población joven - Mensajes de cambio y oportunidad"},
+    {'id': 'poblacion_envejecida', 'grupo': 'adultos_mayores', 'etiqueta': 'Población envejecida',
+     'columna': 'porc_adultos_mayores', 'operador': '>', 'promedio': 'adultos_mayores', 'desplazamiento': 5,
+     'texto': "👴 **Perfil:** Población envejecida - Mensajes de estabilidad y seguridad"},
+    # Análisis de vulnerabilidad
+    {'id': 'prioridad_salud', 'grupo': 'salud', 'etiqueta': 'Prioridad salud',
+     'columna': 'porc_sin_servicios_salud', 'operador': '>', 'promedio': 'sin_servicios_salud', 'desplazamiento': 5,
+     'texto': "🏥 **Prioridad:** Vulnerabilidad en salud - Enfoque en políticas sanitarias"},
+    {'id': 'alta_desocupacion', 'grupo': 'desocupacion', 'etiqueta': 'Alta desocupación',
+     'columna': 'tasa_desocupacion', 'operador': '>', 'promedio': 'desocupacion', 'desplazamiento': 2,
+     'texto': "💼 **Preocupación:** Alta desocupación - Oportunidad para propuestas de empleo"},
+]
+
+OPERADORES = {'>': np.greater, '<': np.less, '>=': np.greater_equal, '<=': np.less_equal}
+
+
+def firma_reglas(reglas=REGLAS_INSIGHTS):
+    """Huella corta del conjunto de reglas: cambia si se edita cualquier regla."""
+    contenido = json.dumps(reglas, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(contenido.encode()).hexdigest()[:12]
+
+
+def describir_condicion(regla, promedios=None):
+    """Texto legible de la condición de una regla (para la tabla que consulta el agente)."""
+    if regla.get('resto'):
+        return f"ninguna otra regla del grupo '{regla['grupo']}'"
+    if 'promedio' in regla:
+        referencia = f"promedio municipal {regla['desplazamiento']:+g}"
+        if promedios is not None:
+            referencia += f" ({promedios[regla['promedio']] + regla['desplazamiento']:.2f})"
+        return f"{regla['columna']} {regla['operador']} {referencia}"
+    return f"{regla['columna']} {regla['operador']} {regla['valor']}"
+
+
+def evaluar_reglas(df, promedios, reglas=REGLAS_INSIGHTS):
+    """
+    Evalúa todas las reglas como comparaciones vectorizadas sobre todas las secciones.
+    Devuelve un DataFrame booleano sección × insight alineado al índice de `df`.
+    """
+    resultado = {}
+    asignados = {}  # grupo -> máscara de secciones que ya activaron una regla del grupo
+    for regla in reglas:
+        ya_asignado = asignados.get(regla['grupo'], np.zeros(len(df), dtype=bool))
+        if regla.get('resto'):
+            activa = ~ya_asignado
+        else:
+            valores = df[regla['columna']].to_numpy(dtype=float)
+            umbral = promedios[regla['promedio']] + regla['desplazamiento'] if 'promedio' in regla else regla['valor']
+            with np.errstate(invalid='ignore'):
+                activa = OPERADORES[regla['operador']](valores, umbral) & ~ya_asignado
+        resultado[regla['id']] = activa
+        asignados[regla['grupo']] = ya_asignado | activa
+    return pd.DataFrame(resultado, index=df.index)
+
+
+def textos_insights(fila_insights, reglas=REGLAS_INSIGHTS):
+    """Textos de los insights activos de una sección, en el orden de las reglas."""
+    return [regla['texto'] for regla in reglas if fila_insights[regla['id']]]
+
+
+def tablas_sql_insights(df, promedios, reglas=REGLAS_INSIGHTS):
+    """
+    Tablas para el agente: 'insights_secciones' (seccion + una columna 0/1 por insight)
+    y 'reglas_insights' (qué significa cada columna y su condición).
+    """
+    insights = evaluar_reglas(df, promedios, reglas).astype(int)
+    insights.insert(0, 'seccion', df['seccion'].to_numpy())
+    catalogo = pd.DataFrame([
+        {'id': regla['id'], 'grupo': regla['grupo'], 'etiqueta': regla['etiqueta'],
+         'texto': regla['texto'].replace('**', ''), 'condicion': describir_condicion(regla, promedios)}
+        for regla in reglas
+    ])
+    return {'insights_secciones': insights.reset_index(drop=True), 'reglas_insights': catalogo}
@@ -0,0 +1,315 @@
+# router_proveedores.py - Enrutador de proveedores LLM: tiempo límite, respaldo y solicitudes cubiertas (hedging)
+#
+# Uso (simulación local, sin LLM):
+#   python router_proveedores.py --consultas 200
+#   python router_proveedores.py --consultas 200 --prob-cola 0.1 --latencia-cola 4 --prob-error 0.05
+
+# --- CORE LIBRARIES ---
+import argparse
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+
+
+logger = logging.getLogger("router_proveedores")
+
+TIEMPO_LIMITE = 90.0        # segundos por intento antes de pasar al siguiente proveedor
+RETRASO_HEDGE_INICIAL = 10.0  # retraso del hedge mientras no hay muestras suficientes del primario
+MUESTRAS_MINIMAS_HEDGE = 20
+PERCENTIL_HEDGE = 95
+VENTANA_LATENCIAS = 500     # últimas latencias exitosas que se conservan por proveedor
+MAX_EN_CURSO = 8            # llamadas simultáneas por proveedor (incluye intentos abandonados que siguen corriendo)
+
+
+class ErrorProveedores(RuntimeError):
+    """Ningún proveedor respondió a tiempo; `intentos` detalla qué pasó con cada uno."""
+
+    def __init__(self, intentos):
+        self.intentos = intentos
+        detalle = "; ".join(f"{i['proveedor']}: {i['resultado']}" for i in intentos)
+        super().__init__(f"Ningún proveedor respondió ({detalle})")
+
+
+# --- 1. Métricas por Proveedor ---
+
+class LatenciasProveedor:
+    """
+    Ventana de latencias exitosas y contadores de un proveedor (seguro entre hilos). Cada intento
+    cuenta en uno solo de exitos / errores / tiempos_agotados / abandonados / saturados;
+    `respuestas_usadas` es el subconjunto de exitos cuya respuesta se devolvió.
+    """
+
+    def __init__(self, ventana=VENTANA_LATENCIAS):
+        self.latencias = deque(maxlen=ventana)
+        self.contadores = {
+            'exitos': 0, 'errores': 0, 'tiempos_agotados': 0, 'abandonados': 0, 'saturados': 0, 'respuestas_usadas': 0
+        }
+        self._candado = threading.Lock()
+
+    def registrar(self, evento, latencia=None):
+        with self._candado:
+            self.contadores[evento] += 1
+            if evento == 'exitos' and latencia is not None:
+                self.latencias.append(latencia)
+
+    def registrar_latencia(self, latencia):
+        """Latencia de un intento ya contado como agotado o abandonado que terminó bien (cola lenta)."""
+        with self._candado:
+            self.latencias.append(latencia)
+
+    def percentil(self, p):
+        with self._candado:
+            return float(np.percentile(self.latencias, p)) if self.latencias else None
+
+    def resumen(self):
+        with self._candado:
+            latencias = np.array(self.latencias)
+            contadores = dict(self.contadores)
+        if len(latencias):
+            contadores.update({
+                f'p{p}_s': round(float(np.percentile(latencias, p)), 3) for p in (50, 95, 99)
+            })
+        contadores['muestras'] = len(latencias)
+        return contadores
+
+
+# --- 2. Enrutador ---
+
+class RouterProveedores:
+    """
+    Expone `invoke(pregunta)` como un agente más, sobre una lista ordenada de proveedores
+    (nombre, agente) donde el primero es el principal:
+    - Cada intento tiene `tiempo_limite` segundos; si falla o se agota, se lanza el siguiente (respaldo).
+    - Con `hedging`, si el intento en curso no respondió tras el p95 de latencia de su proveedor
+      (o `RETRASO_HEDGE_INICIAL` sin muestras suficientes) se lanza también el siguiente y gana
+      la primera respuesta exitosa.
+    Las llamadas LangChain son síncronas y no se pueden interrumpir: un intento agotado o abandonado
+    termina en segundo plano y su latencia igual entra en la ventana (así el p95 no ignora la cola
+    lenta), pero no vuelve a contarse como éxito o error.
+
+    Cada proveedor tiene su propio pool de `max_en_curso` hilos: un principal colgado no retiene
+    los hilos del respaldo. Si un proveedor ya tiene `max_en_curso` llamadas en curso el intento
+    se marca 'saturado' y se pasa al siguiente sin encolarlo. El tiempo límite y el retraso del
+    hedge cuentan desde que la llamada empieza a ejecutarse.
+    """
+
+    def __init__(self, proveedores, tiempo_limite=TIEMPO_LIMITE, hedging=False, retraso_hedge=None,
+                 max_en_curso=MAX_EN_CURSO):
+        if not proveedores:
+            raise ValueError("Se necesita al menos un proveedor")
+        self.proveedores = list(proveedores)
+        self.tiempo_limite = tiempo_limite
+        self.hedging = hedging
+        self.retraso_hedge = retraso_hedge
+        self.max_en_curso = max_en_curso
+        self.metricas = {nombre: LatenciasProveedor() for nombre, _ in self.proveedores}
+        self._ejecutores = {
+            nombre: ThreadPoolExecutor(max_workers=max_en_curso, thread_name_prefix=f"proveedor-{nombre}")
+            for nombre, _ in self.proveedores
+        }
+        # Un cupo por hilo del pool: adquirirlo sin esperar garantiza que la llamada no se encola
+        self._cupos = {nombre: threading.BoundedSemaphore(max_en_curso) for nombre, _ in self.proveedores}
+
+    def _retraso_hedge(self, nombre):
+        if self.retraso_hedge is not None:
+            return self.retraso_hedge
+        metricas = self.metricas[nombre]
+        if len(metricas.latencias) < MUESTRAS_MINIMAS_HEDGE:
+            return RETRASO_HEDGE_INICIAL
+        return metricas.percentil(PERCENTIL_HEDGE)
+
+    def _lanzar(self, indice, pregunta):
+        """
+        (futuro, reloj) de la llamada al proveedor `indice`, o None si está saturado.
+        `reloj['inicio']` se fija al enviar y se corrige cuando la llamada empieza a ejecutarse;
+        el desenlace del intento se cuenta una sola vez (ver `_cerrar`).
+        """
+        nombre, agente = self.proveedores[indice]
+        if not self._cupos[nombre].acquire(blocking=False):
+            self.metricas[nombre].registrar('saturados')
+            return None
+        reloj = {'inicio': time.monotonic(), 'cerrado': False, 'candado': threading.Lock()}
+
+        def llamar():
+            reloj['inicio'] = time.monotonic()
+            return agente.invoke(pregunta)
+
+        def al_terminar(f):
+            # También corre si el futuro se canceló antes de empezar: el cupo siempre se libera
+            self._cupos[nombre].release()
+            if f.cancelled():
+                return
+            latencia = time.monotonic() - reloj['inicio']
+            if not self._cerrar(reloj):
+                # Ya contado como agotado o abandonado: solo aporta su latencia a la ventana
+                if f.exception() is None:
+                    self.metricas[nombre].registrar_latencia(latencia)
+            elif f.exception() is None:
+                self.metricas[nombre].registrar('exitos', latencia)
+            else:
+                self.metricas[nombre].registrar('errores')
+
+        futuro = self._ejecutores[nombre].submit(llamar)
+        futuro.add_done_callback(al_terminar)
+        return futuro, reloj
+
+    @staticmethod
+    def _cerrar(reloj):
+        """Marca el desenlace del intento; True solo para el primero que lo hace (terminar o abandonar)."""
+        with reloj['candado']:
+            if reloj['cerrado']:
+                return False
+            reloj['cerrado'] = True
+            return True
+
+    def invoke(self, pregunta):
+        inicio_consulta = time.monotonic()
+        pendientes = {}  # futuro -> (nombre, reloj, intento)
+        intentos = []
+        siguiente = 0
+
+        def lanzar_siguiente(motivo):
+            # Los proveedores saturados se saltan (quedan en `intentos`) hasta lanzar uno o agotarlos
+            nonlocal siguiente
+            while siguiente < len(self.proveedores):
+                nombre = self.proveedores[siguiente][0]
+                intento = {'proveedor': nombre, 'motivo': motivo, 'resultado': 'pendiente'}
+                intentos.append(intento)
+                lanzado = self._lanzar(siguiente, pregunta)
+                siguiente += 1
+                if lanzado is None:
+                    intento['resultado'] = 'saturado'
+                    logger.warning("Proveedor %s saturado (%d llamadas en curso)", nombre, self.max_en_curso)
+                    continue
+                futuro, reloj = lanzado
+                pendientes[futuro] = (nombre, reloj, intento)
+                return
+
+        lanzar_siguiente('principal')
+        while pendientes:
+            ahora = time.monotonic()
+            esperar_hasta = min(reloj['inicio'] + self.tiempo_limite for _, reloj, _ in pendientes.values())
+            hedge_en = None
+            if self.hedging and siguiente < len(self.proveedores):
+                nombre_ultimo, reloj_ultimo, _ = list(pendientes.values())[-1]
+                hedge_en = reloj_ultimo['inicio'] + self._retraso_hedge(nombre_ultimo)
+                esperar_hasta = min(esperar_hasta, hedge_en)
+
+            hechos, _ = wait(list(pendientes), timeout=max(esperar_hasta - ahora, 0), return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                nombre, _, intento = pendientes.pop(futuro)
+                try:
+                    respuesta = futuro.result()
+                except Exception as e:
+                    intento['resultado'] = f"error: {e}"
+                    logger.warning("Proveedor %s falló: %s", nombre, e)
+                    continue
+                intento['resultado'] = 'respuesta'
+                self.metricas[nombre].registrar('respuestas_usadas')
+                for pendiente, (otro_nombre, otro_reloj, otro) in pendientes.items():
+                    if self._cerrar(otro_reloj):
+                        self.metricas[otro_nombre].registrar('abandonados')
+                        otro['resultado'] = 'abandonado'
+                        pendiente.cancel()
+                    else:
+                        otro['resultado'] = 'terminó sin usarse'
+                return {
+                    **respuesta,
+                    'proveedor': nombre,
+                    'intentos': intentos,
+                    'latencia_s': round(time.monotonic() - inicio_consulta, 3),
+                }
+
+            ahora = time.monotonic()
+            for futuro, (nombre, reloj, intento) in list(pendientes.items()):
+                # Si terminó justo ahora, su callback ya lo contó: sigue pendiente y se recoge en el siguiente `wait`
+                if ahora >= reloj['inicio'] + self.tiempo_limite and self._cerrar(reloj):
+                    del pendientes[futuro]
+                    futuro.cancel()
+                    self.metricas[nombre].registrar('tiempos_agotados')
+                    intento['resultado'] = 'tiempo agotado'
+                    logger.warning("Proveedor %s agotó su tiempo (%.1fs)", nombre, self.tiempo_limite)
+
+            if siguiente < len(self.proveedores):
+                if not pendientes:
+                    lanzar_siguiente('respaldo')
+                elif hedge_en is not None and time.monotonic() >= hedge_en:
+                    lanzar_siguiente('hedge')
+        raise ErrorProveedores(intentos)
+
+    def resumen_latencias(self):
+        """Métricas por proveedor: contadores y p50/p95/p99 de las latencias exitosas."""
+        return {nombre: metricas.resumen() for nombre, metricas in self.metricas.items()}
+
+
+# --- 3. Proveedores Simulados ---
+
+class ProveedorSimulado:
+    """
+    Sustituto de un proveedor LLM con latencia configurable para probar el enrutador sin red:
+    latencia log-normal alrededor de `latencia`, con probabilidad `prob_cola` de sumar
+    `latencia_cola` segundos (cola lenta) y `prob_error` de fallar.
+    """
+
+    def __init__(self, nombre, latencia=0.5, dispersion=0.25, prob_cola=0.0, latencia_cola=3.0, prob_error=0.0, semilla=None):
+        self.nombre = nombre
+        self.latencia = latencia
+        self.dispersion = dispersion
+        self.prob_cola = prob_cola
+        self.latencia_cola = latencia_cola
+        self.prob_error = prob_error
+        self._aleatorio = random.Random(semilla)
+        self._candado = threading.Lock()
+
+    def invoke(self, pregunta):
+        with self._candado:
+            espera = self.latencia * self._aleatorio.lognormvariate(0, self.dispersion)
+            if self._aleatorio.random() < self.prob_cola:
+                espera += self.latencia_cola
+            falla = self._aleatorio.random() < self.prob_error
+        time.sleep(espera)
+        if falla:
+            raise RuntimeError(f"{self.nombre}: error simulado")
+        return {'input': pregunta, 'output': f"[{self.nombre}] respuesta simulada a: {pregunta}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara latencias del enrutador con y sin hedging sobre proveedores simulados.")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latencia típica del principal (s)")
+    parser.add_argument("--latencia-respaldo", type=float, default=0.3, help="Latencia típica del respaldo (s)")
+    parser.add_argument("--prob-cola", type=float, default=0.04, help="Probabilidad de cola lenta del principal")
+    parser.add_argument("--latencia-cola", type=float, default=2.0, help="Segundos extra en la cola lenta")
+    parser.add_argument("--prob-error", type=float, default=0.02, help="Probabilidad de error del principal")
+    parser.add_argument("--tiempo-limite", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for hedging in (False, True):
+        router = RouterProveedores(
+            [
+                ('principal', ProveedorSimulado('principal', args.latencia, prob_cola=args.prob_cola,
+                                                latencia_cola=args.latencia_cola, prob_error=args.prob_error, semilla=1)),
+                ('respaldo', ProveedorSimulado('respaldo', args.latencia_respaldo, prob_error=args.prob_error, semilla=2)),
+            ],
+            tiempo_limite=args.tiempo_limite, hedging=hedging,
+        )
+        latencias, fallidas = [], 0
+        for i in range(args.consultas):
+            try:
+                latencias.append(router.invoke(f"consulta {i}")['latencia_s'])
+            except ErrorProveedores:
+                fallidas += 1
+        p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+        print(f"hedging={'sí' if hedging else 'no':<3} p50={p50:.2f}s p95={p95:.2f}s p99={p99:.2f}s fallidas={fallidas}")
+        for nombre, resumen in router.resumen_latencias().items():
+            print(f"    {nombre:<10} {resumen}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# tests/test_actualizaciones.py - Refresco incremental contra un recálculo completo del dataset
+
+# --- CORE LIBRARIES ---
+import logging
+import os
+import shutil
+import sqlite3
+from contextlib import closing
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import pandas as pd
+import pytest
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import (
+    RUTA_DATOS_FINAL, abrir_tabla, leer_puntero, rutas_version, tabla_a_dataframe, tabla_a_geodataframe
+)
+from indicadores import (
+    COLUMNAS_PERFIL, DERIVADAS_POR_FILA, _asignar_valores, aplicar_actualizaciones, actualizar_dataset_produccion,
+    asegurar_dataset_produccion, calcular_derivada, calcular_umbrales, generar_perfil_seccion, leer_actualizaciones,
+    leer_zonas_publicadas, preparar_dataset, registrar_actualizacion
+)
+
+
+COLUMNAS_FUENTE = [
+    *COLUMNAS_PERFIL.values(), 'votos_totales_acumulados', 'lista_nominal_promedio', 'competitividad', 'pct_voto_morena'
+]
+
+
+@pytest.fixture(scope="module")
+def gdf_base():
+    return preparar_dataset(RUTA_DATOS_FINAL)
+
+
+def recalcular_completo(gdf):
+    """Referencia: derivadas, umbrales y perfiles recalculados sobre todas las secciones."""
+    gdf = gdf.copy()
+    for derivada in DERIVADAS_POR_FILA:
+        gdf[derivada] = calcular_derivada(gdf, derivada).to_numpy()
+    gdf['perfil_descriptivo'] = gdf.apply(generar_perfil_seccion, axis=1, umbrales=calcular_umbrales(gdf))
+    return gdf
+
+
+def lote_aleatorio(gdf, aleatorio):
+    """1-5 secciones × 1-3 columnas fuente; NaN = sin cambio. Incluye decimales en columnas enteras y ceros."""
+    secciones = aleatorio.choice(gdf['seccion'].to_numpy(), aleatorio.integers(1, 6), replace=False)
+    columnas = aleatorio.choice(COLUMNAS_FUENTE, aleatorio.integers(1, 4), replace=False)
+    cambios = pd.DataFrame({'seccion': secciones})
+    actuales = gdf.set_index('seccion').loc[secciones]
+    for columna in columnas:
+        valores = actuales[columna].to_numpy(dtype=float) * aleatorio.uniform(0.3, 2.0, len(secciones))
+        if columna == 'votos_totales_acumulados':
+            valores = np.round(valores) + (aleatorio.random(len(secciones)) < 0.2) * 0.5
+        if columna == 'lista_nominal_promedio':
+            valores[aleatorio.random(len(secciones)) < 0.1] = 0
+        valores[aleatorio.random(len(secciones)) < 0.2] = np.nan
+        cambios[columna] = valores
+    return cambios
+
+
+def aplicar_a_fuente(gdf, cambios):
+    gdf = gdf.copy()
+    posiciones = pd.Series(np.arange(len(gdf)), index=gdf['seccion'].to_numpy())
+    for columna in cambios.columns.drop('seccion'):
+        presentes = cambios[columna].notna().to_numpy()
+        if presentes.any():
+            filas = posiciones.loc[cambios['seccion'].to_numpy()[presentes]].to_numpy()
+            _asignar_valores(gdf, filas, columna, cambios[columna].to_numpy()[presentes])
+    return gdf
+
+
+def test_lotes_aleatorios_igual_a_recalculo_completo(gdf_base):
+    aleatorio = np.random.default_rng(0)
+    incremental, fuente = gdf_base, gdf_base
+    umbrales_movidos = 0
+    for _ in range(150):
+        cambios = lote_aleatorio(incremental, aleatorio)
+        incremental, resumen = aplicar_actualizaciones(incremental, cambios)
+        fuente = aplicar_a_fuente(fuente, cambios)
+        umbrales_movidos += resumen['umbrales_cambiaron']
+        pd.testing.assert_frame_equal(
+            pd.DataFrame(incremental.drop(columns='geometry')), pd.DataFrame(recalcular_completo(fuente).drop(columns='geometry'))
+        )
+    assert umbrales_movidos > 0
+    assert incremental['votos_totales_acumulados'].dtype == float
+
+
+def test_reperfila_todo_si_se_mueven_los_umbrales(gdf_base):
+    # Subir a la mitad de las secciones por encima del máximo mueve el percentil 70
+    secciones = gdf_base['seccion'].to_numpy()[::2]
+    cambios = pd.DataFrame({'seccion': secciones, 'porc_jovenes': gdf_base['porc_jovenes'].max() + 10})
+    gdf, resumen = aplicar_actualizaciones(gdf_base, cambios)
+    assert resumen['umbrales_cambiaron']
+    assert resumen['perfiles_recalculados'] == len(gdf_base)
+    assert gdf['perfil_descriptivo'].tolist() == recalcular_completo(gdf)['perfil_descriptivo'].tolist()
+
+    # Un cambio fuera de las columnas de perfil no toca umbrales ni perfiles
+    cambios = pd.DataFrame({'seccion': secciones[:1], 'pct_voto_morena': [12.5]})
+    _, resumen = aplicar_actualizaciones(gdf_base, cambios)
+    assert not resumen['umbrales_cambiaron'] and resumen['perfiles_recalculados'] == 0
+
+
+def test_entero_se_amplia_a_float_solo_con_decimales(gdf_base):
+    seccion = gdf_base['seccion'].iloc[0]
+    gdf, _ = aplicar_actualizaciones(gdf_base, pd.DataFrame({'seccion': [seccion], 'votos_totales_acumulados': [1500.0]}))
+    assert gdf['votos_totales_acumulados'].dtype == np.int64
+    assert gdf['votos_totales_acumulados'].iloc[0] == 1500
+
+    gdf, _ = aplicar_actualizaciones(gdf_base, pd.DataFrame({'seccion': [seccion], 'votos_totales_acumulados': [1500.5]}))
+    assert gdf['votos_totales_acumulados'].dtype == float
+    assert gdf['votos_totales_acumulados'].iloc[0] == 1500.5
+    assert (gdf['votos_totales_acumulados'].iloc[1:] == gdf_base['votos_totales_acumulados'].iloc[1:]).all()
+
+
+def leer_sqlite(directorio, version):
+    with closing(sqlite3.connect(rutas_version(directorio, version)['sqlite'])) as conexion:
+        return pd.read_sql("SELECT * FROM secciones ORDER BY seccion", conexion)
+
+
+def leer_arrow(directorio, version):
+    return tabla_a_dataframe(abrir_tabla(directorio, version)).sort_values('seccion').reset_index(drop=True)
+
+
+def test_upsert_sqlite_y_reaplicacion_de_bitacora(tmp_path):
+    fuente = tmp_path / RUTA_DATOS_FINAL.name
+    shutil.copy(RUTA_DATOS_FINAL, fuente)
+    publicados = tmp_path / "publicados"
+    asegurar_dataset_produccion(publicados, fuente)
+
+    aleatorio = np.random.default_rng(1)
+    for _ in range(3):
+        gdf = tabla_a_geodataframe(abrir_tabla(publicados, leer_puntero(publicados)['version']))
+        cambios = lote_aleatorio(gdf, aleatorio)
+        cambios.loc[0, 'votos_totales_acumulados'] = gdf['votos_totales_acumulados'].iloc[0] + 0.5  # int -> float
+        actualizar_dataset_produccion(publicados, fuente, cambios, motivo="prueba")
+    version = leer_puntero(publicados)['version']
+    assert len(leer_actualizaciones(fuente)) == 3
+
+    # La base SQLite (copia + UPSERT de las filas modificadas) coincide con el Arrow de la versión
+    arrow = leer_arrow(publicados, version)
+    pd.testing.assert_frame_equal(leer_sqlite(publicados, version)[arrow.columns], arrow, check_dtype=False)
+
+    # Una re-publicación completa vuelve a aplicar la bitácora y llega al mismo dataset
+    otra = tmp_path / "republicados"
+    version_completa = asegurar_dataset_produccion(otra, fuente)
+    pd.testing.assert_frame_equal(leer_arrow(otra, version_completa), arrow)
+    pd.testing.assert_frame_equal(leer_sqlite(otra, version_completa), leer_sqlite(publicados, version), check_dtype=False)
+    geometria = tabla_a_geodataframe(abrir_tabla(otra, version_completa)).sort_values('seccion').geometry
+    geometria_incremental = tabla_a_geodataframe(abrir_tabla(publicados, version)).sort_values('seccion').geometry
+    assert geometria.geom_equals_exact(geometria_incremental, tolerance=0).all()
+
+
+def test_bitacora_omite_secciones_inexistentes_y_lotes_de_otra_fuente(tmp_path, caplog):
+    fuente = tmp_path / RUTA_DATOS_FINAL.name
+    shutil.copy(RUTA_DATOS_FINAL, fuente)
+    seccion = int(preparar_dataset(fuente)['seccion'].iloc[0])
+    registrar_actualizacion(fuente, pd.DataFrame({'seccion': [seccion, 999_999], 'pct_voto_morena': [1.5, 2.0]}))
+
+    # Misma fuente: se aplica lo que existe y la sección desconocida solo se reporta
+    with caplog.at_level(logging.WARNING, logger="indicadores"):
+        version = asegurar_dataset_produccion(tmp_path / "a", fuente)
+    datos = leer_arrow(tmp_path / "a", version).set_index('seccion')
+    assert datos.loc[seccion, 'pct_voto_morena'] == 1.5
+    assert "999999" in caplog.text
+
+    # Fuente regenerada: el lote registrado sobre la versión anterior ya no se aplica
+    caplog.clear()
+    estado = os.stat(fuente)
+    os.utime(fuente, ns=(estado.st_atime_ns, estado.st_mtime_ns + 10 ** 9))
+    with caplog.at_level(logging.WARNING, logger="indicadores"):
+        version = asegurar_dataset_produccion(tmp_path / "b", fuente)
+    datos = leer_arrow(tmp_path / "b", version).set_index('seccion')
+    assert datos.loc[seccion, 'pct_voto_morena'] != 1.5
+    assert "otra versión" in caplog.text
+
+
+def test_refresco_incremental_conserva_las_zonas(tmp_path):
+    fuente = tmp_path / RUTA_DATOS_FINAL.name
+    shutil.copy(RUTA_DATOS_FINAL, fuente)
+    publicados = tmp_path / "publicados"
+    base = asegurar_dataset_produccion(publicados, fuente)
+    zonas_base = leer_zonas_publicadas(publicados, base)
+
+    gdf = tabla_a_geodataframe(abrir_tabla(publicados, base))
+    seccion = int(gdf['seccion'].iloc[0])
+    nueva_lista = float(gdf['lista_nominal_promedio'].iloc[0]) * 3
+    version, _ = actualizar_dataset_produccion(
+        publicados, fuente, pd.DataFrame({'seccion': [seccion], 'lista_nominal_promedio': [nueva_lista]})
+    )
+    pd.testing.assert_series_equal(leer_zonas_publicadas(publicados, version), zonas_base)
+
+    # Los agregados de la zona sí reflejan la corrección
+    with closing(sqlite3.connect(rutas_version(publicados, version)['sqlite'])) as conexion:
+        zonas = pd.read_sql("SELECT * FROM zonas", conexion)
+    actual = pd.DataFrame(tabla_a_geodataframe(abrir_tabla(publicados, version)).drop(columns='geometry'))
+    esperado = actual.assign(zona=zonas_base.loc[actual['seccion']].to_numpy()).groupby('zona')['lista_nominal_promedio'].sum()
+    obtenido = zonas.drop_duplicates('zona').set_index('zona')['lista_nominal_promedio_total'].sort_index()
+    pd.testing.assert_series_equal(obtenido, esperado, check_names=False)
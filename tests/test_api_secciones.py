@@ -0,0 +1,112 @@
+# tests/test_api_secciones.py - Validación de paginación y cambio de versión sin bloquear el bucle de eventos
+
+# --- CORE LIBRARIES ---
+import asyncio
+import shutil
+import time
+
+# --- DATA & ANALYSIS ---
+import pandas as pd
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+# --- MÓDULOS DEL PROYECTO ---
+import api_secciones
+from api_secciones import crear_aplicacion, fabrica_agente_para
+from dataset_compartido import RUTA_DATOS_FINAL
+from indicadores import actualizar_dataset_produccion, asegurar_dataset_produccion
+
+
+@pytest.fixture(scope="module")
+def publicacion(tmp_path_factory):
+    directorio = tmp_path_factory.mktemp("api")
+    fuente = directorio / RUTA_DATOS_FINAL.name
+    shutil.copy(RUTA_DATOS_FINAL, fuente)
+    publicados = directorio / "publicados"
+    asegurar_dataset_produccion(publicados, fuente)
+    return publicados, fuente
+
+
+@pytest.fixture
+def cliente(publicacion, monkeypatch):
+    monkeypatch.setattr(api_secciones, 'DIRECTORIO_PUBLICADOS', publicacion[0])
+
+    def con_cliente(prueba):
+        async def correr():
+            async with TestClient(TestServer(crear_aplicacion(fabrica_agente_para(analista_simulado=True)))) as cliente:
+                await prueba(cliente)
+        asyncio.run(correr())
+    return con_cliente
+
+
+@pytest.mark.parametrize("ruta", [
+    "/secciones?limite=-5", "/secciones?desplazamiento=-1", "/secciones?limite=x", "/rankings/competitividad?limite=-1",
+])
+def test_paginacion_negativa_o_invalida_es_400(cliente, ruta):
+    async def prueba(cliente):
+        respuesta = await cliente.get(ruta)
+        assert respuesta.status == 400
+        assert ruta.split('?')[1].split('=')[0] in (await respuesta.json())['error']
+    cliente(prueba)
+
+
+@pytest.mark.parametrize("rango, mensaje", [
+    ("indice_competitividad:x:50", "número"),
+    ("indice_competitividad:nan:", "número"),
+    ("indice_competitividad:60:40", "mayor que el máximo"),
+    ("indice_competitividad:10", "mal formado"),
+    ("no_existe:1:2", "no indexada"),
+])
+def test_rango_invalido_es_400_con_mensaje_claro(cliente, rango, mensaje):
+    async def prueba(cliente):
+        respuesta = await cliente.get("/secciones", params={'rango': rango})
+        assert respuesta.status == 400
+        assert mensaje in (await respuesta.json())['error']
+    cliente(prueba)
+
+
+def test_paginacion_valida(cliente):
+    async def prueba(cliente):
+        cuerpo = await (await cliente.get("/secciones?limite=5&desplazamiento=60")).json()
+        assert len(cuerpo['secciones']) == 3
+        cuerpo = await (await cliente.get("/secciones?limite=0")).json()
+        assert cuerpo['secciones'] == []
+        ranking = await (await cliente.get("/rankings/competitividad?limite=3")).json()
+        assert len(ranking['secciones']) == 3
+        respuesta = await cliente.get("/secciones", params={'rango': "indice_competitividad::50", 'limite': 100})
+        assert respuesta.status == 200
+        secciones = (await respuesta.json())['secciones']
+        assert secciones and all(s['indice_competitividad'] <= 50 for s in secciones)
+    cliente(prueba)
+
+
+def test_version_nueva_se_construye_sin_bloquear(cliente, publicacion, monkeypatch):
+    publicados, fuente = publicacion
+    monkeypatch.setattr(api_secciones, 'INTERVALO_VERIFICACION', 0.0)
+    construir = api_secciones.NucleoSecciones
+
+    def construir_lento(version):
+        time.sleep(0.5)
+        return construir(version)
+
+    async def prueba(cliente):
+        version_inicial = (await (await cliente.get("/salud")).json())['version']
+        seccion = int((await (await cliente.get("/rankings/competitividad?limite=1")).json())['secciones'][0]['seccion'])
+        await asyncio.to_thread(
+            actualizar_dataset_produccion, publicados, fuente,
+            pd.DataFrame({'seccion': [seccion], 'pct_voto_morena': [1.5]}), "prueba"
+        )
+        monkeypatch.setattr(api_secciones, 'NucleoSecciones', construir_lento)
+
+        # Mientras se construye el núcleo nuevo se sigue respondiendo (rápido) con el anterior
+        inicio = time.monotonic()
+        assert (await (await cliente.get("/salud")).json())['version'] == version_inicial
+        assert time.monotonic() - inicio < 0.3
+        for _ in range(40):
+            ficha = await (await cliente.get(f"/secciones/{seccion}")).json()
+            if ficha['version'] != version_inicial:
+                break
+            await asyncio.sleep(0.05)
+        assert ficha['version'] != version_inicial
+        assert ficha['indicadores']['pct_voto_morena'] == 1.5
+    cliente(prueba)
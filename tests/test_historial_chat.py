@@ -0,0 +1,45 @@
+# tests/test_historial_chat.py - Retención por antigüedad del historial de conversaciones
+
+# --- CORE LIBRARIES ---
+import sqlite3
+import time
+from contextlib import closing
+
+# --- MÓDULOS DEL PROYECTO ---
+from historial_chat import HistorialChat
+
+
+def envejecer(historial, sesion, dias):
+    """Retrocede `dias` la fecha de todos los mensajes de la sesión."""
+    with closing(sqlite3.connect(historial.ruta_db)) as conn, conn:
+        conn.execute("UPDATE mensajes SET creado = creado - ? WHERE sesion = ?", (dias * 86400, sesion))
+
+
+def test_purga_conversaciones_inactivas_completas(tmp_path):
+    historial = HistorialChat(tmp_path / "historial.db", retencion_dias=30)
+    for sesion in ("vieja", "activa"):
+        historial.agregar("anonimo", sesion, "user", "hola")
+        historial.agregar("anonimo", sesion, "assistant", "respuesta")
+    envejecer(historial, "vieja", 31)
+    envejecer(historial, "activa", 40)
+    historial.agregar("anonimo", "activa", "user", "sigo aquí")
+
+    assert historial.purgar_inactivas() == 2
+    assert historial.contar("anonimo", "vieja") == 0
+    # La conversación con actividad reciente conserva también sus mensajes antiguos
+    assert [m["content"] for m in historial.ultimos("anonimo", "activa", 10)] == ["hola", "respuesta", "sigo aquí"]
+
+
+def test_purga_automatica_al_abrir_y_al_agregar(tmp_path, monkeypatch):
+    ruta = tmp_path / "historial.db"
+    historial = HistorialChat(ruta, retencion_dias=30)
+    historial.agregar("anonimo", "vieja", "user", "hola")
+    envejecer(historial, "vieja", 31)
+    assert HistorialChat(ruta, retencion_dias=30).contar("anonimo", "vieja") == 0
+
+    historial.agregar("anonimo", "otra", "user", "hola")
+    envejecer(historial, "otra", 31)
+    monkeypatch.setattr(historial, "_ultima_purga", time.time() - 3600)
+    historial.agregar("anonimo", "nueva", "user", "hola")
+    assert historial.contar("anonimo", "otra") == 0
+    assert historial.contar("anonimo", "nueva") == 1
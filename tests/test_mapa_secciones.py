@@ -0,0 +1,51 @@
+# tests/test_mapa_secciones.py - Publicación concurrente del GeoJSON estático de secciones
+
+# --- CORE LIBRARIES ---
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+
+# --- DATA & ANALYSIS ---
+import geopandas as gpd
+import pytest
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import RUTA_DATOS_FINAL
+from mapa_secciones import publicar_geometria, limpiar_geometrias_antiguas
+
+
+@pytest.fixture(scope="module")
+def gdf():
+    gdf = gpd.read_file(RUTA_DATOS_FINAL)
+    gdf['perfil_descriptivo'] = "Perfil Mixto / Promedio"
+    return gdf
+
+
+def publicar_en(directorio):
+    gdf = gpd.read_file(RUTA_DATOS_FINAL)
+    gdf['perfil_descriptivo'] = "Perfil Mixto / Promedio"
+    return publicar_geometria(gdf, directorio)
+
+
+def test_publicacion_simultanea_en_hilos_y_procesos(gdf, tmp_path):
+    with ThreadPoolExecutor(max_workers=8) as hilos:
+        nombres = set(hilos.map(lambda _: publicar_geometria(gdf, tmp_path), range(16)))
+    with get_context('spawn').Pool(4) as procesos:
+        nombres |= set(procesos.map(publicar_en, [tmp_path] * 8))
+
+    assert len(nombres) == 1
+    assert [ruta.name for ruta in tmp_path.iterdir()] == list(nombres)  # sin temporales huérfanos
+    capa = json.loads((tmp_path / nombres.pop()).read_text(encoding='utf-8'))
+    assert len(capa['features']) == len(gdf)
+
+
+def test_limpieza_conserva_las_recientes_y_la_en_uso(tmp_path):
+    for i in range(6):
+        ruta = tmp_path / f"secciones_{i}.geojson"
+        ruta.write_text("{}")
+        os.utime(ruta, (i, i))
+    limpiar_geometrias_antiguas(tmp_path, "secciones_0.geojson", conservar=2)
+    assert sorted(ruta.name for ruta in tmp_path.iterdir()) == [
+        "secciones_0.geojson", "secciones_4.geojson", "secciones_5.geojson"
+    ]
@@ -0,0 +1,33 @@
+# tests/test_regionalizacion.py - Zonas contiguas, completas y balanceadas sobre las secciones reales
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import connected_components
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import RUTA_DATOS_FINAL
+from indicadores import CONFIG_ZONAS, preparar_dataset
+from regionalizacion import _matriz, construir_grafo_contiguidad, promedio_por_zona, regionalizar
+
+
+@pytest.fixture(scope="module")
+def gdf():
+    return preparar_dataset(RUTA_DATOS_FINAL)
+
+
+@pytest.mark.parametrize("num_zonas, tolerancia, minimo", [(8, 0.5, 3), (6, 0.3, 3), (4, 0.1, 3)])
+def test_zonas_contiguas_y_balanceadas(gdf, num_zonas, tolerancia, minimo):
+    zonas = regionalizar(gdf, num_zonas, CONFIG_ZONAS['indicadores'], 'lista_nominal_promedio', tolerancia, minimo)
+    assert sorted(set(zonas)) == list(range(1, num_zonas + 1))
+
+    aristas = construir_grafo_contiguidad(gdf)
+    for zona in range(1, num_zonas + 1):
+        miembros = np.flatnonzero(zonas == zona)
+        assert len(miembros) >= minimo
+        num_partes, _ = connected_components(_matriz(aristas, len(gdf))[miembros][:, miembros], directed=False)
+        assert num_partes == 1
+
+    objetivo = promedio_por_zona(gdf, 'lista_nominal_promedio', num_zonas)
+    totales = np.bincount(zonas, gdf['lista_nominal_promedio'].to_numpy())[1:]
+    assert np.all(np.abs(totales / objetivo - 1) <= tolerancia + 1e-9)
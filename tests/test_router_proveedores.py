@@ -0,0 +1,70 @@
+# tests/test_router_proveedores.py - Respaldo del enrutador cuando el proveedor principal se cuelga
+
+# --- CORE LIBRARIES ---
+from concurrent.futures import ThreadPoolExecutor
+
+# --- MÓDULOS DEL PROYECTO ---
+from router_proveedores import RouterProveedores, ProveedorSimulado
+
+
+def crear_router(latencia_principal, max_en_curso=8, **opciones):
+    return RouterProveedores(
+        [
+            ('principal', ProveedorSimulado('principal', latencia_principal, dispersion=0, semilla=1)),
+            ('respaldo', ProveedorSimulado('respaldo', 0.05, dispersion=0, semilla=2)),
+        ],
+        tiempo_limite=1.0, max_en_curso=max_en_curso, **opciones,
+    )
+
+
+def esperar_en_segundo_plano(router):
+    """Deja terminar las llamadas abandonadas para que sus callbacks ya hayan corrido."""
+    for ejecutor in router._ejecutores.values():
+        ejecutor.shutdown(wait=True)
+
+
+def test_principal_colgado_no_bloquea_al_respaldo():
+    # Más consultas simultáneas que hilos por proveedor: antes todas esperaban en la cola del
+    # pool compartido detrás del principal colgado y fallaban sin llegar al respaldo.
+    router = crear_router(latencia_principal=1.5)
+    with ThreadPoolExecutor(max_workers=12) as clientes:
+        respuestas = list(clientes.map(router.invoke, [f"consulta {i}" for i in range(12)]))
+
+    assert all(r['proveedor'] == 'respaldo' for r in respuestas)
+    resultados = [r['intentos'][0]['resultado'] for r in respuestas]
+    assert resultados.count('tiempo agotado') == 8
+    assert resultados.count('saturado') == 4
+
+    # Los intentos agotados terminan después sin contarse también como éxito
+    esperar_en_segundo_plano(router)
+    resumen = router.resumen_latencias()
+    principal, respaldo = resumen['principal'], resumen['respaldo']
+    assert (principal['tiempos_agotados'], principal['saturados'], principal['exitos'], principal['errores']) == (8, 4, 0, 0)
+    assert principal['muestras'] == 8
+    assert respaldo['exitos'] == respaldo['respuestas_usadas'] == 12
+
+
+def test_intento_abandonado_por_hedge_se_cuenta_una_vez():
+    router = crear_router(latencia_principal=0.5, hedging=True, retraso_hedge=0.1)
+    respuesta = router.invoke("consulta")
+    assert respuesta['proveedor'] == 'respaldo'
+    assert [i['resultado'] for i in respuesta['intentos']] == ['abandonado', 'respuesta']
+
+    esperar_en_segundo_plano(router)
+    principal = router.resumen_latencias()['principal']
+    assert (principal['abandonados'], principal['exitos'], principal['tiempos_agotados']) == (1, 0, 0)
+    assert principal['muestras'] == 1
+
+
+def test_cupo_se_libera_al_terminar():
+    router = crear_router(latencia_principal=0.05, max_en_curso=1)
+    for i in range(5):
+        assert router.invoke(f"consulta {i}")['proveedor'] == 'principal'
+    assert router.resumen_latencias()['principal']['saturados'] == 0
+
+
+def test_principal_a_tiempo_no_lanza_respaldo():
+    router = crear_router(latencia_principal=0.3)
+    respuesta = router.invoke("consulta")
+    assert respuesta['proveedor'] == 'principal'
+    assert [i['resultado'] for i in respuesta['intentos']] == ['respuesta']
@@ -0,0 +1,64 @@
+# tests/test_sketches_cuantiles.py - Determinismo, modo exacto y error de rango de los sketches KLL
+
+# --- DATA & ANALYSIS ---
+import numpy as np
+import pandas as pd
+
+# --- MÓDULOS DEL PROYECTO ---
+from indicadores import COLUMNAS_PERFIL, CUANTIL_PERFIL, calcular_umbrales
+from sketches_cuantiles import SketchKLL, SketchesParticionados, error_rango_kll
+
+
+def perfiles_sinteticos(num_filas, semilla=0):
+    aleatorio = np.random.default_rng(semilla)
+    df = pd.DataFrame({columna: aleatorio.gamma(2.0, 10.0, num_filas) for columna in COLUMNAS_PERFIL.values()})
+    df['partido_dominante'] = aleatorio.choice(['morena', 'pan', 'pri', 'mc'], num_filas)
+    return df
+
+
+def error_de_rango(valor, ordenados, q):
+    return abs(np.searchsorted(ordenados, valor, side='right') / len(ordenados) - q)
+
+
+def test_umbrales_deterministas_fuera_del_modo_exacto():
+    df = perfiles_sinteticos(20_000)
+    assert calcular_umbrales(df) == calcular_umbrales(df)
+    # También tras serializar (lo que leen otros procesos desde los metadatos de la versión)
+    sketches = SketchesParticionados.construir(df, COLUMNAS_PERFIL.values(), ['partido_dominante'])
+    copia = SketchesParticionados.desde_json(sketches.a_json())
+    assert sketches.cuantiles(CUANTIL_PERFIL) == copia.cuantiles(CUANTIL_PERFIL)
+
+
+def test_modo_exacto_igual_a_pandas():
+    df = perfiles_sinteticos(5_000)
+    df.loc[::7, 'GRAPROES'] = np.nan
+    umbrales = calcular_umbrales(df)
+    for etiqueta, columna in COLUMNAS_PERFIL.items():
+        assert umbrales[etiqueta] == df[columna].quantile(CUANTIL_PERFIL)
+
+
+def test_error_de_rango_acotado_tras_fusionar():
+    aleatorio = np.random.default_rng(7)
+    lotes = [aleatorio.lognormal(size=aleatorio.integers(1_000, 50_000)) for _ in range(12)]
+    ordenados = np.sort(np.concatenate(lotes))
+    # Una fusión de sketches independientes y un sketch alimentado por lotes en orden creciente
+    fusion = SketchKLL.fusionar(SketchKLL().agregar(lote) for lote in lotes)
+    por_lotes = SketchKLL()
+    for lote in np.array_split(ordenados, 40):
+        por_lotes.agregar(lote)
+
+    for sketch in (fusion, por_lotes):
+        assert not sketch.exacto
+        for q in (0.05, 0.25, 0.5, CUANTIL_PERFIL, 0.9, 0.99):
+            assert error_de_rango(sketch.cuantil(q), ordenados, q) <= error_rango_kll()
+
+
+def test_particiones_fusionadas_cumplen_cota():
+    df = perfiles_sinteticos(60_000, semilla=3)
+    sketches = SketchesParticionados.construir(df, COLUMNAS_PERFIL.values(), ['partido_dominante'])
+    seleccion = df['partido_dominante'].isin(['morena', 'mc'])
+    valores, error = sketches.cuantiles(CUANTIL_PERFIL, {'partido_dominante': ['morena', 'mc']})
+    assert error == error_rango_kll()
+    for columna in COLUMNAS_PERFIL.values():
+        ordenados = np.sort(df.loc[seleccion, columna].to_numpy())
+        assert error_de_rango(valores[columna], ordenados, CUANTIL_PERFIL) <= error
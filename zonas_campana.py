@@ -0,0 +1,87 @@
+# zonas_campana.py - Regionaliza las secciones en zonas de campaña contiguas y re-publica la tabla `zonas`
+#
+# Uso:
+#   python zonas_campana.py                                   # muestra la configuración y las zonas vigentes
+#   python zonas_campana.py --zonas 6 --tolerancia 0.3
+#   python zonas_campana.py --zonas 10 --indicadores porc_jovenes,GRAPROES,indice_digitalizacion --vista-previa
+#
+# La configuración se guarda junto al dataset fuente (dataset_produccion_zonas.json) y forma parte de la
+# firma del dataset: al cambiarla se publica una versión nueva con la tabla `zonas` para el agente SQL,
+# y la app muestra la capa de zonas en su siguiente rerun.
+
+# --- CORE LIBRARIES ---
+import argparse
+import time
+
+# --- DATA & ANALYSIS ---
+import pandas as pd
+
+# --- MÓDULOS DEL PROYECTO ---
+from dataset_compartido import abrir_tabla, tabla_a_geodataframe, RUTA_DATOS_FINAL, DIRECTORIO_PUBLICADOS
+from indicadores import (
+    asegurar_dataset_produccion, leer_config_zonas, guardar_config_zonas, ruta_config_zonas, calcular_zonas
+)
+from regionalizacion import promedio_por_zona
+
+
+def imprimir_zonas(tabla, config, objetivo):
+    """Resumen por zona: secciones, total de la columna de balance y su proporción del objetivo por zona."""
+    columna_total = f"{config['columna_balance']}_total"
+    resumen = tabla.drop(columns='seccion').drop_duplicates('zona').set_index('zona').sort_index()
+    resumen['vs_promedio'] = resumen[columna_total] / objetivo
+    with pd.option_context('display.width', 160, 'display.max_columns', 20):
+        print(resumen[['secciones_en_zona', columna_total, 'vs_promedio']].round(2).to_string())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zonas de campaña contiguas y balanceadas (SKATER) sobre el dataset publicado.")
+    parser.add_argument("--zonas", type=int, help="Número de zonas")
+    parser.add_argument("--indicadores", help="Columnas (separadas por coma) cuyo perfil debe ser similar dentro de cada zona")
+    parser.add_argument("--columna-balance", help="Columna a balancear entre zonas (por defecto lista_nominal_promedio)")
+    parser.add_argument("--tolerancia", type=float, help="Desviación permitida del total por zona respecto al promedio (0.5 = ±50%%)")
+    parser.add_argument("--minimo-secciones", type=int, help="Secciones mínimas por zona")
+    parser.add_argument("--vista-previa", action="store_true", help="Calcula y muestra las zonas sin guardar ni publicar")
+    args = parser.parse_args()
+
+    config = leer_config_zonas(RUTA_DATOS_FINAL)
+    cambios = {
+        'num_zonas': args.zonas,
+        'indicadores': args.indicadores.split(',') if args.indicadores else None,
+        'columna_balance': args.columna_balance,
+        'tolerancia': args.tolerancia,
+        'minimo_secciones': args.minimo_secciones,
+    }
+    config.update({clave: valor for clave, valor in cambios.items() if valor is not None})
+
+    version = asegurar_dataset_produccion(DIRECTORIO_PUBLICADOS, RUTA_DATOS_FINAL)
+    if version is None:
+        raise SystemExit("❌ No hay dataset publicado.")
+    gdf = tabla_a_geodataframe(abrir_tabla(DIRECTORIO_PUBLICADOS, version))
+    inicio = time.perf_counter()
+    try:
+        tabla = calcular_zonas(gdf, config)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    num_formadas = tabla['zona'].nunique()
+    print(f"✅ {num_formadas} zonas contiguas sobre {len(gdf)} secciones en {time.perf_counter() - inicio:.2f} s")
+    if num_formadas < config['num_zonas']:
+        print(f"⚠️ Las restricciones solo permitieron {num_formadas} de {config['num_zonas']} zonas "
+              f"(prueba con más --tolerancia o menos --minimo-secciones).")
+    # Mismo objetivo que usa el algoritmo: total / zonas pedidas (no el promedio de las formadas)
+    objetivo = promedio_por_zona(gdf, config['columna_balance'], min(config['num_zonas'], len(gdf)))
+    totales = tabla.drop_duplicates('zona')[f"{config['columna_balance']}_total"]
+    fuera = (totales / objetivo - 1).abs() > config['tolerancia'] + 1e-9
+    if fuera.any():
+        print(f"⚠️ {fuera.sum()} zona(s) quedaron fuera de ±{config['tolerancia']:.0%} del promedio "
+              f"de {config['columna_balance']} (no hubo movimiento contiguo que las equilibrara).")
+    imprimir_zonas(tabla, config, objetivo)
+
+    if args.vista_previa or not any(valor is not None for valor in cambios.values()):
+        return
+    guardar_config_zonas(RUTA_DATOS_FINAL, config)
+    version = asegurar_dataset_produccion(DIRECTORIO_PUBLICADOS, RUTA_DATOS_FINAL)
+    print(f"✅ Versión {version} publicada con la tabla 'zonas' (configuración en {ruta_config_zonas(RUTA_DATOS_FINAL)})")
+
+
+if __name__ == "__main__":
+    main()